@@ -6,98 +6,242 @@ description:
 This ETL implementation reads data from CSV files, transforms it by validating foreign key constraints and data types, and loads it into a MySQL database.
 It ensures table creation with proper schema and relationships before data insertion.
 Error handling and logging are included for traceability during the ETL process.
+"python3 app.py --daemon" keeps running and reruns the tables of every new source file (daemon.py).
 '''
 
 import tables as t
-import dq
-import pandas as pd
+import dist
+import scheduler
+import schema
+import lineage
+import patterncache
+import metrics
 import json
 import datetime
-import time
-
-try:
+import os
+import sys
+# engine, sink, stream, keyindex and reader import pandas: they are imported by setup() and run(),
+# so importing app stays cheap; incremental, checkpoint, shard and daemon only by the runs that use them
+
+# warm state, set up once per process and kept between the runs of the daemon
+config=None
+rules=None
+schemas=None
+keystore=None
+# {table: set of parent tables} over every table of rules.json
+all_deps=None
+# True while the steps of setup() (e.g. the DDL) wait to be reported with the first run
+setup_recorded=False
+
+
+def setup():
+    """ Load config.json, create the tables and compile the rules and schemas, once per process."""
+    global config,rules,schemas,keystore,all_deps,setup_recorded
+    if config is not None:
+        return
+    import engine
+    import keyindex
+    import loader
+    import stream
     # load config
     with open('config.json', 'r') as file:
-        config = json.load(file)
+        loaded = json.load(file)
+    # a loader strategy the connection cannot run is refused before anything is read
+    for table in loaded["tables"].values():
+        loader.options_for(loaded,table)
+    patterncache.configure(loaded)
+    # metrics are on before the DDL, so its steps are in the report of the first run
+    metrics.configure(loaded)
+    setup_recorded=True
+
+    # compile the per-table rules (rules.json) once
+    rules=engine.compile_rules(engine.load_rules(loaded))
+    # with lineage on, every table gets a flags column with one bit per rule
+    lineage.configure(loaded,rules)
 
     #creating tables
-    t.users()
-    t.posts()
-    t.comments()
-    t.albums()
-    t.photos()
-    t.todos()
-
-    users_df=pd.read_csv(config["srcpath"]["users"])
-
-    #posts table checkes
-    posts_df=pd.read_csv(config["srcpath"]["posts"])
-    table=config["tables"]["posts"]
-
-    #checks on posts_df
-    posts_df=dq.primary_key_check_num(posts_df,"id",table)
-    posts_df=dq.fk_id_check(posts_df,"userId",table,users_df,"id")
-    posts_df=dq.title_check_to_untitled(posts_df,"title",table)
-    posts_df=dq.comment_body_blank_drop(posts_df,"body",table)
-    posts_df.to_csv(config["distpath"][table],index=False)
-
-    #comments table checkes
-    comments_df=pd.read_csv(config["srcpath"]["comments"])
-    table=config["tables"]["comments"]
-
-    comments_df=dq.primary_key_check_num(comments_df,"id",table)
-    comments_df=dq.fk_id_check(comments_df,"postId",table,posts_df,"id")
-    comments_df=dq.name_check_to_anonymous(comments_df,"name",table)
-    comments_df=dq.email_check_blank(comments_df,"email",table)
-    comments_df=dq.comment_body_blank_drop(comments_df,"body",table)
-    comments_df.to_csv(config["distpath"][table],index=False)
-
-
-    #albums table checkes
-    albums_df=pd.read_csv(config["srcpath"]["albums"])
-    table=config["tables"]["albums"]
-
-    albums_df=dq.primary_key_check_num(albums_df,"id",table)
-    albums_df=dq.fk_id_check(albums_df,"userId",table,users_df,"id")
-    albums_df=dq.title_check_to_untitled(albums_df,"title",table)
-    albums_df.to_csv(config["distpath"][table],index=False)
-
-
-
-    #photos table checkes
-    photos_df=pd.read_csv(config["srcpath"]["photos"])
-    table=config["tables"]["photos"]
-
-    photos_df=dq.primary_key_check_num(photos_df,"id",table)
-    photos_df=dq.fk_id_check(photos_df,"albumId",table,albums_df,"id")
-    photos_df=dq.title_check_to_untitled(photos_df,"title",table)
-    photos_df=dq.url_check_drop(photos_df,'url',table)
-    photos_df=dq.url_check_null(photos_df,'thumbnailUrl',table)
-    photos_df.to_csv(config["distpath"][table],index=False)
-
-
-    #todo table checkes
-    todo_df=pd.read_csv(config["srcpath"]["todos"])
-    table=config["tables"]["todos"]
-
-    #checks on todo_df
-    todo_df=dq.fk_id_check(todo_df,"userId",table,users_df,"id")
-    todo_df=dq.primary_key_check_num(todo_df,"id",table)
-    todo_df=dq.title_check_to_drop(todo_df,"title",table)
-    todo_df=dq.bool_check(todo_df,"completed",table)
-    todo_df.to_csv(config["distpath"][table],index=False)
-except Exception as err:
-            with open("error.txt", "a") as fs:
-                fs.write(f"{datetime.datetime.now()}  Error while checking constraints: {err}\n")
-
-#inserting values into database
-try:
-    names=['users','posts','comments','albums','photos','todos']
-    paths=['./dist/users.csv','./dist/posts.csv','./dist/comments.csv','./dist/albums.csv','./dist/photos.csv','./dist/todos.csv']
-    for i in range(len(names)):
-        t.inserting_data(paths[i],names[i])
-    # while(True):
-    #     time.sleep(60*60) #execute for every hour 
-except Exception as err:
+    t.create_tables()
+    if lineage.column is not None:
+        t.writing_rule_legend(lineage.legend(rules,loaded["tables"]))
+    # compact dtypes of every source table (schema.json)
+    schemas=schema.load_schema(loaded)
+
+    # valid keys of every table, cached in memory and on disk between runs and fetched from MySQL as a last resort
+    keystore=keyindex.KeyStore(loaded.get("keyindex",{}).get("path","./state/keys"),
+                               fetch=lambda name: t.fetching_keys(loaded["tables"][name]))
+    all_deps=scheduler.dependencies(stream.table_order(rules),t.PARENTS,{name:engine.parents_of(rules[name]) for name in rules})
+    config=loaded
+
+
+def run(selected=()):
+    """ One run over the tables named in selected (e.g. python3 app.py photos), or over all tables."""
+    # validated tables handed straight to the loader
+    validated={}
+    # dist files are an optional side output written on a background thread
+    dist_writer=dist.DistWriter("none")
+    # state of the incremental mode (None when every row is checked and loaded)
+    state=None
+    # resumable loads (None when checkpoints are disabled)
+    checkpoints=None
+    # True once every table of the run was checked
+    complete=False
+    import engine
+    import sink
+    import stream
+    import reader
+
+    global setup_recorded
+    try:
+        setup()
+        sink.configure(config)
+        if not setup_recorded:
+            metrics.configure(config)
+        setup_recorded=False
+        reader.configure(config)
+
+        dist_writer=dist.DistWriter(config.get("distformat","csv"),int(config.get("pipeline",{}).get("queue_size",2)))
+
+        order=[name for name in stream.table_order(rules) if not selected or name in selected]
+        deps={name:all_deps[name]&set(order) for name in order}
+
+        # valid keys of every parent table; parents outside this run come from the key store
+        keys={}
+        for name in order:
+            for parent in all_deps[name]-set(order):
+                keys[parent]=keystore.get(parent)
+
+        if config.get("chunksize"):
+            # chunked mode: every table is checked and loaded chunk by chunk
+            stream.run(config,rules,dist_writer,order,keys,keystore)
+        else:
+            # incremental mode: only new or changed rows of changed files are checked and loaded
+            if config.get("incremental",{}).get("enabled"):
+                import incremental
+                state=incremental.IncrementalState(config,keystore)
+            else:
+                # an interrupted load of an earlier run resumes where it stopped
+                import checkpoint
+                checkpoints=checkpoint.configure(config)
+            if "sharding" in config:
+                import shard
+            # tables with new, changed or deleted rows in this run
+            changed=set()
+
+            def check_table(name):
+                src=config["srcpath"][name]
+                table=config["tables"][name]
+                # an unchanged file is skipped unless a parent changed (its orphans may now be valid)
+                if state is not None and not deps[name]&changed and state.unchanged(name,src):
+                    keys[name]=keystore.get(name)
+                    return None
+                if checkpoints is not None:
+                    source_hash=checkpoints.fingerprint(src)
+                    # the rows were checked against the keys of every ancestor: their files must be unchanged too
+                    parent_hashes=checkpoints.fingerprints({parent:config["srcpath"][parent] for parent in scheduler.ancestors(name,all_deps)})
+                    if checkpoints.done(table,source_hash,parent_hashes):
+                        keys[name]=keystore.get(name)
+                        return None
+                    resumed=checkpoints.resume(table,source_hash,parent_hashes)
+                    if resumed is not None:
+                        # the validated rows of the interrupted run: no checks, only the uncommitted rows are loaded
+                        df,committed=resumed
+                        keys[name]=keystore.put(name,df["id"])
+                        return df.iloc[committed:]
+                if state is not None:
+                    state.read(name,src)
+                with metrics.span("extract",name,"read_csv") as step:
+                    df=reader.read_csv(src,schemas.get(name),table=name)
+                    step.rows_out=len(df)
+                    if metrics.enabled:
+                        step.bytes_read=os.path.getsize(src)
+                if state is not None:
+                    # when a parent changed, unchanged rows are checked again against its new keys
+                    df=state.changed_rows(name,df,recheck=bool(deps[name]&changed))
+                if "sharding" in config and shard.enabled_for(config,name,len(df)):
+                    # a large table is checked on a pool of processes, one shard of ids each
+                    df=shard.run_table(df,table,rules.get(name,[]),keys,int(shard.options_for(config)["processes"]))
+                else:
+                    df=engine.run_table(df,table,rules.get(name,[]),keys)
+                if state is not None:
+                    keys[name]=keystore.put(name,state.stage(name,df))
+                    if df.empty and not len(state.deleted.get(name,[])):
+                        return None
+                else:
+                    keys[name]=keystore.put(name,df["id"])
+                changed.add(name)
+                if state is not None:
+                    # df only holds the new or changed rows: they are merged into the previous dist file
+                    dist_writer.merge(df,config["distpath"][table],state.deleted.get(name) if state.apply_deletes else None)
+                else:
+                    dist_writer.write(df,config["distpath"][table])
+                if checkpoints is not None:
+                    checkpoints.begin(table,source_hash,df,parent_hashes)
+                return df
+
+            #checks on every table, each one starting as soon as its parents are checked
+            checked=scheduler.run(order,deps,check_table,config.get("workers",4))
+            # keep FK order for the loader
+            for name in order:
+                if checked.get(name) is not None:
+                    validated[name]=checked[name]
+            complete=all(name in checked for name in order)
+    except Exception as err:
+                with open("error.txt", "a") as fs:
+                    fs.write(f"{datetime.datetime.now()}  Error while checking constraints: {err}\n")
+    finally:
+        # write the buffered rejections in bulk and one summary line per rule
+        sink.get_sink().close()
+        sink.get_sink().log_summary()
+        # regex verdicts of this run are reused by the next one
+        if patterncache.get_cache() is not None:
+            patterncache.get_cache().save()
+        # column statistics gathered while reading
+        reader.write_profiles()
+
+    #inserting values into database, straight from the validated DataFrames
+    #independent tables are loaded concurrently, children after their parents
+    try:
+        loaded=t.load_tables({config["tables"][name]:df for name,df in validated.items()},checkpoints=checkpoints)
+        failed={name for name in validated if config["tables"][name] not in loaded}
+        if checkpoints is not None and complete and not failed:
+            # nothing to resume: the next run starts from the source files again
+            checkpoints.clear()
+        # the keys of every loaded table are cached for the FK checks of later runs
+        for name in validated:
+            if name not in failed:
+                keystore.save(name)
+            else:
+                keystore.discard(name)
+        if state is not None:
+            for name,ids in state.deleted.items():
+                if len(ids):
+                    with open("error.txt", "a") as fs:
+                        fs.write(f"{datetime.datetime.now()} {len(ids)} rows deleted from the source of {name}\n")
+                    if state.apply_deletes and name not in failed:
+                        t.deleting_rows(config["tables"][name],ids)
+                    if name not in failed:
+                        keystore.save(name)
+            # remember what was loaded, so the next run only sees new changes
+            state.commit([name for name in state.staged if name not in failed])
+        validated.clear()
+    except Exception as err:
+                with open("error.txt", "a") as fs:
+                    fs.write(f"{datetime.datetime.now()} - Error in db_connect: {err}\n")
+    finally:
+        dist_writer.close()
+        # timings, rows, bytes and memory of every step, plus the rejections per rule
+        metrics.write_report(sink.get_sink().summary())
+
+
+if __name__=="__main__":
+    if "--daemon" in sys.argv[1:]:
+        try:
+            setup()
+        except Exception as err:
             with open("error.txt", "a") as fs:
-                fs.write(f"{datetime.datetime.now()} - Error in db_connect: {err}\n")
\ No newline at end of file
+                fs.write(f"{datetime.datetime.now()}  Error while starting the daemon: {err}\n")
+        if config is not None:
+            import daemon
+            daemon.serve(config,run,all_deps)
+    else:
+        run(sys.argv[1:])
@@ -0,0 +1,402 @@
+'''
+description:
+backends.py holds the storage backends tables.py loads into, chosen by "backend" in the
+"database" section of config.json. A backend opens connections, turns the schema.json spec
+into DDL, upserts a validated DataFrame with its fastest native path and fetches keys.
+  mysql  - pooled mysql.connector connections and the loader.py strategies (the default)
+  sqlite - an embedded file ("path"), in WAL mode; every load is one transaction of
+           INSERT ... ON CONFLICT DO UPDATE rows sent with executemany
+  duckdb - an embedded file ("path"); a DataFrame is registered as a view and upserted in one
+           INSERT ... SELECT ... ON CONFLICT DO UPDATE, without converting it row by row
+The embedded backends need no server, so the whole pipeline runs locally and in CI.
+'''
+
+#importing modules
+import threading
+from contextlib import contextmanager
+import loader
+
+BACKENDS = ("mysql", "sqlite", "duckdb")
+
+
+def constraint_name(table: str, col: str, foreign_keys: dict):
+    """ Name of the foreign key constraint of table on col (foreign_keys are all of the table's)."""
+
+    return f"{table}_fk" if len(foreign_keys) <= 1 else f"{table}_{col}_fk"
+
+
+def staging_name(table: str):
+    return f"{table}__staging"
+
+
+class Backend:
+    """ What every backend shares: identifier quoting, DDL from the spec and key fetches."""
+
+    name = None
+    # parameter marker of the driver
+    placeholder = "?"
+    # how REPLACE INTO and the current time are spelled
+    replace = "insert or replace into"
+    now = "CURRENT_TIMESTAMP"
+    # whether the foreign keys of schema.json are declared in the tables (and in the staging tables)
+    foreign_keys = True
+    staging_foreign_keys = True
+    # whether the database deletes child rows through on delete cascade (SQLite only enforces foreign keys
+    # with PRAGMA foreign_keys, which would also cascade the DROP TABLE of a swap; DuckDB declares none)
+    cascades = False
+    # DROP TABLE and ALTER TABLE ... RENAME can be committed or rolled back together
+    transactional_ddl = True
+    # number of tables loaded at the same time (None: one per pooled connection)
+    writers = 1
+    audit_columns = []
+
+    def __init__(self, options: dict):
+        self.options = options
+
+    def q(self, identifier: str):
+        return f"`{identifier}`"
+
+    def column_type(self, sql: str):
+        """ The column type of this backend for the MySQL type in schema.json."""
+
+        return sql
+
+    def foreign_key_sql(self, table: str, col: str, parent: str, foreign_keys: dict):
+        return (f"constraint {constraint_name(table, col, foreign_keys)} foreign key ({self.q(col)}) "
+                f"references {self.q(parent)}(id) on delete cascade")
+
+    def create_table_sql(self, table: str, columns: dict, foreign_keys: dict, staging: bool = False):
+        """
+        The create table statement of one table: columns ({column: {"sql": ...}}) of schema.json,
+        foreign_keys ({column: parent table}) and the audit columns. A staging table is named
+        <table>__staging and only keeps its foreign keys on backends with staging_foreign_keys.
+        """
+
+        lines = [f"{self.q(col.replace('.', '_'))} {self.column_type(column['sql'])}" for col, column in columns.items()]
+        # columns before constraints, as SQLite requires
+        lines.extend(self.audit_columns)
+        if self.foreign_keys and (self.staging_foreign_keys or not staging):
+            for col, parent in foreign_keys.items():
+                lines.append(self.foreign_key_sql(table, col, parent, foreign_keys))
+        body = ",\n    ".join(lines)
+        return f"create table if not exists {self.q(staging_name(table) if staging else table)} (\n    {body}\n);"
+
+    def execute_script(self, cursor, statements: list):
+        """ Run several statements, in one round trip where the driver allows it."""
+
+        cursor.execute("\n".join(statements))
+
+    def column_names(self, cursor, name: str):
+        """ The columns of table name, read from the catalog (empty when the table does not exist)."""
+
+        cursor.execute(f"SELECT column_name FROM information_schema.columns WHERE table_name = {self.placeholder};", (name,))
+        return {row[0] for row in cursor.fetchall()}
+
+    def fetch_keys(self, cursor, name: str, batch_size: int = 100000):
+        """ Every id of table name as an int64 numpy array, batch_size rows per fetch."""
+
+        import numpy as np
+        cursor.execute(f"SELECT id FROM {self.q(name)};")
+        parts = []
+        rows = cursor.fetchmany(batch_size)
+        while rows:
+            parts.append(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+            rows = cursor.fetchmany(batch_size)
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def swap_tables(self, conn, cursor, names: list):
+        """ Replace every table of names by its staging table in one transaction."""
+
+        self.begin(cursor)
+        for name in reversed(names):
+            cursor.execute(f"DROP TABLE IF EXISTS {self.q(name)};")
+        for name in names:
+            cursor.execute(f"ALTER TABLE {self.q(staging_name(name))} RENAME TO {self.q(name)};")
+        conn.commit()
+
+    def begin(self, cursor):
+        pass
+
+    def upsert_sql(self, name: str, columns: list, source: str):
+        """ INSERT ... ON CONFLICT (id) DO UPDATE of columns from source (a VALUES list or a SELECT)."""
+
+        columns_sql = [self.q(col) for col in columns]
+        updates = ", ".join(f"{col} = excluded.{col}" for col in columns_sql if col != self.q("id"))
+        return (f"INSERT INTO {self.q(name)} ({', '.join(columns_sql)}) {source} "
+                f"ON CONFLICT (id) DO UPDATE SET {updates}, updated_at = {self.now};")
+
+
+class MySQLBackend(Backend):
+    """ MySQL over a process-wide mysql.connector pool, loaded with the loader.py strategies."""
+
+    name = "mysql"
+    placeholder = "%s"
+    replace = "replace into"
+    staging_foreign_keys = False
+    cascades = True
+    transactional_ddl = False
+    writers = None
+    audit_columns = [
+        'created_by VARCHAR(255) DEFAULT "Bavani Kishore"',
+        'created_at DATETIME DEFAULT CURRENT_TIMESTAMP',
+        'updated_by VARCHAR(255) DEFAULT "Bavani Kishore"',
+        'updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP',
+    ]
+
+    def __init__(self, options: dict):
+        super().__init__(options)
+        self.pool = None
+        self.database_ready = False
+        self._lock = threading.Lock()
+
+    def column_names(self, cursor, name: str):
+        cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s;", (name,))
+        return {row[0] for row in cursor.fetchall()}
+
+    def ensure_database(self):
+        """ Create the database once per process, over a temporary connection without a database."""
+        if self.database_ready:
+            return
+        import mysql.connector
+        tmp = mysql.connector.connect(
+            host=self.options['host'],
+            user=self.options['user'],
+            password=self.options['password']
+        )
+        tmp_cursor = tmp.cursor()
+        # create DB (use backticks to protect identifier)
+        tmp_cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.options['db']}`;")
+        tmp.commit()   # safe to call
+        tmp.close()
+        self.database_ready = True
+
+    def get_pool(self):
+        """
+        Return the process-wide connection pool, creating it on first use.
+        The pool lives as long as the process, so repeated runs (daemon mode) reuse its connections.
+        """
+        with self._lock:
+            if self.pool is None:
+                import mysql.connector
+                from mysql.connector import pooling, errorcode
+                options = dict(
+                    pool_name="etl",
+                    pool_size=int(self.options.get('pool_size', 5)),
+                    host=self.options['host'],
+                    user=self.options['user'],
+                    password=self.options['password'],
+                    database=self.options['db'],
+                    # needed by the bulk loader strategy (LOAD DATA LOCAL INFILE)
+                    allow_local_infile=self.options.get('local_infile', False)
+                )
+                try:
+                    self.pool = pooling.MySQLConnectionPool(**options)
+                except mysql.connector.Error as err:
+                    if err.errno != errorcode.ER_BAD_DB_ERROR:
+                        raise
+                    # only the first run against a server creates the database, over a temporary connection
+                    self.ensure_database()
+                    self.pool = pooling.MySQLConnectionPool(**options)
+            return self.pool
+
+    @contextmanager
+    def connection(self):
+        """ Borrow a pooled connection, checked with a ping (reconnecting if needed), and give it back afterwards."""
+        conn = self.get_pool().get_connection()
+        try:
+            conn.ping(reconnect=True, attempts=3, delay=1)
+            yield conn
+        finally:
+            conn.close()  # returns the connection to the pool
+
+    def execute_script(self, cursor, statements: list):
+        script = "\n".join(statements)
+        try:
+            results = cursor.execute(script, multi=True)
+        except TypeError:
+            # mysql-connector 9.2+ runs multi-statement strings without multi=True; results are walked with nextset
+            cursor.execute(script)
+            while cursor.nextset():
+                pass
+        else:
+            for _ in results or ():
+                pass
+
+    def upsert(self, conn, cursor, df, name: str, options: dict):
+        loader.load(conn, cursor, df, name, options)
+
+
+class SQLiteBackend(Backend):
+    """ An embedded SQLite file; one connection per load, WAL so readers never wait on a load."""
+
+    name = "sqlite"
+    audit_columns = [
+        "created_by VARCHAR(255) DEFAULT 'Bavani Kishore'",
+        "created_at DATETIME DEFAULT CURRENT_TIMESTAMP",
+        "updated_by VARCHAR(255) DEFAULT 'Bavani Kishore'",
+        "updated_at DATETIME DEFAULT CURRENT_TIMESTAMP",
+    ]
+
+    def column_names(self, cursor, name: str):
+        cursor.execute(f"PRAGMA table_info({self.q(name)});")
+        return {row[1] for row in cursor.fetchall()}
+
+    def column_type(self, sql: str):
+        # an INTEGER PRIMARY KEY is the rowid itself: no separate primary key index to maintain
+        return "integer primary key" if sql.lower() == "int primary key" else sql
+
+    @contextmanager
+    def connection(self):
+        import sqlite3
+        conn = sqlite3.connect(self.options.get("path", "./etl.sqlite"), timeout=60, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = NORMAL;")
+            yield conn
+        finally:
+            conn.close()
+
+    def begin(self, cursor):
+        cursor.execute("BEGIN;")
+
+    def execute_script(self, cursor, statements: list):
+        cursor.executescript("\n".join(statements))
+
+    def upsert(self, conn, cursor, df, name: str, options: dict):
+        """ All rows of df in one transaction, one executemany of INSERT ... ON CONFLICT DO UPDATE."""
+
+        columns = [col.replace('.', '_') for col in df.columns]
+        source = f"VALUES ({', '.join([self.placeholder] * len(columns))})"
+        cursor.executemany(self.upsert_sql(name, columns, source), loader.to_params(df))
+        conn.commit()
+
+
+class DuckDBSession:
+    """
+    A DuckDB connection used the way tables.py uses a DB-API connection: cursor() returns the
+    session itself and every commit() starts the next explicit transaction.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.conn.begin()
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql: str, params=None):
+        try:
+            self.conn.execute(sql, params) if params is not None else self.conn.execute(sql)
+        except Exception:
+            # a failed statement aborts the transaction; start a new one for the next statement
+            self.rollback()
+            raise
+        return self
+
+    def executemany(self, sql: str, params):
+        self.conn.executemany(sql, params)
+
+    def fetchone(self):
+        return self.conn.fetchone()
+
+    def fetchmany(self, size: int):
+        return self.conn.fetchmany(size)
+
+    def fetchall(self):
+        return self.conn.fetchall()
+
+    def register(self, view: str, df):
+        self.conn.register(view, df)
+
+    def unregister(self, view: str):
+        self.conn.unregister(view)
+
+    def commit(self):
+        self.conn.commit()
+        self.conn.begin()
+
+    def rollback(self):
+        self.conn.rollback()
+        self.conn.begin()
+
+    def close(self):
+        pass
+
+
+class DuckDBBackend(Backend):
+    """
+    An embedded DuckDB file, opened once per process; every load gets a cursor of its own.
+    DuckDB cannot upsert a parent row that other rows reference, so its tables declare no
+    foreign keys: the dq checks already guarantee them.
+    """
+
+    name = "duckdb"
+    now = "now()"
+    foreign_keys = False
+    audit_columns = [
+        "created_by VARCHAR DEFAULT 'Bavani Kishore'",
+        "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+        "updated_by VARCHAR DEFAULT 'Bavani Kishore'",
+        "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    ]
+
+    def __init__(self, options: dict):
+        super().__init__(options)
+        self.db = None
+        self._lock = threading.Lock()
+
+    def q(self, identifier: str):
+        return f'"{identifier}"'
+
+    @contextmanager
+    def connection(self):
+        import duckdb
+        with self._lock:
+            if self.db is None:
+                self.db = duckdb.connect(self.options.get("path", "./etl.duckdb"))
+        session = DuckDBSession(self.db.cursor())
+        try:
+            yield session
+        finally:
+            session.conn.rollback()
+            session.conn.close()
+
+    def upsert(self, conn, cursor, df, name: str, options: dict):
+        """
+        Register df as a view and upsert it in one INSERT ... SELECT, scanned by DuckDB in place.
+        With pyarrow, df is handed over as an Arrow table (Arrow-backed strings are not copied),
+        and an empty table gets a plain INSERT, which skips the conflict checks.
+        """
+
+        import importlib.util
+        import pandas as pd
+        columns = [col.replace('.', '_') for col in df.columns]
+        frame = df.set_axis(columns, axis=1)
+        for col in columns:
+            # integer ids kept as categories are scanned as their integer values
+            if isinstance(frame[col].dtype, pd.CategoricalDtype):
+                frame[col] = frame[col].astype(frame[col].dtype.categories.dtype)
+        if importlib.util.find_spec("pyarrow"):
+            import pyarrow as pa
+            frame = pa.Table.from_pandas(frame, preserve_index=False)
+        view = f"{name}__frame"
+        cursor.register(view, frame)
+        try:
+            source = f"SELECT {', '.join(self.q(col) for col in columns)} FROM {self.q(view)}"
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {self.q(name)});")
+            if cursor.fetchone()[0]:
+                cursor.execute(self.upsert_sql(name, columns, source))
+            else:
+                cursor.execute(f"INSERT INTO {self.q(name)} ({', '.join(self.q(col) for col in columns)}) {source};")
+            conn.commit()
+        finally:
+            cursor.unregister(view)
+
+
+def get_backend(options: dict):
+    """ The backend of the "database" section of config.json ("backend", default mysql)."""
+
+    kind = options.get("backend", "mysql")
+    if kind not in BACKENDS:
+        raise ValueError(f"unknown database backend {kind}, expected one of {BACKENDS}")
+    return {"mysql": MySQLBackend, "sqlite": SQLiteBackend, "duckdb": DuckDBBackend}[kind](options)
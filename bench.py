@@ -0,0 +1,153 @@
+'''
+description:
+bench.py times the pipeline on the files written by datagen.py and reports rows/sec and peak RSS
+for every step: reading each source file, each dq.py check on its own, each table's full rule
+chain (engine.py), and the load stage. The load runs against a local SQLite file by default (or a
+DuckDB file with --load duckdb) through the backends of backends.py, so no MySQL server is needed;
+--load mysql uses tables.inserting_frame and config.json instead.
+
+usage: python3 datagen.py --users 20000 --out ./bench_data
+       python3 bench.py --data ./bench_data --json bench.json
+'''
+
+#importing modules
+import os
+import json
+import time
+import argparse
+import dq
+import engine
+import metrics
+import sink
+import schema
+import reader
+import backends
+
+# the checks of the original per-table chains, timed one by one
+DQ_CHECKS = {
+    "posts": [("primary_key_check_num", "id"), ("fk_id_check", "userId", "users"),
+              ("title_check_to_untitled", "title"), ("comment_body_blank_drop", "body")],
+    "comments": [("primary_key_check_num", "id"), ("fk_id_check", "postId", "posts"),
+                 ("name_check_to_anonymous", "name"), ("email_check_blank", "email"),
+                 ("comment_body_blank_drop", "body")],
+    "albums": [("primary_key_check_num", "id"), ("fk_id_check", "userId", "users"),
+               ("title_check_to_untitled", "title")],
+    "photos": [("primary_key_check_num", "id"), ("fk_id_check", "albumId", "albums"),
+               ("title_check_to_untitled", "title"), ("url_check_drop", "url"),
+               ("url_check_null", "thumbnailUrl")],
+    "todos": [("fk_id_check", "userId", "users"), ("primary_key_check_num", "id"),
+              ("title_check_to_drop", "title"), ("bool_check", "completed")],
+}
+
+
+def reset_peak_rss():
+    """ Reset the kernel's peak RSS counter (Linux); elsewhere the peak only grows."""
+
+    try:
+        with open("/proc/self/clear_refs", "w") as fs:
+            fs.write("5")
+    except OSError:
+        pass
+
+
+class Bench:
+    """ Collect one result row per timed step."""
+
+    def __init__(self):
+        self.results = []
+
+    def time(self, stage: str, table: str, step: str, rows, fn, *args):
+        """ Time fn(*args); rows=None counts the rows of the result instead of the input."""
+
+        reset_peak_rss()
+        start = time.perf_counter()
+        out = fn(*args)
+        seconds = time.perf_counter() - start
+        if rows is None:
+            rows = len(out)
+        self.results.append({
+            "stage": stage, "table": table, "step": step, "rows": rows,
+            "seconds": round(seconds, 6),
+            "rows_per_sec": round(rows / seconds) if seconds > 0 else None,
+            "peak_rss_mb": round(metrics.peak_rss_mb(), 1),
+        })
+        return out
+
+    def report(self):
+        print(f"{'stage':8s} {'table':9s} {'step':32s} {'rows':>10s} {'seconds':>9s} {'rows/s':>12s} {'peak MB':>8s}")
+        for r in self.results:
+            print(f"{r['stage']:8s} {r['table']:9s} {r['step']:32s} {r['rows']:>10d} {r['seconds']:>9.3f} "
+                  f"{r['rows_per_sec'] or 0:>12d} {r['peak_rss_mb']:>8.1f}")
+
+
+def backend_load(backend, conn, cursor, df, name: str, spec: dict):
+    """ Recreate table name from schema.json in an embedded backend and upsert df with its native path."""
+
+    cursor.execute(f"DROP TABLE IF EXISTS {backend.q(name)};")
+    cursor.execute(backend.create_table_sql(name, spec["columns"], spec.get("foreign_keys", {})))
+    backend.upsert(conn, cursor, df, name, {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL on datagen.py output.")
+    parser.add_argument("--data", default="./bench_data", help="folder written by datagen.py")
+    parser.add_argument("--rules", default="rules.json")
+    parser.add_argument("--schema", default="schema.json", help="dtype schema applied when reading; 'none' for default inference")
+    parser.add_argument("--engine", choices=reader.ENGINES, default="pandas", help="CSV reader engine (reader.py)")
+    parser.add_argument("--load", choices=("sqlite", "duckdb", "mysql", "none"), default="sqlite")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    sink.configure({"rejections": {"path": os.path.join(args.data, "rejections.jsonl")}})
+    rules = engine.compile_rules(engine.load_rules({"rulespath": args.rules}))
+    schemas = schema.load_schema({"schemapath": args.schema}) if args.schema != "none" else {}
+    reader.configure({"reader": {"engine": args.engine}})
+    bench = Bench()
+
+    # extract
+    raw = {}
+    for name in ["users"] + list(DQ_CHECKS):
+        path = os.path.join(args.data, f"{name}.csv")
+        raw[name] = bench.time("extract", name, f"read_csv({args.engine})", None, reader.read_csv, path, schemas.get(name))
+
+    # every dq check on its own, on the raw table
+    for name, checks in DQ_CHECKS.items():
+        for check in checks:
+            fn = getattr(dq, check[0])
+            df = raw[name].copy()
+            if check[0] == "fk_id_check":
+                bench.time("dq", name, f"{check[0]}({check[1]})", len(df), fn, df, check[1], name, raw[check[2]], "id")
+            else:
+                bench.time("dq", name, f"{check[0]}({check[1]})", len(df), fn, df, check[1], name)
+
+    # the full rule chain of every table
+    keys = {}
+    validated = {}
+    for name in ["users"] + list(DQ_CHECKS):
+        df = raw[name]
+        validated[name] = bench.time("chain", name, "engine.run_table", len(df), engine.run_table,
+                                     df, name, rules.get(name, []), keys)
+        keys[name] = validated[name]["id"]
+    sink.get_sink().close()
+
+    # load
+    if args.load in ("sqlite", "duckdb"):
+        backend = backends.get_backend({"backend": args.load, "path": os.path.join(args.data, f"bench.{args.load}")})
+        spec = schema.load_spec({"schemapath": args.schema if args.schema != "none" else "schema.json"})
+        with backend.connection() as conn:
+            cursor = conn.cursor()
+            for name, df in validated.items():
+                bench.time("load", name, f"{args.load} upsert", len(df), backend_load, backend, conn, cursor, df, name, spec[name])
+    elif args.load == "mysql":
+        import tables as t
+        for name, df in validated.items():
+            bench.time("load", name, "tables.inserting_frame", len(df), t.inserting_frame, df, name)
+
+    bench.report()
+    if args.json:
+        with open(args.json, "w") as fs:
+            json.dump(bench.results, fs, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+'''
+description:
+checkpoint.py makes loads resumable ("checkpoint": {"enabled": true}).
+Before a table is loaded, its validated rows are spilled to <path>/<table>.pkl and a
+checkpoint <path>/<table>.json records the hash of its source file and of the source files of
+its ancestor tables (whose keys its foreign keys were checked against). The loader then commits
+commit_rows rows at a time and, after every commit, records the number of committed batches
+and rows and the last id in the checkpoint (written with an atomic rename).
+When a run fails, the next run finds the checkpoints: a table whose source file and ancestor
+files are unchanged is not read or checked again; its spilled rows are loaded from the first uncommitted batch,
+and a table that was already loaded completely is skipped. Checkpoints are cleared once a
+run has loaded every table.
+'''
+
+#importing modules
+import os
+import json
+import datetime
+import threading
+import pandas as pd
+from incremental import file_fingerprint
+
+DEFAULT_OPTIONS = {"enabled": False, "path": "./state/checkpoints", "commit_rows": 50000}
+
+
+class CheckpointStore:
+    """ One checkpoint (and one spilled frame) per table under path."""
+
+    def __init__(self, path: str = "./state/checkpoints", commit_rows: int = 50000):
+        self.path = path
+        self.commit_rows = commit_rows
+        self._lock = threading.Lock()
+        # hash of every source file, computed once per run
+        self._hashes = {}
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, name: str, suffix: str):
+        return os.path.join(self.path, f"{name}.{suffix}")
+
+    def get(self, name: str):
+        """ The checkpoint of a table, or None."""
+
+        if not os.path.exists(self.file(name, "json")):
+            return None
+        with open(self.file(name, "json"), "r") as file:
+            return json.load(file)
+
+    def fingerprint(self, src: str):
+        if src not in self._hashes:
+            self._hashes[src] = file_fingerprint(src)["hash"]
+        return self._hashes[src]
+
+    def fingerprints(self, srcs: dict):
+        """ {table: hash of its source file} for {table: source file}, e.g. the ancestors of a table."""
+
+        return {name: self.fingerprint(src) for name, src in srcs.items()}
+
+    def _same_sources(self, entry: dict, source_hash: str, parents: dict):
+        # a checkpoint written before parent hashes were recorded has none and is not trusted
+        return entry["source_hash"] == source_hash and entry.get("parents") == (parents or {})
+
+    def done(self, name: str, source_hash: str, parents: dict = None):
+        """ True when the table was loaded completely from the same source files by the failed run."""
+
+        entry = self.get(name)
+        return entry is not None and entry["done"] and self._same_sources(entry, source_hash, parents)
+
+    def resume(self, name: str, source_hash: str, parents: dict = None):
+        """
+        The validated rows of an interrupted load of the same source file, as (DataFrame of all rows,
+        number of rows already committed); None when there is nothing to resume.
+        A checkpoint of another version of the source file, or of the files of its ancestors
+        (parents: {table: hash}), is discarded, since its rows were checked against other keys.
+        """
+
+        entry = self.get(name)
+        if entry is None or entry["done"]:
+            return None
+        if not self._same_sources(entry, source_hash, parents) or not os.path.exists(self.file(name, "pkl")):
+            self.discard(name)
+            return None
+        return pd.read_pickle(self.file(name, "pkl")), entry["rows"]
+
+    def begin(self, name: str, source_hash: str, df, parents: dict = None):
+        """ Spill the validated rows of a table and start its checkpoint (nothing committed yet)."""
+
+        df.to_pickle(self.file(name, "pkl"))
+        self._write(name, {"table": name, "source_hash": source_hash, "parents": parents or {}, "total": len(df),
+                           "batches": 0, "rows": 0, "last_id": None, "done": False})
+
+    def advance(self, name: str, rows: int, last_id):
+        """ Record one more committed batch of rows (called right after the commit)."""
+
+        entry = self.get(name)
+        if entry is None:
+            return
+        entry["batches"] += 1
+        entry["rows"] += rows
+        entry["last_id"] = None if pd.isna(last_id) else int(last_id)
+        self._write(name, entry)
+
+    def finish(self, name: str):
+        """ Mark a table as completely loaded; its spilled rows are no longer needed."""
+
+        entry = self.get(name)
+        if entry is None:
+            return
+        entry["done"] = True
+        self._write(name, entry)
+        if os.path.exists(self.file(name, "pkl")):
+            os.remove(self.file(name, "pkl"))
+
+    def discard(self, name: str):
+        for suffix in ("json", "pkl"):
+            if os.path.exists(self.file(name, suffix)):
+                os.remove(self.file(name, suffix))
+
+    def clear(self):
+        """ Remove every checkpoint (the run loaded all of its tables)."""
+
+        for entry in os.listdir(self.path):
+            if entry.endswith((".json", ".pkl")):
+                os.remove(os.path.join(self.path, entry))
+
+    def _write(self, name: str, entry: dict):
+        entry["updated_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        tmp = self.file(name, "json.tmp")
+        with self._lock:
+            with open(tmp, "w") as file:
+                json.dump(entry, file, indent=2)
+            os.replace(tmp, self.file(name, "json"))
+
+
+def configure(config: dict):
+    """ The CheckpointStore of the "checkpoint" section of config.json, or None when it is disabled."""
+
+    options = dict(DEFAULT_OPTIONS)
+    options.update(config.get("checkpoint", {}))
+    if not options["enabled"]:
+        return None
+    return CheckpointStore(options["path"], int(options["commit_rows"]))
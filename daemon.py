@@ -0,0 +1,133 @@
+'''
+description:
+daemon.py keeps the ETL running in one process ("python3 app.py --daemon"), so the imports, the
+parsed config, the compiled rules and dtype schemas, the pooled MySQL connections and the key
+sets of every table stay warm between runs. The source files of srcpath are polled (and, when the
+inotify_simple package is installed, their directories are watched so a new file wakes the daemon
+at once). A changed file is taken once its size and mtime have not moved for "debounce" seconds,
+and files that land together are coalesced into one run of their tables and every table that
+depends on them through a foreign key.
+'''
+
+#importing modules
+import os
+import time
+import datetime
+
+DEFAULT_OPTIONS = {"interval": 1.0, "debounce": 2.0, "full_every": None}
+
+
+def options_for(config: dict):
+    options = dict(DEFAULT_OPTIONS)
+    options.update(config.get("daemon", {}))
+    return options
+
+
+def stat(path: str):
+    """ (size, mtime) of a file, or None while it does not exist."""
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def dependents(names, deps: dict):
+    """ names plus every table that depends on one of them, directly or through other tables."""
+
+    affected = set(names)
+    grown = True
+    while grown:
+        grown = False
+        for name, parents in deps.items():
+            if name not in affected and parents & affected:
+                affected.add(name)
+                grown = True
+    return affected
+
+
+class Watcher:
+    """ Reports the tables whose source file changed and then stayed unchanged for debounce seconds."""
+
+    def __init__(self, paths: dict, debounce: float = 2.0):
+        self.paths = paths
+        self.debounce = debounce
+        self.seen = {name: stat(path) for name, path in paths.items()}
+        # tables with a changed file: (last stat, when it was last seen changing)
+        self.pending = {}
+
+    def poll(self):
+        """
+        The set of tables whose new file has settled. Nothing is returned while another changed
+        file is still being written, so files dropped together are handed over in one batch.
+        """
+
+        now = time.monotonic()
+        for name, path in self.paths.items():
+            current = stat(path)
+            if current == self.seen[name] or current is None:
+                self.pending.pop(name, None)
+            elif name not in self.pending or self.pending[name][0] != current:
+                self.pending[name] = (current, now)
+
+        if not self.pending or any(now - since < self.debounce for _, since in self.pending.values()):
+            return set()
+        ready = set(self.pending)
+        for name, (current, _) in self.pending.items():
+            self.seen[name] = current
+        self.pending.clear()
+        return ready
+
+
+class Wakeup:
+    """
+    Sleeps between polls. With inotify_simple installed, a file closed or moved into one of the
+    watched directories ends the sleep early; otherwise it is a plain time.sleep.
+    """
+
+    def __init__(self, paths: dict):
+        self.inotify = None
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            return
+        self.inotify = INotify()
+        for directory in {os.path.dirname(os.path.abspath(path)) for path in paths.values()}:
+            if os.path.isdir(directory):
+                self.inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+
+    def wait(self, seconds: float):
+        if self.inotify is None:
+            time.sleep(seconds)
+        else:
+            self.inotify.read(timeout=int(seconds * 1000))
+
+
+def serve(config: dict, run, deps: dict):
+    """
+    Run every table once, then call run(tables) for the tables affected by every batch of settled source files, forever.
+    deps is {table: set of parent tables}. With "full_every" (seconds) every table is also run on that schedule.
+    """
+
+    options = options_for(config)
+    watcher = Watcher(config["srcpath"], float(options["debounce"]))
+    wakeup = Wakeup(config["srcpath"])
+    # a first run catches up with the source files; files that land meanwhile are seen by the watcher
+    run(sorted(deps))
+    last_full = time.monotonic()
+    while True:
+        try:
+            changed = watcher.poll()
+            if options["full_every"] and time.monotonic() - last_full >= float(options["full_every"]):
+                changed = set(config["srcpath"])
+                last_full = time.monotonic()
+            if changed:
+                tables = dependents(changed, deps)
+                with open("error.txt", "a") as fs:
+                    fs.write(f"{datetime.datetime.now()} New source files for {', '.join(sorted(changed))}, running {', '.join(sorted(tables))}\n")
+                run(sorted(tables))
+        except Exception as err:
+            with open("error.txt", "a") as fs:
+                fs.write(f"{datetime.datetime.now()} Error in the daemon: {err}\n")
+        wakeup.wait(float(options["interval"]))
@@ -0,0 +1,143 @@
+'''
+description:
+datagen.py writes scaled, synthetic versions of the six source files (users, posts, comments,
+albums, photos, todos) with the same columns as src/, for benchmarking.
+Row counts follow the JSONPlaceholder ratios (10 posts, 10 albums and 20 todos per user,
+5 comments per post, 50 photos per album) and a controllable fraction of rows gets each
+defect the rules look for: null titles, bad emails, bad URLs, duplicate ids, orphan foreign
+keys and non-boolean completed values.
+
+usage: python3 datagen.py --users 20000 --defects 0.02 --out ./bench_data
+'''
+
+#importing modules
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+RATIOS = {"posts": 10, "albums": 10, "todos": 20, "comments": 5, "photos": 50}
+DEFECTS = ("null_title", "bad_email", "bad_url", "duplicate_id", "orphan_fk", "bad_bool")
+WORDS = np.array("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+                 "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud".split())
+
+
+def words(rng, n: int, count: int):
+    """ n strings of count random words each."""
+
+    picks = WORDS[rng.integers(0, len(WORDS), size=(n, count))]
+    return pd.Series(picks[:, 0]).str.cat([pd.Series(picks[:, i]) for i in range(1, count)], sep=" ")
+
+
+def defect_mask(rng, n: int, fraction: float):
+    return rng.random(n) < fraction
+
+
+def add_defects(df, rng, fractions: dict, fk: str = None, parent_max: int = 0):
+    """ Apply the duplicate id and orphan FK defects shared by every child table."""
+
+    n = len(df)
+    dup = defect_mask(rng, n, fractions["duplicate_id"])
+    dup[0] = False
+    # a duplicate takes the id of a random earlier row
+    df.loc[dup, "id"] = (rng.random(dup.sum()) * np.flatnonzero(dup)).astype(np.int64) + 1
+    if fk is not None:
+        orphan = defect_mask(rng, n, fractions["orphan_fk"])
+        df.loc[orphan, fk] = parent_max + 1 + rng.integers(0, 1000, orphan.sum())
+    return df
+
+
+def null_titles(df, rng, fraction: float, col: str = "title"):
+    df[col] = df[col].mask(defect_mask(rng, len(df), fraction))
+    return df
+
+
+def generate(users: int, fractions: dict, seed: int = 7):
+    """ Return {table: DataFrame} for the six schemas."""
+
+    rng = np.random.default_rng(seed)
+    frames = {}
+
+    ids = np.arange(1, users + 1)
+    names = words(rng, users, 2).str.title()
+    email = names.str.replace(" ", ".", regex=False) + "@example.com"
+    email = email.mask(defect_mask(rng, users, fractions["bad_email"]), names)
+    frames["users"] = add_defects(pd.DataFrame({
+        "id": ids,
+        "name": names,
+        "username": names.str.replace(" ", "_", regex=False),
+        "email": email,
+        "phone": pd.Series(rng.integers(10**9, 10**10, users)).astype(str),
+        "website": names.str.replace(" ", "", regex=False).str.lower() + ".org",
+        "address.street": words(rng, users, 2),
+        "address.suite": "Apt. " + pd.Series(rng.integers(1, 999, users)).astype(str),
+        "address.city": words(rng, users, 1).str.title(),
+        "address.zipcode": pd.Series(rng.integers(10000, 99999, users)).astype(str),
+        "address.geo.lat": rng.uniform(-90, 90, users).round(4),
+        "address.geo.lng": rng.uniform(-180, 180, users).round(4),
+        "company.name": words(rng, users, 1).str.title() + " LLC",
+        "company.catchPhrase": words(rng, users, 3),
+        "company.bs": words(rng, users, 3),
+    }), rng, fractions)
+
+    def child(name: str, fk: str, parent_count: int):
+        n = parent_count * RATIOS[name]
+        df = pd.DataFrame({fk: np.repeat(np.arange(1, parent_count + 1), RATIOS[name]), "id": np.arange(1, n + 1)})
+        return df, n
+
+    posts, n = child("posts", "userId", users)
+    posts["title"] = words(rng, n, 4)
+    posts["body"] = words(rng, n, 20).mask(defect_mask(rng, n, fractions["null_title"]))
+    frames["posts"] = add_defects(null_titles(posts, rng, fractions["null_title"]), rng, fractions, "userId", users)
+    post_count = n
+
+    comments, n = child("comments", "postId", post_count)
+    comments["name"] = words(rng, n, 3)
+    comments["email"] = (words(rng, n, 1) + "@example.net").mask(defect_mask(rng, n, fractions["bad_email"]), "not-an-email")
+    comments["body"] = words(rng, n, 15)
+    frames["comments"] = add_defects(comments, rng, fractions, "postId", post_count)
+
+    albums, n = child("albums", "userId", users)
+    albums["title"] = words(rng, n, 3)
+    frames["albums"] = add_defects(null_titles(albums, rng, fractions["null_title"]), rng, fractions, "userId", users)
+    album_count = n
+
+    photos, n = child("photos", "albumId", album_count)
+    photos["title"] = words(rng, n, 5)
+    colour = pd.Series(rng.integers(0, 0xFFFFFF, n)).map("{:06x}".format)
+    photos["url"] = ("https://via.placeholder.com/600/" + colour).mask(defect_mask(rng, n, fractions["bad_url"]), "via.placeholder")
+    photos["thumbnailUrl"] = ("https://via.placeholder.com/150/" + colour).mask(defect_mask(rng, n, fractions["bad_url"]), "n/a")
+    frames["photos"] = add_defects(null_titles(photos, rng, fractions["null_title"]), rng, fractions, "albumId", album_count)
+
+    todos, n = child("todos", "userId", users)
+    todos["title"] = words(rng, n, 4)
+    todos["completed"] = pd.Series(np.where(rng.random(n) < 0.5, "True", "False")).mask(defect_mask(rng, n, fractions["bad_bool"]), "maybe")
+    frames["todos"] = add_defects(null_titles(todos, rng, fractions["null_title"]), rng, fractions, "userId", users)
+    return frames
+
+
+def write(frames: dict, out: str):
+    """ Write every table as <out>/<table>.csv and return the srcpath mapping for config.json."""
+
+    os.makedirs(out, exist_ok=True)
+    paths = {}
+    for name, df in frames.items():
+        paths[name] = os.path.join(out, f"{name}.csv")
+        df.to_csv(paths[name], index=False)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate scaled synthetic source files for the ETL.")
+    parser.add_argument("--users", type=int, default=1000, help="number of users; other tables scale from it")
+    parser.add_argument("--defects", type=float, default=0.02, help="fraction of rows for every defect type")
+    for defect in DEFECTS:
+        parser.add_argument(f"--{defect.replace('_', '-')}", type=float, default=None, help=f"fraction for {defect} only")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", default="./bench_data")
+    args = parser.parse_args()
+
+    fractions = {d: getattr(args, d) if getattr(args, d) is not None else args.defects for d in DEFECTS}
+    frames = generate(args.users, fractions, args.seed)
+    for name, path in write(frames, args.out).items():
+        print(f"{name:9s} {len(frames[name]):>10d} rows  {path}")
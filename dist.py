@@ -0,0 +1,154 @@
+'''
+description:
+dist.py writes the validated tables to the dist folder as a side output.
+The loader gets the validated DataFrames directly, so dist files are only a copy for
+inspection or downstream use: they are written on a background thread, in CSV or in a
+binary format (Parquet/Feather, needs pyarrow), or not at all ("distformat": "none").
+At most queue_size writes wait for the thread; a further write waits until one is done, so a
+slow disk holds back the checks instead of keeping every pending DataFrame in memory.
+'''
+
+#importing modules
+import os
+import datetime
+import threading
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+
+FORMATS = ("csv", "parquet", "feather", "none")
+
+
+class DistWriter:
+    """
+    Queue dist writes on a single background thread, at most queue_size of them at a time.
+    One thread keeps the writes of a table in order, so chunks can be appended safely.
+    """
+
+    def __init__(self, fmt: str = "csv", queue_size: int = 2):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown dist format {fmt}, expected one of {FORMATS}")
+        self.fmt = fmt
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dist") if fmt != "none" else None
+        # one slot per queued or running write, freed when the write is done
+        self.slots = threading.BoundedSemaphore(max(1, queue_size))
+        self.futures = []
+        self.writers = {}
+
+    def path(self, path: str):
+        """ The dist path with the extension of the configured format."""
+
+        if self.fmt in ("csv", "none"):
+            return path
+        return os.path.splitext(path)[0] + "." + self.fmt
+
+    def write(self, df, path: str):
+        """ Write a whole table, replacing the previous file."""
+
+        if self.executor is not None:
+            self._submit(self._write, df, self.path(path), False)
+
+    def merge(self, df, path: str, deleted=None):
+        """
+        Merge the new or changed rows of an incremental run into the previous file: rows with the
+        same id are replaced, ids in deleted are removed and the rest of the file is kept.
+        """
+
+        if self.executor is not None:
+            self._submit(self._merge, df, self.path(path), deleted)
+
+    def append(self, df, path: str):
+        """ Append one chunk of a table; the first chunk of a path replaces the previous file."""
+
+        if self.executor is not None:
+            self._submit(self._write, df, self.path(path), True)
+
+    def _submit(self, fn, *args):
+        # waits while queue_size writes are pending, so their DataFrames are the only ones held
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(fn, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+
+    def _write(self, df, path: str, append: bool):
+        if not metrics.enabled:
+            return self._write_file(df, path, append)
+        with metrics.span("write", os.path.splitext(os.path.basename(path))[0], f"dist_{self.fmt}", rows_in=len(df)) as s:
+            before = os.path.getsize(path) if append and path in self.writers and os.path.exists(path) else 0
+            self._write_file(df, path, append)
+            s.bytes_written = os.path.getsize(path) - before
+
+    def _merge(self, df, path: str, deleted):
+        if os.path.exists(path):
+            import numpy as np
+            import pandas as pd
+            previous = self._read_file(path)
+            drop = pd.Index(df["id"].astype("string")).unique()
+            if deleted is not None and len(deleted):
+                drop = drop.append(pd.Index(np.asarray(deleted)).astype("string"))
+            previous = previous[~previous["id"].astype("string").isin(drop)]
+            df = pd.concat([previous, df], ignore_index=True)
+        self._write(df, path, False)
+
+    def _read_file(self, path: str):
+        import pandas as pd
+        if self.fmt == "csv":
+            return pd.read_csv(path)
+        if self.fmt == "parquet":
+            return pd.read_parquet(path)
+        return pd.read_feather(path)
+
+    def _write_file(self, df, path: str, append: bool):
+        if self.fmt == "csv":
+            first = not append or path not in self.writers
+            self.writers[path] = None
+            df.to_csv(path, mode="w" if first else "a", header=first, index=False)
+            return
+
+        import pyarrow as pa
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        # category columns are written as their values: the index width of a dictionary is set by the
+        # number of categories of each chunk, so a later chunk would not fit the schema of the first
+        for i, field in enumerate(arrow_table.schema):
+            if pa.types.is_dictionary(field.type):
+                arrow_table = arrow_table.set_column(i, field.name, arrow_table.column(i).cast(field.type.value_type))
+        if not append:
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                pq.write_table(arrow_table, path)
+            else:
+                import pyarrow.feather as feather
+                feather.write_feather(arrow_table, path)
+            return
+
+        if self.writers.get(path) is None:
+            schema = arrow_table.schema
+            if self.fmt == "parquet":
+                import pyarrow.parquet as pq
+                self.writers[path] = (pq.ParquetWriter(path, schema), schema)
+            else:
+                self.writers[path] = (pa.ipc.new_file(path, schema), schema)
+        writer, schema = self.writers[path]
+        # later chunks may infer other dtypes (e.g. int vs float), so follow the first chunk
+        writer.write_table(arrow_table.cast(schema))
+
+    def close(self):
+        """ Wait for the queued writes, log the failed ones and close the open writers."""
+
+        if self.executor is None:
+            return
+        for future in self.futures:
+            try:
+                future.result()
+            except Exception as err:
+                with open("error.txt", "a") as fs:
+                    fs.write(f"{datetime.datetime.now()} Error while writing dist output: {err}\n")
+        self.futures = []
+        for entry in self.writers.values():
+            if entry is not None:
+                entry[0].close()
+        self.writers = {}
+        self.executor.shutdown()
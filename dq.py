@@ -5,179 +5,187 @@ Date : 26/09/2025
 description:
 dq.py handles data quality checks before loading data into the database.
 It validates columns for nulls, data types, value ranges, and foreign key integrity.
-Invalid rows are logged and dropped to ensure clean, consistent data.
+Invalid rows are recorded in the rejection sink (sink.py) and dropped to ensure clean, consistent data.
 '''
 
 #importing modules
+import re
+import numpy as np
 import pandas as pd
 import datetime
+import patterncache
+from sink import get_sink
+from keyindex import KeyIndex
+import metrics
+
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+URL_PATTERN = r'https?://(?:www\.)?\S+|www\.\S+'
+PHONE_PATTERN = '^[0-9]{10}$'
 
 try:
-    def fk_id_check(df, col:str, table:str, parent_df, parent_key:str):
-        # Check: non-null, of type int, and value between 0 and 10 inclusive
+    # mask helpers shared by the check functions below and by engine.py
+    def valid_not_null(s):
+        return s.notnull()
+
+
+    def valid_primary_key(s):
+        # must be a number, not null and unique (every copy of a duplicated value is invalid)
+        if pd.api.types.is_numeric_dtype(s.dtype):
+            # a numeric column (e.g. Int32 from schema.py) only holds numbers and nulls
+            is_number = s.notnull()
+        elif pd.api.types.is_string_dtype(s.dtype) and not pd.api.types.is_object_dtype(s.dtype):
+            is_number = pd.Series(False, index=s.index)
+        else:
+            is_number = s.apply(lambda x: isinstance(x, (int, float)))
+        return is_number & s.notnull() & ~s.duplicated(keep=False)
+
+
+    def valid_fk(s, parent_keys):
+        # parent_keys is either a keyindex.KeyIndex or anything accepted by Series.isin
+        if hasattr(parent_keys, "contains"):
+            return s.notnull() & pd.Series(parent_keys.contains(s), index=s.index)
+        return s.notnull() & s.isin(parent_keys)
+
+
+    def valid_pattern(s, pattern):
+        # the regex runs once per distinct value and the verdicts are spread back with the codes;
+        # nulls never match
+        pattern = re.compile(pattern)
+        codes, uniques = pd.factorize(s)
+        values = pd.Series(uniques)
+        if not (pd.api.types.is_string_dtype(values.dtype) and not pd.api.types.is_object_dtype(values.dtype)):
+            values = values.astype(str)
+        cache = patterncache.get_cache()
+        if cache is not None:
+            verdicts = np.array(cache.verdicts(pattern, values), dtype=bool)
+        else:
+            verdicts = values.str.match(pattern, na=False).to_numpy(dtype=bool)
+        return pd.Series(np.append(verdicts, False)[codes], index=s.index)
+
+
+    def valid_bool(s):
+        if pd.api.types.is_bool_dtype(s.dtype):
+            # a boolean column (schema.py) holds nulls where the source value was not True/False
+            return s.notna()
+        return s.astype(str).isin(['True', 'False'])
+
+
+    @metrics.step("dq", table_arg=2)
+    def fk_id_check(df, col:str, table:str, parent_df, parent_key:str = "id"):
+        # parent_df is the parent DataFrame, or its keyindex.KeyIndex (then parent_key is not used)
+        # Step 1: the foreign key must be present
         is_valid = df[col].notnull()
-        df = df[is_valid].copy()
-        # Step 2: Log invalid rows from basic check
-        invalid_rows = df.loc[~is_valid].index.tolist()
-        with open('error.txt', 'a') as fs:
-            for k in invalid_rows:
-                fs.write(f'invalid {col} in {table} table in id {df.loc[k, "id"]} row dropped (invalid type or value out of range)\n')
-
-        # Step 3: Check foreign key existence in parent table
-        valid_fk_values = set(parent_df[parent_key])
-        is_fk_present = df[col].isin(valid_fk_values)
-
-        # Log missing FK references
-        with open('error.txt', 'a') as fs:
-            for k in df[~is_fk_present].index:
-                fs.write(f'{col} in {table} table in id {df.loc[k, "id"]} not found in parent table row dropped\n')
-
-        # Step 4: Keep only rows with valid FK references
+        get_sink().reject(df, ~is_valid, col, table, "fk_not_null", "drop")
+        df = df[is_valid]
+
+        # Step 2: Check foreign key existence in parent table, for the whole column at once
+        parent_keys = parent_df if isinstance(parent_df, KeyIndex) else KeyIndex(parent_df[parent_key])
+        is_fk_present = valid_fk(df[col], parent_keys)
+        get_sink().reject(df, ~is_fk_present, col, table, "fk_exists", "drop")
+
+        # Step 3: Keep only rows with valid FK references
         df = df[is_fk_present].copy()
-        # Drop invalid rows
         return df
 
 
+    @metrics.step("dq", table_arg=2)
     def primary_key_check_num(df, col:str, table:str):
-        # Condition: must be number (int or float) and not null
-        is_number = df[col].apply(lambda x: isinstance(x, (int, float)))
-        not_null = df[col].notnull()
-        # Check uniqueness (duplicated values are invalid)
-        is_unique = ~df[col].duplicated(keep=False)
-        # Combine conditions
-        is_valid = is_number & not_null & is_unique
-        # Get invalid row indexes
-        invalid_index = df[~is_valid].index.tolist()
-
-        # Log invalid rows
-        with open('error.txt', 'a') as fs:
-            for k in invalid_index:
-                fs.write(f'invalid {col}s in {table} table so row is dropped\n')
+        # Condition: must be number (int or float), not null and unique
+        is_valid = valid_primary_key(df[col])
+        get_sink().reject(df, ~is_valid, col, table, "primary_key", "drop")
 
         # Keep only valid rows
         df = df[is_valid].copy()
         return df
 
 
+    @metrics.step("dq", table_arg=2)
     def title_check_to_untitled(df,col :str, table :str):
         #checking for null values
         valid=df[col].notnull()
-        invalid_index=df[~valid].index.tolist()
-
-        with open('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f' blank {col} is changed to untitled task in table {table} with id {df.loc[k,"id"]} \n')
-                df.loc[k,col]='untitled'
+        get_sink().reject(df, ~valid, col, table, "not_null", "fill:untitled")
+        df.loc[~valid,col]='untitled'
         return df
 
+    @metrics.step("dq", table_arg=2)
     def title_check_to_drop(df,col :str, table :str):
         #checking for null values
         valid=df[col].notnull()
-        invalid_index=df[~valid].index.tolist()
-
-        with open('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f' blank {col} is changed to untitled task in table {table} with id {df.loc[k,"id"]} \n')
-        df = df[valid].copy()    
+        get_sink().reject(df, ~valid, col, table, "not_null", "drop")
+        df = df[valid].copy()
         return df
 
+    @metrics.step("dq", table_arg=2)
     def bool_check(df, col:str, table:str):
-        bools = df[col].astype(str)
-        is_valid = bools.isin(['True', 'False'])
-        invalid_index = df[~is_valid].index.tolist()
-        with open('error.txt', 'a') as fs:
-            for k in invalid_index:
-                fs.write(f'invalid boolean in {table} table at id {df.loc[k,"id"]} (value={df.loc[k, col]}) so row is dropped\n')
-        return df[is_valid].copy()    
+        is_valid = valid_bool(df[col])
+        get_sink().reject(df, ~is_valid, col, table, "boolean", "drop")
+        return df[is_valid].copy()
 
 
+    @metrics.step("dq", table_arg=2)
     def name_check_to_anonymous(df,col :str, table :str):
         #checking for null values
         valid=df[col].notnull()
-        invalid_index=df[~valid].index.tolist()
-        with open('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f' blank {col} is changed to anonymous in table {table} with id {df.loc[k,"id"]} \n')
-                df.loc[k,col]='anonymous'
+        get_sink().reject(df, ~valid, col, table, "not_null", "fill:anonymous")
+        df.loc[~valid,col]='anonymous'
         return df
 
 
+    @metrics.step("dq", table_arg=2)
     def email_check_drop(df,col :str, table :str):
-        pattern=r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        is_valid=df[col].astype(str).str.match(pattern,na=False)
-        invalid_index=df[~is_valid].index.tolist()
-        with open ('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f'invalide email in {table} table in id {df.loc[k,"id"]} so droped from table\n')
-            df.drop(k,axis='index')
-        return df
+        is_valid=valid_pattern(df[col],EMAIL_PATTERN)
+        get_sink().reject(df, ~is_valid, col, table, "email", "drop")
+        return df[is_valid].copy()
 
+    @metrics.step("dq", table_arg=2)
     def email_check_blank(df,col :str, table :str):
-        pattern=r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        is_valid=df[col].astype(str).str.match(pattern,na=False)
-        invalid_index=df[~is_valid].index.tolist()
-        with open ('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f'invalide email in {table} table in id {df.loc[k,"id"]} made it blank \n')
-                df.loc[k,col]=''
+        is_valid=valid_pattern(df[col],EMAIL_PATTERN)
+        get_sink().reject(df, ~is_valid, col, table, "email", "blank")
+        df.loc[~is_valid,col]=''
         return df
 
 
 
+    @metrics.step("dq", table_arg=2)
     def comment_body_blank_drop(df, col:str, table:str):
         valid = df[col].notnull()
-        invalid_index = df[~valid].index.tolist()
-        with open('error.txt', 'a') as fs:
-            for k in invalid_index:
-                fs.write(f'null body in {table} table at id {df.loc[k, "id"]} row is dropped\n')
+        get_sink().reject(df, ~valid, col, table, "not_null", "drop")
         df = df[valid].copy()
         return df
 
 
+    @metrics.step("dq", table_arg=2)
     def url_check_drop(df,col :str, table :str):
-        pattern=r'https?://(?:www\.)?\S+|www\.\S+'
-        is_valid=df[col].astype(str).str.match(pattern,na=False)
-        invalid_index=df[~is_valid].index.tolist()
-        with open ('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f'invalide url in {table} table in id {df.loc[k,"id"]} so droped from table\n')
-                df.drop(k,axis='index')
-        return df
+        is_valid=valid_pattern(df[col],URL_PATTERN)
+        get_sink().reject(df, ~is_valid, col, table, "url", "drop")
+        return df[is_valid].copy()
 
 
+    @metrics.step("dq", table_arg=2)
     def url_check_null(df,col :str, table :str):
-        pattern=r'https?://(?:www\.)?\S+|www\.\S+'
-        is_valid=df[col].astype(str).str.match(pattern,na=False)
-        invalid_index=df[~is_valid].index.tolist()
-        with open ('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f"invalide thumbnailUrl in {table} table in id {df.loc[k,'id']} so replace it with a common url \n ")
-                df.loc[k,col]='https://surl.li/yfoimd'
+        is_valid=valid_pattern(df[col],URL_PATTERN)
+        get_sink().reject(df, ~is_valid, col, table, "url", "fill:default_url")
+        df.loc[~is_valid,col]='https://surl.li/yfoimd'
         return df
 
 
+    @metrics.step("dq", table_arg=2)
     def username_check_fill(df,col :str, table :str):
         valid=df[col].notnull()
-        invalid=df[~valid].index.tolist()
-        with open ('error.txt','a') as fs:
-            for k in invalid:
-                fs.write(f"invalide usernames in {table} table in id {df.loc[k,'id']} so replace it with a {df.loc[k,'name']+str(df.loc[k,'name'])} \n ")
-                df.loc[k,col]=df.loc[k,'name']+str(df.loc[k,'name'])
+        get_sink().reject(df, ~valid, col, table, "not_null", "fill:name")
+        df.loc[~valid,col]=df.loc[~valid,'name']+df.loc[~valid,'name'].astype(str)
         return df
 
 
+    @metrics.step("dq", table_arg=2)
     def phone_check(df, col :str, table :str):
         """
         Validate phone numbers to ensure 10-digit numeric format; replace invalid ones with blank.
         """
 
-        pattern='^[0-9]{10}$'
-        is_valid=df[col].astype(str).str.match(pattern,na=False)
-        invalid_index=df[~is_valid].index.tolist()
-        with open ('error.txt','a') as fs:
-            for k in invalid_index:
-                fs.write(f"invalide phone number in {table} table in id {df.loc[k,'id']} so made it null \n ")
-                df.loc[k,col]=''
+        is_valid=valid_pattern(df[col],PHONE_PATTERN)
+        get_sink().reject(df, ~is_valid, col, table, "phone", "blank")
+        df.loc[~is_valid,col]=''
         return df
 
 
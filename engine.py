@@ -0,0 +1,160 @@
+'''
+description:
+engine.py runs the data quality rules of each table in a single vectorized pass.
+The rules live in rules.json (or in the "rules" section of config.json) as a list of
+{column, check, action} entries per table, the same rules described in rules.txt.
+Each table's rules are compiled once; running them evaluates every mask, applies the
+fills with Series.mask and filters the dropped rows once at the end.
+'''
+
+#importing modules
+import json
+import re
+import pandas as pd
+import dq
+import lineage
+import metrics
+import schema
+from sink import get_sink
+
+PATTERNS = {
+    "email": dq.EMAIL_PATTERN,
+    "url": dq.URL_PATTERN,
+    "phone": dq.PHONE_PATTERN,
+}
+CHECKS = ("not_null", "primary_key", "fk", "email", "url", "phone", "regex", "boolean")
+ACTIONS = ("drop", "fill", "fill_from", "null")
+
+
+class Rule:
+    """ One compiled rule: which column to check, how to check it and what to do with failing rows."""
+
+    def __init__(self, spec: dict):
+        self.column = spec["column"]
+        self.check = spec["check"]
+        self.action = spec.get("action", "drop")
+        if self.check not in CHECKS:
+            raise ValueError(f"unknown check {self.check} for column {self.column}")
+        if self.action not in ACTIONS:
+            raise ValueError(f"unknown action {self.action} for column {self.column}")
+
+        self.parent = spec.get("parent")
+        self.value = spec.get("value")
+        self.source = spec.get("from")
+        self.pattern = None
+        if self.check in PATTERNS or self.check == "regex":
+            self.pattern = re.compile(spec.get("pattern", PATTERNS.get(self.check)))
+
+        # label written to the rejection sink, e.g. "drop" or "fill:untitled"
+        if self.action == "fill":
+            self.label = f"fill:{self.value}"
+        elif self.action == "fill_from":
+            self.label = f"fill_from:{self.source}"
+        else:
+            self.label = self.action
+
+    def valid(self, s, alive, parents: dict, seen=None):
+        """
+        Return the mask of rows that pass this rule.
+        seen is the running key index of a streamed table: primary keys already seen in
+        earlier chunks fail, and the keys of this chunk are added to it.
+        """
+
+        if self.check == "not_null":
+            return dq.valid_not_null(s)
+        if self.check == "primary_key":
+            # uniqueness only counts rows that are still alive, as in the sequential chain
+            valid = dq.valid_primary_key(s[alive]).reindex(s.index, fill_value=False)
+            if seen is not None:
+                valid &= ~pd.Series(seen.contains(s), index=s.index)
+                seen.add(s[alive])
+            return valid
+        if self.check == "fk":
+            return dq.valid_fk(s, parents[self.parent])
+        if self.check == "boolean":
+            return dq.valid_bool(s)
+        return dq.valid_pattern(s, self.pattern)
+
+
+def load_rules(config: dict):
+    """ Return the raw rule spec from config.json, or from the file named by "rulespath" (default rules.json)."""
+
+    if "rules" in config:
+        return config["rules"]
+    with open(config.get("rulespath", "rules.json"), "r") as file:
+        return json.load(file)
+
+
+def compile_rules(spec: dict):
+    """ Compile the spec into {table: [Rule, ...]}, keeping the table and rule order of the spec."""
+
+    return {table: [Rule(rule) for rule in rules] for table, rules in spec.items()}
+
+
+def parents_of(rules: list):
+    """ Names of the parent tables referenced by fk rules."""
+
+    return [rule.parent for rule in rules if rule.check == "fk"]
+
+
+@metrics.step("dq", table_arg=1)
+def run_table(df, table: str, rules: list, parents: dict, seen=None, recorder=None):
+    """
+    Apply the compiled rules of one table to df in one pass.
+    parents maps a parent table name to its valid keys (a KeyIndex or anything accepted by Series.isin).
+    seen is the running primary key index used when a table is processed in chunks.
+    recorder receives the failing rows of every rule (default: the rejection sink).
+    Rows failing a drop rule are excluded from the later rules, so the rejection sink
+    records the same rows a sequential chain of dq checks would.
+    With lineage on, the output gets the flags column: bit i set where rule i repaired the row.
+    """
+
+    sink = recorder if recorder is not None else get_sink()
+    alive = pd.Series(True, index=df.index)
+    changed = {}
+    flags = lineage.new_flags(len(df)) if lineage.column is not None else None
+
+    for bit, rule in enumerate(rules):
+        s = changed.get(rule.column, df[rule.column])
+        failed = ~rule.valid(s, alive, parents, seen) & alive
+        if not failed.any():
+            continue
+        # a value the schema cast turned into a null is recorded as its source text
+        raw = rule.column + schema.RAW_SUFFIX
+        values = s.astype("string").fillna(df[raw]) if raw in df.columns else s
+        sink.record(df["id"], values, failed, rule.column, table, rule.check, rule.label, bit=bit)
+        if flags is not None and rule.action != "drop":
+            flags[failed.to_numpy(dtype=bool, na_value=False)] |= 1 << bit
+
+        if rule.action == "drop":
+            alive &= ~failed
+        elif rule.action == "fill":
+            if isinstance(s.dtype, pd.CategoricalDtype) and rule.value not in s.cat.categories:
+                s = s.cat.add_categories([rule.value])
+            changed[rule.column] = s.mask(failed, rule.value)
+        elif rule.action == "fill_from":
+            source = changed.get(rule.source, df[rule.source])
+            changed[rule.column] = s.mask(failed, source)
+        else:
+            changed[rule.column] = s.mask(failed, None)
+
+    if flags is not None:
+        changed[lineage.column] = pd.Series(flags, index=df.index)
+    out = _view(df, changed)
+    if not alive.all():
+        out = out[alive]
+    return out
+
+
+def _view(df, changed: dict):
+    """
+    df with the repaired columns swapped in (and new ones, such as the lineage flags, appended) and the
+    <column>__raw columns of the schema casts left out, without copying the untouched ones.
+    """
+
+    raw = schema.raw_columns(df)
+    if not changed and not raw:
+        return df
+    columns = {col: changed.get(col, df[col]) for col in df.columns if col not in raw}
+    columns.update({col: s for col, s in changed.items() if col not in columns})
+    return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,159 @@
+'''
+description:
+incremental.py keeps the state of the incremental mode ("incremental": {"enabled": true}).
+A manifest records size, mtime and content hash of every source file, so unchanged files are
+skipped without being parsed. For changed files, a 64-bit hash of every row is kept per id, so only
+new or changed rows reach the checks and the loader, and ids that disappeared from the source are
+reported as deletes. The valid ids of a table are updated from its previous keys (keyindex.KeyStore).
+State is staged during a run and only written for tables that were loaded successfully.
+'''
+
+#importing modules
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from keyindex import KeyIndex, as_int64
+
+
+def file_fingerprint(path: str):
+    """ Size, mtime and a blake2b hash of the file content."""
+
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fs:
+        for block in iter(lambda: fs.read(1 << 20), b""):
+            digest.update(block)
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "hash": digest.hexdigest()}
+
+
+def row_hashes(df):
+    """ One uint64 hash per row over all columns (the index is ignored)."""
+
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class IncrementalState:
+    """ Manifest and row hashes of every table, stored under statepath."""
+
+    def __init__(self, config: dict, keystore):
+        self.keystore = keystore
+        options = config.get("incremental", {})
+        self.path = options.get("statepath", "./state")
+        self.apply_deletes = options.get("apply_deletes", False)
+        os.makedirs(self.path, exist_ok=True)
+        manifest_path = os.path.join(self.path, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as file:
+                self.manifest = json.load(file)
+        # what this run wants to write, per table, once the table is loaded
+        self.staged = {}
+        self.deleted = {}
+
+    def unchanged(self, name: str, src: str):
+        """
+        True when the source file is the one recorded in the manifest.
+        Size and mtime are compared first; the content is only hashed when they differ.
+        """
+
+        previous = self.manifest.get(name)
+        stat = os.stat(src)
+        if previous is not None and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+            return self.keystore.exists(name)
+        fingerprint = file_fingerprint(src)
+        self.staged.setdefault(name, {})["manifest"] = fingerprint
+        return previous is not None and previous["hash"] == fingerprint["hash"] and self.keystore.exists(name)
+
+    def read(self, name: str, src: str):
+        """
+        Stage the manifest entry of a source file that is about to be read, whether it runs because
+        it changed or because a parent did, so an unchanged file is skipped by the next run.
+        """
+
+        entry = self.staged.setdefault(name, {})
+        if "manifest" in entry:
+            return
+        previous = self.manifest.get(name)
+        stat = os.stat(src)
+        if previous is not None and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+            entry["manifest"] = previous
+        else:
+            entry["manifest"] = file_fingerprint(src)
+
+    def changed_rows(self, name: str, df, recheck: bool = False):
+        """
+        Return the rows of df that are new or changed since the last run.
+        With recheck (a parent table changed in this run), every row is returned: the foreign keys
+        of unchanged rows may have become valid or invalid.
+        Ids of the last run that are no longer in df are recorded in self.deleted.
+        """
+
+        hashes = row_hashes(df)
+        ids, usable = as_int64(df["id"], keep_shape=True)
+        prev_ids, prev_hashes = self._rows(name)
+
+        pos = np.searchsorted(prev_ids, ids)
+        pos[pos == len(prev_ids)] = 0
+        known = usable & (prev_ids[pos] == ids) if len(prev_ids) else np.zeros(len(ids), dtype=bool)
+        same = known & (prev_hashes[pos] == hashes) if len(prev_ids) else known
+        # every copy of a duplicated id goes to the primary key check again
+        same &= ~pd.Series(ids).duplicated(keep=False).to_numpy()
+        if recheck:
+            same[:] = False
+
+        self.deleted[name] = np.setdiff1d(prev_ids, ids[usable])
+        self.staged.setdefault(name, {}).update({
+            "unchanged_ids": ids[same],
+            "hashes": pd.Series(hashes, index=df.index),
+        })
+        return df[~same]
+
+    def stage(self, name: str, validated):
+        """
+        Stage the state of a table after its changed rows were checked, and return its valid keys:
+        the previous keys of the rows that were not checked again, plus the ids of the rows that passed
+        the checks. A row that failed this time (e.g. its parent was deleted) leaves the keys and the
+        saved hashes, so the next run checks it again.
+        """
+
+        entry = self.staged.setdefault(name, {})
+        prev_ids, prev_hashes = self._rows(name)
+        unchanged = np.isin(prev_ids, entry.get("unchanged_ids", prev_ids))
+
+        new_ids, usable = as_int64(validated["id"], keep_shape=True)
+        new_hashes = entry["hashes"].loc[validated.index].to_numpy() if "hashes" in entry else np.empty(0, np.uint64)
+        ids = np.concatenate([prev_ids[unchanged], new_ids[usable]])
+        hashes = np.concatenate([prev_hashes[unchanged], new_hashes[usable]])
+        order = np.argsort(ids, kind="stable")
+        entry["ids"], entry["row_hashes"] = ids[order], hashes[order]
+
+        # the saved ids are those of the rows that passed the checks, so they are the valid keys
+        keys = KeyIndex(prev_ids[unchanged])
+        keys.add(new_ids[usable])
+        return keys
+
+    def commit(self, names):
+        """ Write the staged state of the given tables (the ones that were loaded successfully)."""
+
+        for name in names:
+            entry = self.staged.pop(name, None)
+            if entry is None:
+                continue
+            if "ids" in entry:
+                np.savez(self._file(name, "rows.npz"), ids=entry["ids"], hashes=entry["row_hashes"])
+            if "manifest" in entry:
+                self.manifest[name] = entry["manifest"]
+        with open(os.path.join(self.path, "manifest.json"), "w") as file:
+            json.dump(self.manifest, file, indent=2)
+
+    def _rows(self, name: str):
+        path = self._file(name, "rows.npz")
+        if not os.path.exists(path):
+            return np.empty(0, np.int64), np.empty(0, np.uint64)
+        with np.load(path) as rows:
+            return rows["ids"], rows["hashes"]
+
+    def _file(self, name: str, suffix: str):
+        return os.path.join(self.path, f"{name}.{suffix}")
@@ -0,0 +1,149 @@
+'''
+description:
+keyindex.py keeps compact sets of integer keys (ids of a parent table, or the ids already
+seen by a streaming primary key check) as a few sorted numpy arrays instead of DataFrames.
+Whole columns are checked at once with np.searchsorted. KeyStore caches the valid keys of
+every table on disk between runs and falls back to the database (SELECT id FROM <table>).
+'''
+
+#importing modules
+import os
+import numpy as np
+import pandas as pd
+
+
+class KeyIndex:
+    """
+    A set of integer keys stored as sorted runs.
+    New keys are added as a run; runs of similar size are merged, so a table of n keys
+    is held in O(log n) sorted arrays and every add costs amortized O(k log n).
+    """
+
+    def __init__(self, keys=None):
+        self.runs = []
+        if keys is not None:
+            self.add(keys)
+
+    @classmethod
+    def from_sorted(cls, keys):
+        """ A KeyIndex over an array of sorted, unique int64 keys, used as is (e.g. a view of shared memory)."""
+
+        index = cls()
+        if len(keys):
+            index.runs = [keys]
+        return index
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def add(self, keys):
+        """ Add every integer value of keys (nulls and non-integers are ignored)."""
+
+        run = np.unique(as_int64(keys)[0])
+        if len(run) == 0:
+            return
+        self.runs.append(run)
+        while len(self.runs) > 1 and len(self.runs[-1]) >= len(self.runs[-2]):
+            last = self.runs.pop()
+            self.runs[-1] = np.union1d(self.runs[-1], last)
+
+    def contains(self, values):
+        """ Boolean numpy array telling for every value whether it is in the index."""
+
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            # a categorical column (schema.py) is looked up once per distinct value
+            found = np.append(self.contains(values.cat.categories.to_series()), False)
+            return found[values.cat.codes.to_numpy()]
+
+        ints, usable = as_int64(values, keep_shape=True)
+        found = np.zeros(len(ints), dtype=bool)
+        for run in self.runs:
+            pos = np.searchsorted(run, ints)
+            pos[pos == len(run)] = 0
+            found |= run[pos] == ints
+        return found & usable
+
+    def to_array(self):
+        """ All keys as one sorted array (merges the runs)."""
+
+        if not self.runs:
+            return np.empty(0, dtype=np.int64)
+        if len(self.runs) > 1:
+            self.runs = [np.unique(np.concatenate(self.runs))]
+        return self.runs[0]
+
+
+def as_int64(values, keep_shape: bool = False):
+    """
+    Convert values to int64.
+    Returns (ints, usable) where usable marks the entries that were integral numbers;
+    without keep_shape the unusable entries are removed instead.
+    """
+
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # convert the categories once and spread them with the codes (code -1 is a null)
+        cat_ints, cat_usable = as_int64(s.cat.categories.to_series(), keep_shape=True)
+        codes = s.cat.codes.to_numpy()
+        ints = np.append(cat_ints, 0)[codes]
+        usable = np.append(cat_usable, False)[codes]
+        return (ints, usable) if keep_shape else (ints[usable], usable)
+    if pd.api.types.is_integer_dtype(s.dtype) and not s.hasnans:
+        return s.to_numpy(dtype=np.int64), np.ones(len(s), dtype=bool)
+
+    numbers = pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    usable = ~np.isnan(numbers)
+    usable[usable] = numbers[usable] == np.floor(numbers[usable])
+    if keep_shape:
+        ints = np.where(usable, numbers, 0).astype(np.int64)
+        return ints, usable
+    return numbers[usable].astype(np.int64), usable
+
+
+class KeyStore:
+    """
+    Valid keys of every table, cached in memory and on disk (<path>/<table>.keys.npy) between runs.
+    A table that is neither in memory nor on disk is fetched from the database with fetch(name),
+    so a child table can be checked without reading its parent's source file.
+    """
+
+    def __init__(self, path: str = "./state/keys", fetch=None):
+        self.path = path
+        self.fetch = fetch
+        self.cache = {}
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, name: str):
+        return os.path.join(self.path, f"{name}.keys.npy")
+
+    def exists(self, name: str):
+        return name in self.cache or os.path.exists(self.file(name))
+
+    def get(self, name: str):
+        """ The KeyIndex of a table: from memory, else from disk, else from the database."""
+
+        if name not in self.cache:
+            if os.path.exists(self.file(name)):
+                self.cache[name] = KeyIndex(np.load(self.file(name)))
+            elif self.fetch is not None:
+                self.cache[name] = KeyIndex(self.fetch(name))
+            else:
+                raise KeyError(f"no key index for {name}")
+        return self.cache[name]
+
+    def put(self, name: str, keys):
+        """ Replace the keys of a table in memory (a KeyIndex, or any column of ids)."""
+
+        self.cache[name] = keys if isinstance(keys, KeyIndex) else KeyIndex(keys)
+        return self.cache[name]
+
+    def discard(self, name: str):
+        """ Forget the in-memory keys of a table (e.g. after its load failed), so the next get reads them again."""
+
+        self.cache.pop(name, None)
+
+    def save(self, name: str):
+        """ Write the in-memory keys of a table to disk."""
+
+        if name in self.cache:
+            np.save(self.file(name), self.cache[name].to_array())
@@ -0,0 +1,74 @@
+'''
+description:
+lineage.py keeps row-level lineage of the data quality rules. With a "lineage" section in
+config.json, every loaded row gets an integer column (dq_flags by default) where bit i is set
+when the i-th rule of its table in rules.json fired on the row (a fill, fill_from or null
+repair; rows failing a drop rule are not loaded). The bits are set from the masks engine.py
+already computes, only for the rules that fired. The meaning of every bit is written to the
+dq_rules table, so the flags can be decoded in SQL, and the rejection sink records the same
+bit with every rejected row.
+'''
+
+DEFAULT_OPTIONS = {"column": "dq_flags", "sql": "int", "legend": "dq_rules"}
+# usable bits (the sign bit is left alone) and dtype of every supported column type
+BITS = {"tinyint": 7, "smallint": 15, "int": 31, "bigint": 63}
+DTYPES = {"tinyint": "int8", "smallint": "int16", "int": "int32", "bigint": "int64"}
+
+_options = dict(DEFAULT_OPTIONS)
+# name of the flags column, None while lineage is off
+column = None
+
+
+def options_for(config: dict):
+    options = dict(DEFAULT_OPTIONS)
+    options.update(config.get("lineage", {}))
+    return options
+
+
+def configure(config: dict, rules: dict = None):
+    """
+    Turn lineage on when config.json has a "lineage" section, e.g. {"column": "dq_flags", "sql": "int"}.
+    rules ({table: [Rule, ...]}) are checked to fit in the bits of the column type.
+    """
+
+    global _options, column
+    if "lineage" not in config:
+        column = None
+        return None
+    options = options_for(config)
+    if options["sql"] not in BITS:
+        raise ValueError(f"unknown lineage column type {options['sql']}, expected one of {tuple(BITS)}")
+    for table, table_rules in (rules or {}).items():
+        if len(table_rules) > BITS[options["sql"]]:
+            raise ValueError(f"{table} has {len(table_rules)} rules, more than the {BITS[options['sql']]} bits of a {options['sql']} lineage column")
+    _options = options
+    column = options["column"]
+    return options
+
+
+def as_config():
+    """ The "lineage" section the current state was configured from ({} while off), e.g. for a spawned worker."""
+
+    return {"lineage": dict(_options)} if column is not None else {}
+
+
+def column_sql():
+    """ The column definition added to every table while lineage is on."""
+
+    return f"{_options['sql']} default 0"
+
+
+def new_flags(n: int):
+    import numpy as np
+    return np.zeros(n, dtype=DTYPES[_options["sql"]])
+
+
+def legend(rules: dict, tables: dict):
+    """ One (table, bit, column, rule, action) record per compiled rule, tables mapping names to database tables."""
+
+    return [(tables.get(name, name), bit, rule.column, rule.check, rule.label)
+            for name, table_rules in rules.items() for bit, rule in enumerate(table_rules)]
+
+
+def legend_table():
+    return _options["legend"]
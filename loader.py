@@ -0,0 +1,200 @@
+'''
+description:
+loader.py turns a validated DataFrame into upserts on a MySQL connection.
+Three strategies are available and chosen per table in the "loader" section of config.json:
+  rows  - one executemany of INSERT ... ON DUPLICATE KEY UPDATE
+  batch - multi-row INSERT statements of batch_size rows each
+  bulk  - LOAD DATA LOCAL INFILE of a prepared TSV into a temporary table, then one
+          INSERT ... SELECT ... ON DUPLICATE KEY UPDATE (needs "local_infile": true in "database")
+  swap  - full refresh: the whole table is written to a fresh staging table (with the load_with
+          strategy: bulk when local_infile is on, batch otherwise) and renamed into place
+          (see tables.refreshing_tables)
+NaN to None conversion is done per column, never per value.
+"defer_checks": true turns off MySQL's per-row FK/unique checks during a load and verifies the
+foreign keys once afterwards, before the commit.
+'''
+
+#importing modules
+import os
+import tempfile
+
+STRATEGIES = ("rows", "batch", "bulk", "swap")
+DEFAULT_OPTIONS = {"strategy": "batch", "batch_size": 1000}
+
+
+def options_for(config: dict, name: str):
+    """
+    Loader options of one table: the table's entry over the "default" entry over DEFAULT_OPTIONS.
+    A swap table gets a load_with strategy (bulk when "local_infile" is on in "database", else batch).
+    Raises ValueError when a MySQL table is set to load with bulk while local_infile is off.
+    """
+
+    section = config.get("loader", {})
+    options = dict(DEFAULT_OPTIONS)
+    options.update(section.get("default", {}))
+    options.update(section.get(name, {}))
+    if options["strategy"] not in STRATEGIES:
+        raise ValueError(f"unknown loader strategy {options['strategy']} for {name}, expected one of {STRATEGIES}")
+    database = config.get("database", {})
+    local_infile = database.get("local_infile", False)
+    strategy = options["strategy"]
+    if strategy == "swap":
+        options.setdefault("load_with", "bulk" if local_infile else "batch")
+        strategy = options["load_with"]
+        if strategy not in STRATEGIES or strategy == "swap":
+            raise ValueError(f"unknown load_with strategy {strategy} for {name}, expected one of {STRATEGIES[:-1]}")
+    # LOAD DATA LOCAL INFILE is refused by the connector unless local_infile is on
+    if strategy == "bulk" and not local_infile and database.get("backend", "mysql") == "mysql":
+        raise ValueError(f"{name} is loaded with bulk (LOAD DATA LOCAL INFILE), which needs \"local_infile\": true in the database section")
+    return options
+
+
+def sql_columns(df):
+    """ Backticked column names, with dots replaced by underscores as in the table definitions."""
+
+    return [f"`{col.replace('.', '_')}`" for col in df.columns]
+
+
+def update_clause(columns_sql: list):
+    """ The ON DUPLICATE KEY UPDATE assignments, leaving the primary key alone."""
+
+    return ', '.join(f"{col}=VALUES({col})" for col in columns_sql if col != '`id`')
+
+
+def to_params(df):
+    """ Rows of df as tuples of plain Python values, with every missing value as None."""
+
+    values = df.astype(object)
+    values = values.where(df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def load(mydb, mycursor, df, name: str, options: dict):
+    """
+    Upsert df into table name with the strategy in options, and commit.
+    With "defer_checks", MySQL's per-row foreign key and unique checks are switched off for the
+    session during the load (the dq checks already guarantee them) and the foreign keys in
+    options["foreign_keys"] are verified for the loaded id range before the commit.
+    """
+
+    if df.empty:
+        return
+    defer = options.get("defer_checks", False)
+    if defer:
+        mycursor.execute("SET SESSION foreign_key_checks = 0, SESSION unique_checks = 0;")
+    try:
+        strategy = options["strategy"]
+        if strategy == "rows":
+            load_rows(mycursor, df, name)
+        elif strategy == "batch":
+            load_batches(mycursor, df, name, int(options["batch_size"]))
+        elif strategy == "bulk":
+            load_bulk(mycursor, df, name)
+        else:
+            raise ValueError(f"{name} is a full-refresh (swap) table, loaded by tables.load_tables")
+        if defer:
+            verify_foreign_keys(mycursor, df, name, options.get("foreign_keys", {}))
+        mydb.commit()
+    finally:
+        if defer:
+            # the connection goes back to the pool with the checks on
+            mycursor.execute("SET SESSION foreign_key_checks = 1, SESSION unique_checks = 1;")
+
+
+def verify_foreign_keys(mycursor, df, name: str, foreign_keys: dict):
+    """ Raise ValueError when rows of name in the id range of df reference a missing parent row."""
+
+    low, high = int(df["id"].min()), int(df["id"].max())
+    for col, parent in foreign_keys.items():
+        mycursor.execute(f"""
+            SELECT COUNT(*) FROM `{name}` c LEFT JOIN `{parent}` p ON p.id = c.`{col}`
+            WHERE c.id BETWEEN %s AND %s AND c.`{col}` IS NOT NULL AND p.id IS NULL;
+        """, (low, high))
+        orphans = (mycursor.fetchone() or (0,))[0]
+        if orphans:
+            raise ValueError(f"{orphans} rows of {name} reference missing rows of {parent}")
+
+
+def load_rows(mycursor, df, name: str):
+    columns_sql = sql_columns(df)
+    placeholders = ', '.join(['%s'] * len(columns_sql))
+    insert_sql = f"""
+        INSERT INTO `{name}` ({', '.join(columns_sql)})
+        VALUES ({placeholders})
+        ON DUPLICATE KEY UPDATE {update_clause(columns_sql)};
+    """
+    mycursor.executemany(insert_sql, to_params(df))
+
+
+def load_batches(mycursor, df, name: str, batch_size: int):
+    columns_sql = sql_columns(df)
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns_sql)) + ')'
+    head = f"INSERT INTO `{name}` ({', '.join(columns_sql)}) VALUES "
+    tail = f" ON DUPLICATE KEY UPDATE {update_clause(columns_sql)};"
+
+    rows = to_params(df)
+    full_sql = None
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if len(batch) == batch_size:
+            # every full batch shares the same statement text
+            if full_sql is None:
+                full_sql = head + ', '.join([row_placeholder] * batch_size) + tail
+            sql = full_sql
+        else:
+            sql = head + ', '.join([row_placeholder] * len(batch)) + tail
+        mycursor.execute(sql, [value for row in batch for value in row])
+
+
+def load_bulk(mycursor, df, name: str):
+    columns_sql = sql_columns(df)
+    staging = f"{name}__load"
+    fd, path = tempfile.mkstemp(prefix=f"{name}_", suffix=".tsv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fs:
+            write_tsv(df, fs)
+
+        mycursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging}`;")
+        mycursor.execute(f"CREATE TEMPORARY TABLE `{staging}` LIKE `{name}`;")
+        mycursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE `{staging}`
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({', '.join(columns_sql)});
+        """, (path,))
+        mycursor.execute(f"""
+            INSERT INTO `{name}` ({', '.join(columns_sql)})
+            SELECT {', '.join(columns_sql)} FROM `{staging}`
+            ON DUPLICATE KEY UPDATE {update_clause(columns_sql)};
+        """)
+        mycursor.execute(f"DROP TEMPORARY TABLE IF EXISTS `{staging}`;")
+    finally:
+        os.remove(path)
+
+
+def write_tsv(df, fs):
+    """ Write df in the default LOAD DATA format: tab separated, backslash escaped, \\N for NULL."""
+
+    columns = [tsv_column(df[col]) for col in df.columns]
+    lines = columns[0].str.cat(columns[1:], sep="\t") if len(columns) > 1 else columns[0]
+    fs.write("\n".join(lines.tolist()))
+    fs.write("\n")
+
+
+def tsv_column(s):
+    """ One column as escaped TSV text."""
+
+    import pandas as pd
+    missing = s.isna()
+    if pd.api.types.is_bool_dtype(s.dtype):
+        text = s.map({True: "1", False: "0"})
+    elif pd.api.types.is_numeric_dtype(s.dtype):
+        text = s.astype(str)
+    else:
+        text = (s.astype(str)
+                .str.replace("\\", "\\\\", regex=False)
+                .str.replace("\t", "\\t", regex=False)
+                .str.replace("\n", "\\n", regex=False)
+                .str.replace("\r", "\\r", regex=False))
+    return text.where(~missing, "\\N").astype(object)
@@ -0,0 +1,231 @@
+'''
+description:
+metrics.py records what every extract, dq, write and load step of a run costs: wall time,
+rows in and out, bytes read or written, current and peak memory, plus the rejected rows per
+rule from the rejection sink. At the end of a run it writes a JSON report and a Prometheus
+textfile. It is off unless "metrics": {"enabled": true} is set in config.json; when off,
+a decorated step costs one extra function call and a flag check.
+'''
+
+#importing modules
+import os
+import json
+import time
+import datetime
+import functools
+import threading
+import resource
+
+enabled = False
+options = {}
+records = []
+run_started = None
+_lock = threading.Lock()
+
+
+def configure(config: dict):
+    """ Turn recording on or off from the "metrics" section of config.json and start a new run."""
+
+    global enabled, options, records, run_started
+    options = config.get("metrics", {})
+    enabled = bool(options.get("enabled", False))
+    records = []
+    run_started = time.time()
+
+
+def rss_mb():
+    """ Current resident memory of the process in MB."""
+
+    try:
+        with open("/proc/self/statm") as fs:
+            return int(fs.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """ Peak resident memory of the process in MB."""
+
+    try:
+        with open("/proc/self/status") as fs:
+            for line in fs:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def record(stage: str, table, step: str, seconds: float, rows_in=None, rows_out=None, bytes_read=None, bytes_written=None):
+    entry = {
+        "stage": stage, "table": table, "step": step, "seconds": seconds,
+        "rows_in": rows_in, "rows_out": rows_out,
+        "bytes_read": bytes_read, "bytes_written": bytes_written,
+        "rss_mb": round(rss_mb(), 1),
+    }
+    with _lock:
+        records.append(entry)
+
+
+def _rows(value):
+    if value is None or isinstance(value, (str, bytes, bool)) or not hasattr(value, "__len__"):
+        return None
+    return len(value)
+
+
+def step(stage: str, table_arg: int = None):
+    """
+    Decorator that records a call as one step of the given stage.
+    table_arg is the position of the table name argument; rows in come from the first
+    argument and rows out from the result, when they have a length.
+    """
+
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            table = args[table_arg] if table_arg is not None and len(args) > table_arg else kwargs.get("table", kwargs.get("name"))
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            record(stage, table, fn.__name__, time.perf_counter() - start,
+                   rows_in=_rows(args[0]) if args else None, rows_out=_rows(result))
+            return result
+        return inner
+    return wrap
+
+
+class Span:
+    """ Context manager timing a block; set rows_out / bytes_read / bytes_written on it inside the block."""
+
+    def __init__(self, stage: str, table, step: str, **fields):
+        self.stage, self.table, self.step = stage, table, step
+        self.rows_in = fields.get("rows_in")
+        self.rows_out = fields.get("rows_out")
+        self.bytes_read = fields.get("bytes_read")
+        self.bytes_written = fields.get("bytes_written")
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, self.table, self.step, time.perf_counter() - self.start,
+               self.rows_in, self.rows_out, self.bytes_read, self.bytes_written)
+        return False
+
+
+class _NullSpan:
+    """ What span returns when metrics are off: accepts the same attributes and records nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_null_span = _NullSpan()
+
+
+def span(stage: str, table, step: str, **fields):
+    if not enabled:
+        return _null_span
+    return Span(stage, table, step, **fields)
+
+
+def timed_chunks(chunks, stage: str, table, step: str):
+    """ Yield from an iterator of chunks (e.g. pd.read_csv(chunksize=...)), recording the time of every next()."""
+
+    iterator = iter(chunks)
+    while True:
+        with span(stage, table, step) as s:
+            chunk = next(iterator, None)
+            s.rows_out = _rows(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def summary(rejections: dict = None):
+    """ Aggregate the recorded steps per (stage, table, step) and add the run totals."""
+
+    steps = {}
+    with _lock:
+        entries = list(records)
+    for entry in entries:
+        key = (entry["stage"], entry["table"] or "", entry["step"])
+        agg = steps.setdefault(key, {"stage": key[0], "table": key[1], "step": key[2], "calls": 0,
+                                     "seconds": 0.0, "rows_in": 0, "rows_out": 0,
+                                     "bytes_read": 0, "bytes_written": 0, "max_rss_mb": 0.0})
+        agg["calls"] += 1
+        agg["seconds"] += entry["seconds"]
+        for field in ("rows_in", "rows_out", "bytes_read", "bytes_written"):
+            agg[field] += entry[field] or 0
+        agg["max_rss_mb"] = max(agg["max_rss_mb"], entry["rss_mb"])
+
+    return {
+        "started_at": datetime.datetime.fromtimestamp(run_started).isoformat(timespec="seconds") if run_started else None,
+        "run_seconds": round(time.time() - run_started, 3) if run_started else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "steps": list(steps.values()),
+        "rejections": [{"table": t, "column": c, "rule": r, "action": a, "rows": n}
+                       for (t, c, r, a), n in sorted((rejections or {}).items())],
+    }
+
+
+def _labels(**labels):
+    return ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels.items())
+
+
+def prometheus(report: dict):
+    """ The report in the Prometheus text exposition format."""
+
+    lines = []
+    gauges = [
+        ("etl_step_seconds", "Wall time spent in an ETL step", "seconds"),
+        ("etl_step_calls", "Number of calls of an ETL step", "calls"),
+        ("etl_step_rows_in", "Rows given to an ETL step", "rows_in"),
+        ("etl_step_rows_out", "Rows returned by an ETL step", "rows_out"),
+        ("etl_step_bytes_read", "Bytes read by an ETL step", "bytes_read"),
+        ("etl_step_bytes_written", "Bytes written by an ETL step", "bytes_written"),
+        ("etl_step_max_rss_megabytes", "Largest resident memory seen at the end of an ETL step", "max_rss_mb"),
+    ]
+    for metric, help_text, field in gauges:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for s in report["steps"]:
+            lines.append(f"{metric}{{{_labels(stage=s['stage'], table=s['table'], step=s['step'])}}} {s[field]}")
+    lines.append("# HELP etl_rejected_rows Rows rejected or repaired per data quality rule")
+    lines.append("# TYPE etl_rejected_rows gauge")
+    for r in report["rejections"]:
+        lines.append(f"etl_rejected_rows{{{_labels(table=r['table'], column=r['column'], rule=r['rule'], action=r['action'])}}} {r['rows']}")
+    lines.append("# HELP etl_run_seconds Wall time of the last run")
+    lines.append("# TYPE etl_run_seconds gauge")
+    lines.append(f"etl_run_seconds {report['run_seconds']}")
+    lines.append("# HELP etl_peak_rss_megabytes Peak resident memory of the last run")
+    lines.append("# TYPE etl_peak_rss_megabytes gauge")
+    lines.append(f"etl_peak_rss_megabytes {report['peak_rss_mb']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(rejections: dict = None):
+    """ Write the JSON report and the Prometheus textfile of the run (only when metrics are enabled)."""
+
+    if not enabled:
+        return None
+    report = summary(rejections)
+    _write_atomic(options.get("json", "metrics.json"), json.dumps(report, indent=2))
+    # textfile collectors read the file at any time, so it is replaced in one rename
+    _write_atomic(options.get("prometheus", "metrics.prom"), prometheus(report))
+    return report
+
+
+def _write_atomic(path: str, text: str):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fs:
+        fs.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,96 @@
+'''
+description:
+patterncache.py remembers the verdict of the regex checks (email, url, phone, regex rules)
+per distinct value. dq.valid_pattern already runs a pattern once per distinct value of a
+column; with "patterncache": {"enabled": true} the verdicts are also kept in a bounded LRU
+cache, shared by every table and chunk of a run and saved to disk for the next run, so values
+that repeat across chunks and runs (hosts, reused emails) are not matched again.
+'''
+
+#importing modules
+import os
+import json
+import threading
+from collections import OrderedDict
+
+
+class PatternCache:
+    """ LRU cache of (pattern, value) -> verdict holding at most size entries."""
+
+    def __init__(self, size: int = 100000, path: str = None):
+        self.size = size
+        self.path = path
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # checks of independent tables may run in several threads
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def verdicts(self, pattern, values):
+        """
+        Return a list with the verdict of pattern (a compiled regex) for every entry of values,
+        a Series of distinct strings. Only the values missing from the cache are matched.
+        """
+
+        keys = values.tolist()
+        with self._lock:
+            found = [self.entries.get((pattern.pattern, value)) for value in keys]
+        missing = [i for i, verdict in enumerate(found) if verdict is None]
+        if missing:
+            matched = values.iloc[missing].str.match(pattern, na=False).tolist()
+            for i, verdict in zip(missing, matched):
+                found[i] = bool(verdict)
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            for value, verdict in zip(keys, found):
+                key = (pattern.pattern, value)
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                else:
+                    self.entries[key] = verdict
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return found
+
+    def load(self):
+        with open(self.path, "r") as file:
+            for pattern, value, verdict in json.load(file)[-self.size:]:
+                self.entries[(pattern, value)] = verdict
+
+    def save(self):
+        """ Write the cache to path, least recently used entries first."""
+
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock:
+            rows = [[pattern, value, verdict] for (pattern, value), verdict in self.entries.items()]
+        with open(self.path, "w") as file:
+            json.dump(rows, file)
+
+
+_cache = None
+
+
+def configure(config: dict):
+    """
+    Build the process-wide cache from the optional "patterncache" section of config.json,
+    e.g. {"enabled": true, "size": 100000, "path": "./state/patterns.json"}; None when disabled.
+    """
+
+    global _cache
+    options = config.get("patterncache", {})
+    _cache = None
+    if options.get("enabled"):
+        _cache = PatternCache(size=options.get("size", 100000), path=options.get("path", "./state/patterns.json"))
+    return _cache
+
+
+def get_cache():
+    """ Return the process-wide cache, or None when it is disabled."""
+
+    return _cache
@@ -0,0 +1,219 @@
+'''
+description:
+reader.py is the reader layer of the extract step, chosen in the "reader" section of config.json:
+  pandas - pd.read_csv through schema.read_csv (the default)
+  arrow  - pyarrow.csv over a memory-mapped file, cut in blocks of block_size bytes that are parsed
+           on all cores; quoted multi-line fields (the body of comments and posts) are kept whole
+Both engines return the same DataFrame (with the schema of the table applied), whole or in
+chunks of chunksize rows. With "profile" set to a path, every table read also gets per-column
+statistics from the parsed rows of the same scan (nulls, min/max of numeric columns and an
+approximate distinct count), written to that path at the end of the run with a suggested dtype.
+'''
+
+#importing modules
+import os
+import csv
+import json
+import importlib.util
+import numpy as np
+import pandas as pd
+import schema
+
+ENGINES = ("pandas", "arrow")
+DEFAULT_OPTIONS = {"engine": "pandas", "block_size": 4 << 20, "threads": True, "profile": None}
+# the texts pd.read_csv reads as nulls by default, so both engines agree on what is missing
+NULL_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+               "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+_options = dict(DEFAULT_OPTIONS)
+# Profile of every table read in this run
+profiles = {}
+
+
+def configure(config: dict):
+    """ Set the engine from the optional "reader" section of config.json and clear the profiles."""
+
+    global _options
+    options = dict(DEFAULT_OPTIONS)
+    options.update(config.get("reader", {}))
+    if options["engine"] not in ENGINES:
+        raise ValueError(f"unknown reader engine {options['engine']}, expected one of {ENGINES}")
+    if options["engine"] == "arrow" and not importlib.util.find_spec("pyarrow"):
+        raise ValueError("the arrow reader engine needs pyarrow")
+    _options = options
+    profiles.clear()
+    return options
+
+
+def read_csv(path: str, columns: dict = None, chunksize: int = None, table: str = None):
+    """
+    Read a source file with the schema of one table ({column: type}) applied, using the configured engine.
+    With chunksize, an iterator of DataFrames of chunksize rows is returned.
+    When profiling is on and table is given, the rows are profiled as they are handed out.
+    """
+
+    if _options["engine"] == "arrow":
+        frames = arrow_chunks(path, columns, chunksize) if chunksize else arrow_read(path, columns)
+    else:
+        frames = schema.read_csv(path, columns, chunksize=chunksize)
+    if not _options["profile"] or table is None:
+        return frames
+    profile = profiles[table] = Profile()
+    if chunksize:
+        return profile.observe(frames)
+    profile.update(frames)
+    return frames
+
+
+def arrow_options(path: str):
+    from pyarrow import csv as arrow_csv
+    import pyarrow as pa
+    # every column is parsed as text: Arrow infers types from the first block only, so a bad value
+    # further down would fail the whole read; numbers are cast afterwards (see to_frame)
+    with open(path, "r", newline="") as file:
+        header = next(csv.reader(file), [])
+    return (
+        arrow_csv.ReadOptions(use_threads=bool(_options["threads"]), block_size=int(_options["block_size"])),
+        arrow_csv.ParseOptions(newlines_in_values=True),
+        arrow_csv.ConvertOptions(column_types={col: pa.string() for col in header},
+                                 null_values=NULL_VALUES, strings_can_be_null=True),
+    )
+
+
+def arrow_read(path: str, columns: dict = None):
+    """ The whole file, parsed block-parallel by pyarrow from a memory map."""
+
+    import pyarrow as pa
+    from pyarrow import csv as arrow_csv
+    read, parse, convert = arrow_options(path)
+    with pa.memory_map(path, "r") as source:
+        table = arrow_csv.read_csv(source, read_options=read, parse_options=parse, convert_options=convert)
+    return to_frame(table, columns)
+
+
+def arrow_chunks(path: str, columns: dict, chunksize: int):
+    """ The file as DataFrames of chunksize rows, from pyarrow's streaming reader."""
+
+    import pyarrow as pa
+    from pyarrow import csv as arrow_csv
+    read, parse, convert = arrow_options(path)
+    with pa.memory_map(path, "r") as source:
+        reader = arrow_csv.open_csv(source, read_options=read, parse_options=parse, convert_options=convert)
+        pending, rows = [], 0
+        for batch in reader:
+            pending.append(batch)
+            rows += batch.num_rows
+            while rows >= chunksize:
+                table = pa.Table.from_batches(pending, schema=reader.schema)
+                yield to_frame(table.slice(0, chunksize), columns)
+                rest = table.slice(chunksize)
+                pending, rows = rest.to_batches(), rest.num_rows
+        if rows:
+            yield to_frame(pa.Table.from_batches(pending, schema=reader.schema), columns)
+
+
+def to_frame(table, columns: dict = None):
+    """
+    Arrow table of text columns -> DataFrame as pd.read_csv would infer it, with the schema applied.
+    A column becomes int64 or float64 when all of its values are numbers (text columns stay text),
+    so the schema casts see the same input as with the pandas engine.
+    """
+
+    import pyarrow as pa
+    columns = columns or {}
+    for i, name in enumerate(table.column_names):
+        if columns.get(name) in ("string", "boolean"):
+            continue
+        targets = (pa.int64(), pa.float64()) if name in columns else (pa.int64(), pa.float64(), pa.bool_())
+        for target in targets:
+            try:
+                table = table.set_column(i, name, table.column(i).cast(target))
+                break
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                continue
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    return schema.cast(df, columns) if columns else df
+
+
+class Profile:
+    """
+    Statistics of one table, updated chunk by chunk: row count, and per column the null count, the
+    min/max of numeric columns and a k-minimum-values sketch of the value hashes for the distinct count.
+    """
+
+    def __init__(self, k: int = 1024):
+        self.k = k
+        self.rows = 0
+        self.columns = {}
+
+    def observe(self, frames):
+        for df in frames:
+            self.update(df)
+            yield df
+
+    def update(self, df):
+        self.rows += len(df)
+        for col in df.columns:
+            if col.endswith(schema.RAW_SUFFIX):
+                continue
+            s = df[col]
+            entry = self.columns.setdefault(col, {"dtype": str(s.dtype), "nulls": 0, "min": None, "max": None,
+                                                  "sketch": np.empty(0, dtype=np.uint64)})
+            values = s.dropna()
+            entry["nulls"] += len(s) - len(values)
+            if values.empty:
+                continue
+            if isinstance(s.dtype, pd.CategoricalDtype) and pd.api.types.is_numeric_dtype(s.dtype.categories.dtype):
+                # ids such as userId are categories of integers
+                values = values.astype(s.dtype.categories.dtype)
+            if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+                low, high = values.min().item(), values.max().item()
+                entry["min"] = low if entry["min"] is None else min(entry["min"], low)
+                entry["max"] = high if entry["max"] is None else max(entry["max"], high)
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+            if len(entry["sketch"]) == self.k:
+                # only hashes below the current k-th smallest can enter the sketch
+                hashes = hashes[hashes < entry["sketch"][-1]]
+            entry["sketch"] = np.unique(np.concatenate([entry["sketch"], hashes]))[:self.k]
+
+    def distinct(self, col: str):
+        """ Number of distinct values: exact below k, else estimated as (k - 1) / (k-th smallest hash / 2**64)."""
+
+        sketch = self.columns[col]["sketch"]
+        if len(sketch) < self.k:
+            return len(sketch)
+        return int((self.k - 1) / (float(sketch[-1]) / 2.0**64))
+
+    def suggest_dtype(self, col: str):
+        """ The schema.py type the statistics point to."""
+
+        entry = self.columns[col]
+        distinct = self.distinct(col)
+        if entry["min"] is not None and float(entry["min"]).is_integer() and float(entry["max"]).is_integer():
+            if distinct < (self.rows - entry["nulls"]) / 2:
+                return "category"
+            return "Int32" if schema.INT32_RANGE[0] <= entry["min"] and entry["max"] <= schema.INT32_RANGE[1] else "Int64"
+        if entry["min"] is not None:
+            return "float64"
+        if "bool" in entry["dtype"]:
+            return "boolean"
+        return "category" if distinct < (self.rows - entry["nulls"]) / 2 else "string"
+
+    def to_dict(self):
+        return {"rows": self.rows, "columns": {
+            col: {"dtype": entry["dtype"], "nulls": entry["nulls"], "min": entry["min"], "max": entry["max"],
+                  "distinct": self.distinct(col), "suggested_dtype": self.suggest_dtype(col)}
+            for col, entry in self.columns.items()}}
+
+
+def write_profiles():
+    """ Write the profile of every table read in this run to the "profile" path, if set."""
+
+    path = _options["profile"]
+    if not path or not profiles:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as file:
+        json.dump({table: profile.to_dict() for table, profile in profiles.items()}, file, indent=2, default=str)
+    os.replace(tmp, path)
@@ -0,0 +1,89 @@
+'''
+description:
+scheduler.py runs one task per table (checks, or loads) on a thread pool, following the foreign key graph.
+A table starts as soon as all of its parent tables have finished, so independent branches
+(posts/comments, albums/photos, todos) run side by side and the wall-clock time of a run
+approaches its longest dependency chain instead of the sum of all tables.
+'''
+
+#importing modules
+import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def dependencies(names: list, *parent_maps):
+    """
+    Merge parent maps ({table: parent or [parents]}) into {table: set of parents},
+    keeping only parents that are part of this run.
+    """
+
+    deps = {name: set() for name in names}
+    for parent_map in parent_maps:
+        for name, parents in parent_map.items():
+            if name not in deps:
+                continue
+            if isinstance(parents, str):
+                parents = [parents]
+            deps[name].update(p for p in parents if p in deps and p != name)
+    return deps
+
+
+def ancestors(name: str, deps: dict):
+    """ The parents of a table, their parents and so on."""
+
+    found = set()
+    todo = list(deps.get(name, ()))
+    while todo:
+        parent = todo.pop()
+        if parent not in found and parent != name:
+            found.add(parent)
+            todo.extend(deps.get(parent, ()))
+    return found
+
+
+def run(names: list, deps: dict, task, workers: int = 4, stage: str = "checking"):
+    """
+    Call task(name) for every table once its parents are done and return {name: result}.
+    A failing task is logged to error.txt (as an error while <stage> the table) and its descendants are skipped.
+    """
+
+    results = {}
+    failed = set()
+    pending = {name: set(deps.get(name, ())) for name in names}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=stage) as executor:
+        while pending or running:
+            # start every table whose parents are all done; skipping a table can make its own
+            # children ready (they are skipped too), so pass over the pending tables until none is
+            skipped = True
+            while skipped:
+                skipped = False
+                for name in [n for n, parents in pending.items() if not parents - results.keys() - failed]:
+                    parents = pending.pop(name)
+                    if parents & failed:
+                        failed.add(name)
+                        skipped = True
+                        with open("error.txt", "a") as fs:
+                            fs.write(f"{datetime.datetime.now()} Skipped {name}: parent table {', '.join(sorted(parents & failed))} failed\n")
+                        continue
+                    running[executor.submit(task, name)] = name
+
+            if not running:
+                # nothing can start any more: the remaining tables wait on each other
+                if pending:
+                    failed.update(pending)
+                    with open("error.txt", "a") as fs:
+                        fs.write(f"{datetime.datetime.now()} Skipped {', '.join(sorted(pending))}: circular foreign keys\n")
+                    pending = {}
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as err:
+                    failed.add(name)
+                    with open("error.txt", "a") as fs:
+                        fs.write(f"{datetime.datetime.now()} Error while {stage} {name}: {err}\n")
+    return results
@@ -0,0 +1,140 @@
+'''
+description:
+schema.py applies a compact dtype schema to every source table at read time.
+The schema lives in schema.json (or in the "schema" section of config.json), which also
+gives the MySQL type of every column and the foreign keys used by tables.py for the DDL.
+The dtypes are the types below. Ids become nullable Int32, repeated
+columns like userId/albumId become category, text becomes Arrow-backed strings (when
+pyarrow is installed) and completed becomes a nullable boolean. Values that do not fit
+their type are read as nulls instead of failing the read, so the checks reject them; their
+source text is kept in a <column>__raw column, which the rule engine records as the original
+value of a rejected row and leaves out of its output.
+Columns missing from the schema keep the default pandas inference.
+'''
+
+#importing modules
+import os
+import json
+import importlib.util
+# pandas and numpy are imported by the functions that read and cast, so loading the spec stays cheap
+
+TYPES = ("Int32", "Int64", "float64", "category", "string", "boolean")
+# Arrow-backed strings take a fraction of the memory of Python string objects
+STRING = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+INT32_RANGE = (-2**31, 2**31 - 1)
+# suffix of the column holding the source text of the values a cast turned into nulls
+RAW_SUFFIX = "__raw"
+
+
+def load_spec(config: dict):
+    """
+    Return the table spec from config.json, or from the file named by "schemapath" (default schema.json); {} when there is none.
+    Every table has "columns" ({column: {"dtype": ..., "sql": ...}}) and optional "foreign_keys" ({column: parent table}).
+    """
+
+    if "schema" in config:
+        return config["schema"]
+    path = config.get("schemapath", "schema.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def load_schema(config: dict):
+    """ Return the dtypes of the spec as {table: {column: type}}."""
+
+    schema = {}
+    for table, spec in load_spec(config).items():
+        schema[table] = {col: column["dtype"] for col, column in spec["columns"].items() if "dtype" in column}
+        for col, kind in schema[table].items():
+            if kind not in TYPES:
+                raise ValueError(f"unknown type {kind} for {table}.{col}, expected one of {TYPES}")
+    return schema
+
+
+def parents(spec: dict):
+    """ {child table: [parent tables]} from the foreign keys of the spec."""
+
+    return {table: list(table_spec["foreign_keys"].values()) for table, table_spec in spec.items() if table_spec.get("foreign_keys")}
+
+
+def read_csv(path: str, columns: dict = None, **kwargs):
+    """
+    pd.read_csv with the schema of one table ({column: type}) applied.
+    Text columns are parsed straight into their dtype; numbers and booleans are parsed
+    with the default inference and cast afterwards, so a bad value becomes a null.
+    With chunksize, an iterator of cast chunks is returned.
+    """
+
+    import pandas as pd
+    if not columns:
+        return pd.read_csv(path, **kwargs)
+    dtype = {col: STRING for col, kind in columns.items() if kind in ("string", "boolean")}
+    reader = pd.read_csv(path, dtype=dtype, **kwargs)
+    if kwargs.get("chunksize"):
+        return (cast(chunk, columns) for chunk in reader)
+    return cast(reader, columns)
+
+
+def cast(df, columns: dict):
+    """
+    Cast the columns of df named in the schema, in place, and return df.
+    The source values of the entries a cast turned into nulls are kept as text in <column>__raw.
+    """
+
+    import pandas as pd
+    for col, kind in columns.items():
+        if col not in df.columns:
+            continue
+        s = source = df[col]
+        if kind in ("Int32", "Int64"):
+            df[col] = to_int(s, kind)
+        elif kind == "float64":
+            df[col] = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif kind == "category":
+            # integral numbers are categorized as ints (float64 ids with nulls would become 1.0, 2.0, ...)
+            if pd.api.types.is_numeric_dtype(s.dtype):
+                s = to_int(s, "Int32")
+            df[col] = s.astype("category")
+        elif kind == "string":
+            df[col] = s.astype(STRING)
+        else:
+            df[col] = to_boolean(s)
+        failed = df[col].isna() & source.notna()
+        if failed.any():
+            df[col + RAW_SUFFIX] = source.astype(STRING).where(failed)
+    return df
+
+
+def raw_columns(df):
+    """ The <column>__raw columns of df."""
+
+    return [col for col in df.columns if col.endswith(RAW_SUFFIX)]
+
+
+def to_int(s, kind: str = "Int32"):
+    """
+    Nullable integers; entries that are not integral numbers, infinite or outside the int64 range become null.
+    Int32 is widened to Int64 when the values do not fit.
+    """
+
+    import numpy as np
+    import pandas as pd
+    if not pd.api.types.is_integer_dtype(s.dtype):
+        s = pd.to_numeric(s, errors="coerce").astype("float64")
+        # 2**63 is the first float above the int64 range
+        s = s.where(np.isfinite(s) & (s == np.floor(s)) & (s >= -2.0**63) & (s < 2.0**63))
+    if kind == "Int32" and s.notna().any() and (s.min() < INT32_RANGE[0] or s.max() > INT32_RANGE[1]):
+        kind = "Int64"
+    return s.astype(kind)
+
+
+def to_boolean(s):
+    """ Nullable booleans from the text "True"/"False"; anything else becomes null."""
+
+    import pandas as pd
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return s.astype("boolean")
+    text = s.astype(STRING)
+    return text.eq("True").astype("boolean").mask(~text.isin(["True", "False"]))
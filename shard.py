@@ -0,0 +1,171 @@
+'''
+description:
+shard.py runs the rules of one large table on a pool of processes ("sharding" in config.json).
+Rows are hash-partitioned by id, so every copy of an id lands in the same shard and the
+primary key check stays exact; all other rules only look at their own row. The valid keys of
+the parent tables are placed once in shared memory and every worker maps them as a KeyIndex,
+instead of receiving a pickled copy per shard. Shard outputs are put back in source order and
+the failing rows of every rule are handed to the rejection sink rule by rule, in row order, so
+the validated table and the rejections are the same as those of a serial run.
+'''
+
+#importing modules
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+import engine
+import lineage
+import metrics
+import patterncache
+from sink import get_sink
+from keyindex import KeyIndex
+
+DEFAULT_OPTIONS = {"processes": 4, "min_rows": 500000, "tables": None}
+
+# state of a worker process, set once by _init_worker
+_worker = {}
+
+
+def options_for(config: dict):
+    options = dict(DEFAULT_OPTIONS)
+    options.update(config.get("sharding", {}))
+    return options
+
+
+def enabled_for(config: dict, name: str, rows: int):
+    """ True when the "sharding" section asks for name to be checked on a process pool."""
+
+    if "sharding" not in config:
+        return False
+    options = options_for(config)
+    if options["tables"] is not None:
+        return name in options["tables"]
+    return int(options["processes"]) > 1 and rows >= int(options["min_rows"])
+
+
+class ShardRecorder:
+    """
+    Stands in for the rejection sink inside a worker: keeps, per rule, the source positions,
+    ids and values of the failing rows, so the parent can record them in serial order.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.last = -1
+        self.failed = {}
+
+    def record(self, ids, values, mask, col: str, table: str, rule: str, action: str, bit: int = None):
+        i = bit
+        if i is None:
+            # engine.run_table records the rules in order, so the rule is the next one with this label
+            for i in range(self.last + 1, len(self.rules)):
+                r = self.rules[i]
+                if (r.column, r.check, r.label) == (col, rule, action):
+                    break
+        self.last = i
+        mask = pd.Series(mask, index=ids.index).fillna(False).astype(bool)
+        self.failed[i] = (ids.index[mask].to_numpy(), ids[mask], values[mask])
+        return int(mask.sum())
+
+
+def share_keys(parents: dict):
+    """ Copy the keys of every parent into shared memory; returns (blocks, {parent: (block name, length)})."""
+
+    blocks, specs = [], {}
+    for parent, keys in parents.items():
+        array = (keys if isinstance(keys, KeyIndex) else KeyIndex(keys)).to_array()
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 8))
+        np.ndarray(array.shape, dtype=np.int64, buffer=block.buf)[:] = array
+        blocks.append(block)
+        specs[parent] = (block.name, len(array))
+    return blocks, specs
+
+
+def _attach(name: str):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 attaching registers the block with the resource tracker the worker shares with
+        # the parent, which is harmless: the parent unlinks the block, and unregisters it, once
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_worker(rules: list, specs: dict, lineage_config: dict):
+    # a worker starts from a clean interpreter: the rules, the keys and the settings come through initargs
+    metrics.configure({})
+    patterncache.configure({})
+    lineage.configure(lineage_config)
+    blocks = {parent: _attach(name) for parent, (name, _) in specs.items()}
+    _worker["blocks"] = blocks
+    _worker["rules"] = rules
+    _worker["parents"] = {
+        parent: KeyIndex.from_sorted(np.ndarray((length,), dtype=np.int64, buffer=blocks[parent].buf))
+        for parent, (_, length) in specs.items()
+    }
+
+
+def _check_shard(shard, table: str):
+    recorder = ShardRecorder(_worker["rules"])
+    out = engine.run_table(shard, table, _worker["rules"], _worker["parents"], recorder=recorder)
+    return out, recorder.failed
+
+
+def _context():
+    # the pool is started from a scheduler thread while other checks, the dist writer and the sink may
+    # hold locks; a forked worker could inherit one of them locked, so workers are never forked
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def partition(ids, shards: int):
+    """ Shard number of every row: a hash of its id modulo shards (equal ids share a shard)."""
+
+    return (pd.util.hash_pandas_object(ids, index=False).to_numpy() % np.uint64(shards)).astype(np.int64)
+
+
+@metrics.step("dq", table_arg=1)
+def run_table(df, table: str, rules: list, parents: dict, processes: int = 4):
+    """
+    Same result as engine.run_table(df, table, rules, parents), computed on a pool of processes.
+    df must have a unique index (as read by pd.read_csv).
+    """
+
+    part = partition(df["id"], processes)
+    positions = [np.flatnonzero(part == i) for i in range(processes)]
+    needed = {rule.parent: parents[rule.parent] for rule in rules if rule.check == "fk"}
+    blocks, specs = share_keys(needed)
+    try:
+        context = _context()
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=_init_worker, initargs=(rules, specs, lineage.as_config())) as pool:
+            futures = []
+            for pos in positions:
+                # positions as index, so the worker's output and rejections say where each row came from
+                shard = df.iloc[pos]
+                shard.index = pos
+                futures.append(pool.submit(_check_shard, shard, table))
+            results = [future.result() for future in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    # validated rows in source order, with their original index
+    out = pd.concat([r[0] for r in results])
+    out = out.iloc[np.argsort(out.index.to_numpy(), kind="stable")]
+    out.index = df.index[out.index.to_numpy()]
+
+    # rejections rule by rule, each in source row order, as a serial run records them
+    sink = get_sink()
+    for i, rule in enumerate(rules):
+        parts = [r[1][i] for r in results if i in r[1]]
+        if not parts:
+            continue
+        order = np.argsort(np.concatenate([p[0] for p in parts]), kind="stable")
+        ids = pd.concat([p[1] for p in parts], ignore_index=True).iloc[order]
+        values = pd.concat([p[2] for p in parts], ignore_index=True).iloc[order]
+        sink.record(ids, values, pd.Series(True, index=ids.index), rule.column, table, rule.check, rule.label, bit=i)
+    return out
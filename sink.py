@@ -0,0 +1,174 @@
+'''
+description:
+sink.py collects the rows rejected or repaired by the data quality checks in dq.py.
+Checks hand over a whole boolean mask and the sink keeps one columnar batch per call
+(table, column, rule, action, id, original value, and the bit of the rule in its table's
+rule list, the same bit lineage.py sets in the flags column), then writes the buffered batches
+in bulk to a JSONL/CSV/Parquet file or to a quarantine table in the database.
+JSONL and CSV files are appended to by every run; a Parquet file cannot be appended to once
+closed, so with parquet the path is a directory and every run writes its own part file in it.
+A count per rule is kept so each run can log a short summary instead of one line per row.
+'''
+
+#importing modules
+import os
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+import metrics
+
+FORMATS = ("jsonl", "csv", "parquet", "table")
+
+
+class RejectionSink:
+    """
+    Buffer rejection batches in memory and flush them to the configured target in bulk.
+    A batch is only built from the masked rows, so the cost of a check is one vectorized
+    selection per call no matter how many rows it rejects.
+    """
+
+    def __init__(self, path: str = "rejections.jsonl", fmt: str = "jsonl", buffer_rows: int = 100000):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown rejection sink format {fmt}, expected one of {FORMATS}")
+        self.path = path
+        self.fmt = fmt
+        self.buffer_rows = buffer_rows
+        self.batches = []
+        self.buffered = 0
+        self.counts = {}
+        self._parquet_writer = None
+        # checks of independent tables may record from several threads
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def reject(self, df, mask, col: str, table: str, rule: str, action: str, key: str = "id"):
+        """
+        Record every row of df selected by mask as one batch.
+        Must be called before the check drops or overwrites the rows, so the original values are kept.
+        """
+
+        ids = df[key] if key in df.columns else df.index.to_series(index=df.index)
+        values = df[col] if col in df.columns else pd.Series(None, index=df.index, dtype="string")
+        return self.record(ids, values, mask, col, table, rule, action)
+
+    def record(self, ids, values, mask, col: str, table: str, rule: str, action: str, bit: int = None):
+        """
+        Record the masked entries of two aligned Series (row ids and original values) as one batch.
+        bit is the position of the rule in the rules of its table (-1 for checks outside engine.py).
+        """
+
+        mask = pd.Series(mask, index=ids.index).fillna(False).astype(bool)
+        n = int(mask.sum())
+        if n == 0:
+            return 0
+
+        batch = pd.DataFrame({
+            "logged_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "table": table,
+            "column": col,
+            "rule": rule,
+            "action": action,
+            "id": ids[mask].astype("string").to_numpy(),
+            "value": values[mask].astype("string").to_numpy(),
+            "bit": np.full(n, -1 if bit is None else bit, dtype=np.int8),
+        })
+        with self._lock:
+            self.batches.append(batch)
+            self.buffered += n
+            self.counts[(table, col, rule, action)] = self.counts.get((table, col, rule, action), 0) + n
+            full = self.buffered >= self.buffer_rows
+
+        if full:
+            self.flush()
+        return n
+
+    def flush(self):
+        """ Write all buffered batches to the target in one call and clear the buffer."""
+
+        with self._lock:
+            if not self.batches:
+                return
+            records = pd.concat(self.batches, ignore_index=True)
+            self.batches = []
+            self.buffered = 0
+
+        # one write at a time, so flushes from several threads do not interleave
+        with self._write_lock, metrics.span("write", "rejections", f"rejections_{self.fmt}", rows_in=len(records)):
+            self._write(records)
+
+    def _write(self, records):
+        if self.fmt == "jsonl":
+            text = records.to_json(orient="records", lines=True)
+            with open(self.path, "a") as fs:
+                fs.write(text if text.endswith("\n") else text + "\n")
+        elif self.fmt == "csv":
+            header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            records.to_csv(self.path, mode="a", header=header, index=False)
+        elif self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            arrow_table = pa.Table.from_pandas(records, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.part_path(), arrow_table.schema)
+            self._parquet_writer.write_table(arrow_table)
+        else:
+            import tables as t
+            t.inserting_rejections(records)
+
+    def part_path(self):
+        """ The parquet file of this run: a timestamped part file in the path directory."""
+
+        os.makedirs(self.path, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        return os.path.join(self.path, f"rejections-{stamp}-{os.getpid()}.parquet")
+
+    def summary(self):
+        """ Return the number of recorded rows per (table, column, rule, action)."""
+
+        return dict(self.counts)
+
+    def log_summary(self, path: str = "error.txt"):
+        """ Append one line per rule to the error log."""
+
+        if not self.counts:
+            return
+        with open(path, "a") as fs:
+            for (table, col, rule, action), n in sorted(self.counts.items()):
+                fs.write(f"{datetime.datetime.now()} {n} rows in {table}.{col} failed {rule} ({action})\n")
+
+    def close(self):
+        """ Flush what is left and release the parquet writer."""
+
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+
+_sink = None
+
+
+def configure(config: dict):
+    """
+    Build the process-wide sink from the optional "rejections" section of config.json,
+    e.g. {"path": "./rejections.jsonl", "format": "jsonl", "buffer_rows": 100000}.
+    """
+
+    global _sink
+    options = config.get("rejections", {})
+    _sink = RejectionSink(
+        path=options.get("path", "rejections.jsonl"),
+        fmt=options.get("format", "jsonl"),
+        buffer_rows=options.get("buffer_rows", 100000),
+    )
+    return _sink
+
+
+def get_sink():
+    """ Return the process-wide sink, creating a default JSONL sink on first use."""
+
+    global _sink
+    if _sink is None:
+        _sink = RejectionSink()
+    return _sink
@@ -0,0 +1,149 @@
+'''
+description:
+stream.py is the chunked mode of the ETL, used when config.json sets "chunksize".
+Every table is read, checked, loaded and appended to dist one chunk at a time, so peak
+memory is bounded by the chunk size instead of the file size. Parent tables are kept only
+as KeyIndex key sets, and a running KeyIndex of primary keys catches duplicates that span
+chunk boundaries (the later copies are dropped; the first copy has already been loaded).
+The stages run as a pipeline connected by bounded queues: a reader thread parses the next
+chunks, this thread checks the current one and a loader thread commits the previous ones,
+so parsing, checks and MySQL round trips overlap. A full queue blocks the stage before it,
+so at most "pipeline": {"queue_size": n} chunks wait between two stages.
+'''
+
+#importing modules
+import queue
+import threading
+import engine
+import metrics
+import schema
+import reader
+import tables as t
+from keyindex import KeyIndex
+
+
+def table_order(rules: dict):
+    """ users first (the root parent), then the tables in rules order."""
+
+    return ["users"] + [name for name in rules if name != "users"]
+
+
+def run(config: dict, rules: dict, dist_writer, order: list, keys: dict, keystore):
+    """
+    Check and load the tables in order chunk by chunk, parents before children; chunks are appended to dist by dist_writer.
+    keys holds the KeyIndex of parents outside this run; the keys of every loaded table are saved in keystore.
+    A table with a failed chunk stops loading, its children are skipped, and their keys are not saved;
+    the failure is raised once the pipeline is done.
+    Reading, checking and loading run as a pipeline (see the module description).
+    """
+
+    chunksize = int(config["chunksize"])
+    schemas = schema.load_schema(config)
+    depth = int(config.get("pipeline", {}).get("queue_size", 2))
+    parsed = queue.Queue(maxsize=depth)
+    checked = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        for name in order:
+            chunks = reader.read_csv(config["srcpath"][name], schemas.get(name), chunksize=chunksize, table=name)
+            for chunk in metrics.timed_chunks(chunks, "extract", name, "read_csv"):
+                if not _put(parsed, (name, chunk), stop):
+                    return
+            # end of a table
+            if not _put(parsed, (name, None), stop):
+                return
+        _put(parsed, None, stop)
+
+    # parent tables of every table, through the schema and the fk rules
+    parents = {name: set(t.PARENTS.get(name, [])) | set(engine.parents_of(rules.get(name, []))) for name in order}
+    # tables with a failed chunk, and the tables skipped because a parent failed
+    failed = set()
+
+    def load():
+        while True:
+            item = _get(checked, stop)
+            if item is None:
+                return
+            name, chunk = item
+            if name not in failed and parents[name] & failed:
+                # as in tables.load_tables, the children of a failed load are not loaded
+                failed.add(name)
+            if chunk is None:
+                if name in failed:
+                    keystore.discard(name)
+                else:
+                    # the whole table is loaded: its keys can serve the FK checks of later runs
+                    keystore.save(name)
+            elif name not in failed and not t.inserting_frame(chunk, config["tables"][name]):
+                failed.add(name)
+
+    threads = [threading.Thread(target=_stage, args=(fn, stop, errors), name=f"stream-{fn.__name__}", daemon=True)
+               for fn in (read, load)]
+    for thread in threads:
+        thread.start()
+
+    # the checks run on this thread, one chunk at a time and in table order, so a child table
+    # only starts once every chunk of its parent is checked
+    table_keys, seen = {}, {}
+    try:
+        while True:
+            item = _get(parsed, stop)
+            if item is None:
+                break
+            name, chunk = item
+            table = config["tables"][name]
+            if chunk is None:
+                keys[name] = keystore.put(name, table_keys.pop(name, KeyIndex()))
+                seen.pop(name, None)
+            else:
+                chunk = engine.run_table(chunk, table, rules.get(name, []), keys, seen.setdefault(name, KeyIndex()))
+                table_keys.setdefault(name, KeyIndex()).add(chunk["id"])
+                dist_writer.append(chunk, config["distpath"][table])
+            if not _put(checked, item if chunk is None else (name, chunk), stop):
+                break
+        _put(checked, None, stop)
+    except Exception:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    if failed:
+        raise RuntimeError(f"loading {', '.join(name for name in order if name in failed)} failed; their keys were not saved")
+
+
+def _stage(fn, stop, errors):
+    """ Run one pipeline stage; an error stops the other stages and is raised by run."""
+
+    try:
+        fn()
+    except Exception as err:
+        errors.append(err)
+        stop.set()
+
+
+def _put(q, item, stop):
+    """ Put item on a bounded queue, waiting while it is full (backpressure); False once the pipeline stops."""
+
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """ Next item of a queue; None at the end of the run or once the pipeline stops."""
+
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
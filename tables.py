@@ -5,282 +5,528 @@ Date : 26/09/2025
 Defines MySQL database tables with appropriate schemas, primary keys, and foreign key constraints.
 Ensures relational integrity and cascading actions between tables.
 Creates tables if they don’t exist to prepare the database for data loading.
+The database itself is reached through the backend of config.json (backends.py: MySQL, SQLite or DuckDB).
 
 '''
 #importing files
-import mysql.connector
+# the database driver, pandas and numpy are imported on first use, so importing tables is cheap
+from contextlib import contextmanager
 import datetime
+import hashlib
 import json
-import pandas as pd
+import loader
+import backends
+import lineage
+import scheduler
+import metrics
+import schema
 # load config
 with open('config.json', 'r') as file:
     config = json.load(file)
 
-mydb = None
-mycursor = None
+# storage backend of the "database" section (backends.py)
+BACKEND = backends.get_backend(config['database'])
 
-def db_connect():
-    """ Ensure the database exists, then connect and provide a global mycursor."""
-    global mydb, mycursor
-    # if already connected and healthy, reuse
-    if mydb is not None and hasattr(mydb, "is_connected") and mydb.is_connected():
-        return mydb
+# columns (dtype and MySQL type) and foreign keys of every table, from schema.json
+SPEC = schema.load_spec(config)
+# parent tables of every foreign key (child -> [parents])
+PARENTS = schema.parents(SPEC)
 
-    try:
-        dbname = config['database']['db']
-
-        # 1) Temporary connection (no database) to ensure database exists
-        tmp = mysql.connector.connect(
-            host=config['database']['host'],
-            user=config['database']['user'],
-            password=config['database']['password']
-        )
-        tmp_cursor = tmp.cursor()
-        # create DB (use backticks to protect identifier)
-        tmp_cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{dbname}`;")
-        tmp.commit()   # safe to call
-        tmp.close()
-
-        # 2) Now connect using the database
-        mydb = mysql.connector.connect(
-            host=config['database']['host'],
-            user=config['database']['user'],
-            password=config['database']['password'],
-            database=dbname
-        )
-        mycursor = mydb.cursor()
-        return mydb
+@contextmanager
+def connection():
+    """ A connection of the configured backend (a pooled one for MySQL), given back afterwards."""
+    with BACKEND.connection() as conn:
+        yield conn
+
+
+def table_name(name: str):
+    """ The database table of a logical table name (the "tables" section of config.json)."""
+
+    return config.get('tables', {}).get(name, name)
 
-    except Exception as err:
-        with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in db_connect: {err}\n")
-        return None
 
+def constraint_name(table: str, col: str):
+    """ Name of the foreign key constraint of table on col."""
 
-def users():
+    return backends.constraint_name(table, col, FOREIGN_KEYS.get(table, {}))
+
+
+def foreign_key_sql(table: str, col: str, parent: str):
+    return BACKEND.foreign_key_sql(table, col, parent, FOREIGN_KEYS.get(table, {}))
+
+
+def create_table_sql(name: str, spec: dict, staging: bool = False):
     """
-    Create the 'users' table in the database if it does not exist.
-    Defines user-related fields and timestamps with default metadata.
-    Logs any errors encountered during table creation.
+    The create table statement of one table of schema.json, with its foreign keys, the lineage flags
+    (when lineage is on) and the audit columns, in the dialect of the backend. A MySQL staging table
+    (<table>__staging) gets the primary key only: no foreign keys and no secondary indexes.
     """
 
-    db_connect()
-    try:
-        mycursor.execute("""
-            create table if not exists users (
-                id                   int primary key,
-                name                 varchar(600),
-                username             varchar(600),
-                email                varchar(600),
-                phone                varchar(600),
-                website              varchar(600),
-                address_street       varchar(600),
-                address_suite        varchar(600),
-                address_city         varchar(600),
-                address_zipcode      varchar(600),
-                address_geo_lat      varchar(600),
-                address_geo_lng      varchar(600),
-                company_name         varchar(600),
-                company_catchPhrase  varchar(600),
-                company_bs           varchar(600),
-                created_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            );
-        """)
-    except mysql.connector.Error as err:
-        with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in users: {err}\n")
+    table = table_name(name)
+    foreign_keys = {col: table_name(parent) for col, parent in spec.get("foreign_keys", {}).items()}
+    columns = spec["columns"]
+    if lineage.column is not None:
+        columns = {**columns, lineage.column: {"sql": lineage.column_sql()}}
+    return BACKEND.create_table_sql(table, columns, foreign_keys, staging)
+
+
+def staging_name(table: str):
+    return backends.staging_name(table)
+
 
-def posts():
+@metrics.step("ddl", table_arg=0)
+def create_table(name: str):
     """
-    Create the 'posts' table with a foreign key referencing 'users'.
-    Includes post-specific fields and timestamps.
+    Create one table of schema.json if it does not exist.
     Logs any errors encountered during table creation.
     """
 
-    db_connect()
     try:
-        mycursor.execute("""
-            create table if not exists posts (
-                userId    int,
-                id        int primary key,
-                title     varchar(600),
-                body      varchar(600),
-                constraint posts_fk foreign key (userId) references users(id) on delete cascade,
-                created_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            );
-        """)
-    except mysql.connector.Error as err:
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(create_table_sql(name, SPEC[name]))
+            conn.commit()
+            cursor.close()
+    except Exception as err:
         with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in posts: {err}\n")
+            fs.write(f"{datetime.datetime.now()} Error in {name}: {err}\n")
+
+
+# foreign keys per database table ({column: parent table}), verified by loads with "defer_checks"
+FOREIGN_KEYS = {table_name(name): {col: table_name(parent) for col, parent in spec.get("foreign_keys", {}).items()}
+                for name, spec in SPEC.items()}
+# logical name (schema.json) of every database table
+LOGICAL = {table_name(name): name for name in SPEC}
+
 
+# metadata table holding the fingerprint of the DDL the tables were created with
+SCHEMA_TABLE = "etl_schema"
 
-def comments():
+
+def schema_fingerprint(statements: list):
+    """ Hash of the generated DDL; it changes whenever schema.json or the table names change."""
+
+    return hashlib.blake2b("\n".join(statements).encode(), digest_size=16).hexdigest()
+
+
+def stored_fingerprint(cursor):
+    """ The fingerprint recorded in SCHEMA_TABLE, or None (also when the table does not exist yet)."""
+
+    try:
+        cursor.execute(f"SELECT fingerprint FROM {BACKEND.q(SCHEMA_TABLE)} WHERE name = 'tables';")
+        row = cursor.fetchone()
+    except Exception:
+        return None
+    return row[0] if row else None
+
+
+@metrics.step("ddl")
+def create_tables():
     """
-    Create the 'comments' table with a foreign key referencing 'posts'.
-    Defines comment-specific fields and timestamps.
+    Create every table of schema.json, in the order of the file (parents before children).
+    All create statements are sent in one round trip, together with the fingerprint of the DDL,
+    which is kept in SCHEMA_TABLE; when the stored fingerprint matches, no DDL is sent at all.
+    Existing tables are not altered: one that lacks columns of schema.json is logged as a warning
+    and the fingerprint is not recorded until it is migrated.
     Logs any errors encountered during table creation.
     """
 
-    db_connect()
+    statements = [create_table_sql(name, SPEC[name]) for name in SPEC]
+    fingerprint = schema_fingerprint(statements)
     try:
-        mycursor.execute("""
-            create table if not exists comments (
-                postId    int,
-                id        int primary key,
-                name      varchar(600),
-                email     varchar(600),
-                body      varchar(600),
-                constraint comments_fk foreign key (postId) references posts(id) on delete cascade,
-                created_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            );
-        """)
-    except mysql.connector.Error as err:
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                stored = stored_fingerprint(cursor)
+                if stored == fingerprint:
+                    return
+                # "create table if not exists" leaves existing tables as they are, so they are compared first
+                existing = {}
+                for name in SPEC:
+                    columns = BACKEND.column_names(cursor, table_name(name))
+                    if columns:
+                        existing[table_name(name)] = {col.replace('.', '_') for col in SPEC[name]["columns"]} - columns
+                missing = {table: cols for table, cols in existing.items() if cols}
+                statements.append(f"create table if not exists {BACKEND.q(SCHEMA_TABLE)} (name varchar(64) primary key, fingerprint char(32), updated_at datetime);")
+                # the fingerprint is only recorded for tables that match it, so a mismatch is reported on every run
+                if not missing:
+                    statements.append(f"{BACKEND.replace} {BACKEND.q(SCHEMA_TABLE)} values ('tables', '{fingerprint}', CURRENT_TIMESTAMP);")
+                BACKEND.execute_script(cursor, statements)
+                conn.commit()
+                if missing:
+                    with open("error.txt", "a") as fs:
+                        for table, cols in sorted(missing.items()):
+                            fs.write(f"{datetime.datetime.now()} Warning in create_tables: existing table {table} has no column {', '.join(sorted(cols))} of schema.json and is not altered; migrate it or drop it\n")
+                elif stored is not None and existing:
+                    with open("error.txt", "a") as fs:
+                        fs.write(f"{datetime.datetime.now()} Warning in create_tables: the table definitions changed; the column types and keys of the existing tables {', '.join(sorted(existing))} are not altered\n")
+                if lineage.column is not None:
+                    adding_lineage_column(conn, cursor)
+            finally:
+                cursor.close()
+    except Exception as err:
         with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in comments: {err}\n")
+            fs.write(f"{datetime.datetime.now()} Error in create_tables: {err}\n")
+
 
-def albums():
+def adding_lineage_column(conn, cursor):
     """
-    Create the 'albums' table with a foreign key referencing 'users'.
-    Includes album-specific fields and timestamps.
-    Logs any errors encountered during table creation.
+    Add the lineage flags column to the tables created before lineage was turned on.
+    Only runs when the DDL changed; the catalog tells which tables miss the column.
     """
 
-    db_connect()
-    try:
-        mycursor.execute("""
-            create table if not exists albums (
-                userId    int,
-                id        int primary key,
-                title     varchar(600),
-                constraint albums_fk foreign key (userId) references users(id) on delete cascade,
-                created_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            );
-        """)
-    except mysql.connector.Error as err:
-        with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in albums: {err}\n")
+    for name in SPEC:
+        if lineage.column not in BACKEND.column_names(cursor, table_name(name)):
+            cursor.execute(f"alter table {BACKEND.q(table_name(name))} add column {BACKEND.q(lineage.column)} {lineage.column_sql()};")
+            conn.commit()
+
 
-def photos():
+def writing_rule_legend(records: list):
     """
-    Create the 'photos' table with a foreign key referencing 'albums'.
-    Defines photo-specific fields and timestamps.
-    Logs any errors encountered during table creation.
+    Replace the legend of the lineage bits (lineage.legend: table, bit, column, rule, action) in its table,
+    so the flags column can be decoded in SQL.
     """
 
-    db_connect()
+    legend = BACKEND.q(lineage.legend_table())
     try:
-        mycursor.execute("""
-            create table if not exists photos (
-                albumId       int,
-                id            int primary key,
-                title         varchar(600),
-                url           varchar(600),
-                thumbnailUrl  varchar(600),
-                constraint photos_fk foreign key (albumId) references albums(id) on delete cascade,
-                created_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+            create table if not exists {legend} (
+                table_name  varchar(64),
+                bit         smallint,
+                column_name varchar(64),
+                rule        varchar(64),
+                action      varchar(255),
+                primary key (table_name, bit)
             );
         """)
-    except mysql.connector.Error as err:
+            cursor.execute(f"DELETE FROM {legend};")
+            if records:
+                cursor.executemany(f"""
+                INSERT INTO {legend} (table_name, bit, column_name, rule, action)
+                VALUES ({', '.join([BACKEND.placeholder] * 5)});
+                """, records)
+            conn.commit()
+            cursor.close()
+    except Exception as err:
         with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in photos: {err}\n")
+            fs.write(f"{datetime.datetime.now()} Error in {lineage.legend_table()}: {err}\n")
+
 
+# True once dq_rejections was checked for the columns added after it was first created
+_rejections_upgraded = False
 
-def todos():
+
+def adding_rejection_columns(conn, cursor):
     """
-    Create the 'todos' table with a foreign key referencing 'users'.
-    Defines task-specific fields including completion status and timestamps.
-    Logs any errors encountered during table creation.
+    Add the rule_bit column to a dq_rejections table created before it existed,
+    when the catalog does not list it.
+    """
+
+    if "rule_bit" not in BACKEND.column_names(cursor, "dq_rejections"):
+        cursor.execute("alter table dq_rejections add column rule_bit smallint;")
+        conn.commit()
+
+
+def inserting_rejections(records):
+    """
+    Append a batch of rejection records from sink.py to the 'dq_rejections' quarantine table.
+    The table is created (or brought up to date) on first use and the whole batch is sent in one executemany.
     """
 
-    db_connect()
+    global _rejections_upgraded
+
     try:
-        mycursor.execute("""
-            create table if not exists todos (
-                userId     int not null,
-                id         int primary key,
-                title      varchar(600),
-                completed  boolean,
-                constraint todos_fk foreign key (userId) references users(id) on delete cascade,
-                created_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_by VARCHAR(255) DEFAULT "Bavani Kishore",
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        with connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+            create table if not exists dq_rejections (
+                logged_at   datetime,
+                table_name  varchar(64),
+                column_name varchar(64),
+                rule        varchar(64),
+                action      varchar(64),
+                row_id      varchar(64),
+                value       text,
+                rule_bit    smallint
             );
         """)
-    except mysql.connector.Error as err:
+            conn.commit()
+            if not _rejections_upgraded:
+                adding_rejection_columns(conn, cursor)
+                _rejections_upgraded = True
+            data_to_insert = list(records[["logged_at", "table", "column", "rule", "action", "id", "value", "bit"]]
+                                  .astype(object).where(records.notna(), None)
+                                  .itertuples(index=False, name=None))
+            cursor.executemany(f"""
+            INSERT INTO dq_rejections (logged_at, table_name, column_name, rule, action, row_id, value, rule_bit)
+            VALUES ({', '.join([BACKEND.placeholder] * 8)});
+            """, data_to_insert)
+            conn.commit()
+            cursor.close()
+    except Exception as err:
         with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in todos: {err}\n")
+            fs.write(f"{datetime.datetime.now()} Error in inserting_rejections: {err}\n")
 
 
 def inserting_data(path :str, name:str):
     """
     Read data from a CSV file and insert it into the specified database table.
-    Uses 'ON DUPLICATE KEY UPDATE' to update existing rows based on primary key conflicts.
-    Handles column name cleanup, prepares parameterized queries, and commits transactions.
-    Logs any errors during the data insertion process.
-    
+    Logs any errors while reading the file; inserting is done by inserting_frame.
+
     """
 
-    db_connect()  # Ensure connection is active
+    import pandas as pd
     try:
         df = pd.read_csv(path)
-        if df.empty:
-            return
+    except Exception as err:
+        with open("error.txt", "a") as fs:
+            fs.write(f"{datetime.datetime.now()} Error in inserting_data for {name}: {err} \n")
+        return
+    inserting_frame(df, name)
+
 
-        # Replace dot in column names with underscore (for SQL)
-        clean_columns = [col.replace('.', '_') for col in df.columns]
-        columns_sql = [f"`{col}`" for col in clean_columns]
-        placeholders = ', '.join(['%s'] * len(columns_sql))
-
-        # Build the ON DUPLICATE KEY UPDATE clause (excluding 'id')
-        update_clause = ', '.join([
-            f"{col}=VALUES({col})"
-            for col in columns_sql
-            if col != '`id`'  # do not try to update the primary key
-        ])
-
-        insert_sql = f"""
-            INSERT INTO `{name}` ({', '.join(columns_sql)})
-            VALUES ({placeholders})
-            ON DUPLICATE KEY UPDATE {update_clause};
-        """
-
-        # Prepare data
-        data_to_insert = []
-        for _, row in df.iterrows():
-            row_values = []
-            for val in row:
-                if pd.isna(val):
-                    row_values.append(None)
-                elif isinstance(val, bool):
-                    row_values.append(val)
+@metrics.step("load", table_arg=1)
+def inserting_frame(df, name:str, checkpoints=None):
+    """
+    Insert an already validated DataFrame (or Arrow table) into the specified database table.
+    Upserts on the primary key with the native path of the backend (for MySQL, the loader strategy
+    configured for the table, see loader.py) and commits the transaction on a pooled connection of its own.
+    With a checkpoint.CheckpointStore, rows are committed checkpoints.commit_rows at a time and
+    every commit is recorded, so an interrupted load can resume after the last committed batch.
+    Logs any errors during the data insertion process and returns whether the load succeeded.
+
+    """
+
+    try:
+        import pandas as pd
+        if not isinstance(df, pd.DataFrame):
+            df = df.to_pandas()
+        if df.empty:
+            if checkpoints is not None:
+                checkpoints.finish(name)
+            return True
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                options = dict(loader.options_for(config, name), foreign_keys=FOREIGN_KEYS.get(name, {}))
+                if checkpoints is None:
+                    BACKEND.upsert(conn, cursor, df, name, options)
                 else:
-                    row_values.append(val)
-            data_to_insert.append(tuple(row_values))
+                    for start in range(0, len(df), checkpoints.commit_rows):
+                        part = df.iloc[start:start + checkpoints.commit_rows]
+                        BACKEND.upsert(conn, cursor, part, name, options)
+                        checkpoints.advance(name, len(part), part["id"].iloc[-1])
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        if checkpoints is not None:
+            checkpoints.finish(name)
+        return True
+
+    except Exception as err:
+        with open("error.txt", "a") as fs:
+            fs.write(f"{datetime.datetime.now()} Error in inserting_frame for {name}: {err} \n")
+        return False
+
+
+def load_tables(frames: dict, workers: int = None, checkpoints=None):
+    """
+    Load validated tables concurrently, each on its own pooled connection and transaction.
+    A table starts once its parent tables (PARENTS) are committed; children of a failed load are skipped.
+    checkpoints (a checkpoint.CheckpointStore) makes every load commit and record batches.
+    Returns the names of the tables that were loaded.
+    """
 
-        # Execute batch insert/update
-        mycursor.executemany(insert_sql, data_to_insert)
-        mydb.commit()
+    if workers is None:
+        # keep one pooled connection free for the rejection sink and key fetches
+        workers = max(1, int(config['database'].get('pool_size', 5)) - 1)
+    if BACKEND.writers is not None:
+        # an embedded database takes one writer at a time
+        workers = min(workers, BACKEND.writers)
+
+    def load_table(name):
+        if not inserting_frame(frames[name], name, checkpoints):
+            raise RuntimeError(f"loading {name} failed")
+
+    def load(names):
+        return set(scheduler.run(names, scheduler.dependencies(names, PARENTS), load_table, workers, stage="loading"))
+
+    # full-refresh (swap) tables are swapped in together: after the upserted tables they depend on,
+    # before the upserted tables that depend on them
+    swap = [name for name in frames if loader.options_for(config, name)["strategy"] == "swap"]
+    if not swap:
+        return load(list(frames))
+    after = descendants(swap)
+    loaded = load([name for name in frames if name not in swap and name not in after])
+    if not refreshing_tables({name: frames[name] for name in swap}, checkpoints):
+        return loaded
+    return loaded | set(swap) | load([name for name in frames if name in after and name not in swap])
+
+
+def descendants(names: list):
+    """ Every table that references one of names, directly or through other tables."""
+
+    found = set()
+    todo = list(names)
+    while todo:
+        parent = todo.pop()
+        for table, fks in FOREIGN_KEYS.items():
+            if parent in fks.values() and table not in found:
+                found.add(table)
+                todo.append(table)
+    return found
+
+
+@metrics.step("load")
+def refreshing_tables(frames: dict, checkpoints=None):
+    """
+    Full refresh of the given tables ({table: validated DataFrame}, parents before children).
+    Every table is bulk-inserted into a fresh <table>__staging holding only its primary key, its
+    secondary (foreign key) indexes are built once after the insert and its row count is checked
+    against the DataFrame. Then all staging tables replace the live ones in one atomic RENAME TABLE
+    (on SQLite and DuckDB: DROP TABLE and ALTER TABLE ... RENAME in one transaction), so readers
+    see either the old or the new tables, never a half-loaded one.
+    Logs any errors (the live tables are left untouched) and returns whether the refresh succeeded.
+    """
+
+    try:
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for name, df in frames.items():
+                    staging = staging_name(name)
+                    options = loader.options_for(config, name)
+                    cursor.execute(f"DROP TABLE IF EXISTS {BACKEND.q(staging)};")
+                    cursor.execute(create_table_sql(LOGICAL.get(name, name), SPEC[LOGICAL.get(name, name)], staging=True))
+                    if not df.empty:
+                        BACKEND.upsert(conn, cursor, df, staging, dict(options, strategy=options.get("load_with", "batch")))
+                    if BACKEND.name == "mysql":
+                        for col in FOREIGN_KEYS.get(name, {}):
+                            cursor.execute(f"ALTER TABLE `{staging}` ADD INDEX `{col}_idx` (`{col}`);")
+                    cursor.execute(f"SELECT COUNT(*) FROM {BACKEND.q(staging)};")
+                    count = (cursor.fetchone() or (len(df),))[0]
+                    if count != len(df):
+                        raise ValueError(f"{staging} holds {count} rows, {len(df)} passed the checks")
+                if BACKEND.transactional_ddl:
+                    BACKEND.swap_tables(conn, cursor, list(frames))
+                else:
+                    swapping_tables(cursor, list(frames))
+            except Exception:
+                conn.rollback()
+                for name in frames:
+                    cursor.execute(f"DROP TABLE IF EXISTS {BACKEND.q(staging_name(name))};")
+                raise
+            finally:
+                cursor.close()
+        if checkpoints is not None:
+            for name in frames:
+                checkpoints.finish(name)
+        return True
 
     except Exception as err:
         with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in inserting_data for {name}: {err} \n")
+            fs.write(f"{datetime.datetime.now()} Error in refreshing_tables for {', '.join(frames)}: {err} \n")
+        return False
+
+
+def swapping_tables(cursor, names: list):
+    """
+    Swap <table>__staging into place for every table in names, in one MySQL RENAME TABLE statement.
+    InnoDB foreign keys follow a renamed parent, so the constraints that pointed at a replaced
+    table are dropped and added again on the new tables once the old ones are gone.
+    """
+
+    swapped = set(names)
+    # tables outside the refresh whose parent is replaced
+    children = [table for table, fks in FOREIGN_KEYS.items() if table not in swapped and set(fks.values()) & swapped]
+
+    cursor.execute("RENAME TABLE " + ", ".join(f"`{n}` TO `{n}__old`, `{staging_name(n)}` TO `{n}`" for n in names) + ";")
+    cursor.execute("SET SESSION foreign_key_checks = 0;")
+    try:
+        for table in children:
+            for col, parent in FOREIGN_KEYS[table].items():
+                if parent in swapped:
+                    cursor.execute(f"ALTER TABLE `{table}` DROP FOREIGN KEY `{constraint_name(table, col)}`;")
+        for name in reversed(names):
+            cursor.execute(f"DROP TABLE IF EXISTS `{name}__old`;")
+        # with foreign_key_checks off the constraints are added without a scan; the rows are verified below
+        for table in names + children:
+            for col, parent in FOREIGN_KEYS.get(table, {}).items():
+                if table in swapped or parent in swapped:
+                    cursor.execute(f"ALTER TABLE `{table}` ADD {foreign_key_sql(table, col, parent)};")
+    finally:
+        cursor.execute("SET SESSION foreign_key_checks = 1;")
+
+    for table in names + children:
+        for col, parent in FOREIGN_KEYS.get(table, {}).items():
+            cursor.execute(f"""
+                SELECT COUNT(*) FROM `{table}` c LEFT JOIN `{parent}` p ON p.id = c.`{col}`
+                WHERE c.`{col}` IS NOT NULL AND p.id IS NULL;
+            """)
+            orphans = (cursor.fetchone() or (0,))[0]
+            if orphans:
+                with open("error.txt", "a") as fs:
+                    fs.write(f"{datetime.datetime.now()} {orphans} rows of {table} reference missing rows of {parent} after the refresh\n")
+
+
+@metrics.step("extract", table_arg=0)
+def fetching_keys(name:str, batch_size:int = 100000):
+    """
+    Fetch every id of the specified table as an int64 numpy array, batch_size rows per round trip.
+    Used by keyindex.KeyStore when a parent table's keys are not cached on disk.
+    """
+
+    with connection() as conn:
+        cursor = conn.cursor()
+        keys = BACKEND.fetch_keys(cursor, name, batch_size)
+        cursor.close()
+    return keys
+
+
+@metrics.step("load", table_arg=0)
+def deleting_rows(name:str, ids, batch_size:int = 1000):
+    """
+    Delete the rows with the given ids from the specified table, batch_size ids per statement.
+    Children are removed by the 'on delete cascade' foreign keys on MySQL, and explicitly, in the
+    same transaction, on the embedded backends. Logs any errors.
+    """
+
+    try:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return
+        with connection() as conn:
+            cursor = conn.cursor()
+            if not BACKEND.cascades:
+                deleting_children(cursor, name, ids, batch_size)
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                cursor.execute(f"DELETE FROM {BACKEND.q(name)} WHERE id IN ({', '.join([BACKEND.placeholder] * len(batch))});", batch)
+            conn.commit()
+            cursor.close()
 
     except Exception as err:
         with open("error.txt", "a") as fs:
-            fs.write(f"{datetime.datetime.now()} Error in inserting_data for {name}: {err} \n")
+            fs.write(f"{datetime.datetime.now()} Error in deleting_rows for {name}: {err} \n")
+
+
+def deleting_children(cursor, name: str, ids: list, batch_size: int = 1000):
+    """ Delete the rows of every table referencing the given ids of name, their own children first."""
+
+    for child, fks in FOREIGN_KEYS.items():
+        for col, parent in fks.items():
+            if parent != name:
+                continue
+            column = BACKEND.q(col.replace('.', '_'))
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                where = f"{column} IN ({', '.join([BACKEND.placeholder] * len(batch))})"
+                cursor.execute(f"SELECT id FROM {BACKEND.q(child)} WHERE {where};", batch)
+                child_ids = [int(row[0]) for row in cursor.fetchall()]
+                if child_ids:
+                    deleting_children(cursor, child, child_ids, batch_size)
+                cursor.execute(f"DELETE FROM {BACKEND.q(child)} WHERE {where};", batch)
@@ -0,0 +1,10 @@
+'''
+description:
+The modules of the ETL live at the root of the repository; the tests import them from there.
+'''
+
+#importing modules
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,93 @@
+'''
+description:
+Helpers of the end-to-end tests: a temporary project directory with its own config.json, copies of
+the source files and an embedded database (SQLite or DuckDB), and "python app.py" runs inside it.
+'''
+
+#importing modules
+import json
+import shutil
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+REPO = Path(__file__).resolve().parent.parent
+TABLES = ["users", "posts", "comments", "albums", "photos", "todos"]
+AUDIT_COLUMNS = ["created_by", "created_at", "updated_by", "updated_at"]
+
+
+def make_project(path: Path, backend: str = "sqlite", **sections):
+    """ A working directory with the source files and a config.json for an embedded backend; sections override the config."""
+
+    path.mkdir(parents=True, exist_ok=True)
+    shutil.copytree(REPO / "src", path / "src")
+    (path / "dist").mkdir()
+    config = {
+        "database": {"backend": backend, "path": str(path / f"etl.{backend}")},
+        "srcpath": {name: str(path / "src" / f"{name}.csv") for name in TABLES},
+        "tables": {name: name for name in TABLES},
+        "distpath": {name: str(path / "dist" / f"{name}.csv") for name in TABLES},
+        "rulespath": str(REPO / "rules.json"),
+        "schemapath": str(REPO / "schema.json"),
+        "keyindex": {"path": str(path / "state" / "keys")},
+        "rejections": {"path": str(path / "rejections.jsonl")},
+    }
+    config.update(sections)
+    (path / "config.json").write_text(json.dumps(config, indent=1))
+    return path
+
+
+def run_etl(path: Path, patch: str = ""):
+    """ One run of app.py in path; patch is Python code executed before the run (e.g. to inject a failure)."""
+
+    code = f"import sys\nsys.path.insert(0, {str(REPO)!r})\n{patch}\nimport app\napp.run()\n"
+    result = subprocess.run([sys.executable, "-c", code], cwd=path, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+
+
+def query(path: Path, sql: str):
+    """ The result of a query on the database of the project, as a DataFrame."""
+
+    config = json.loads((path / "config.json").read_text())["database"]
+    if config["backend"] == "duckdb":
+        import duckdb
+        conn = duckdb.connect(config["path"], read_only=True)
+        try:
+            return conn.execute(sql).df()
+        finally:
+            conn.close()
+    with sqlite3.connect(config["path"]) as conn:
+        return pd.read_sql_query(sql, conn)
+
+
+def table(path: Path, name: str):
+    """ The rows of a loaded table in id order, without the audit columns."""
+
+    df = query(path, f'SELECT * FROM "{name}" ORDER BY id')
+    return df.drop(columns=[col for col in AUDIT_COLUMNS if col in df.columns])
+
+
+def rejections(path: Path):
+    """ The rejection records of the run in the order they were written, without the timestamp."""
+
+    file = path / "rejections.jsonl"
+    if not file.exists():
+        return pd.DataFrame()
+    return pd.read_json(file, lines=True, dtype=False).drop(columns=["logged_at"])
+
+
+def errors(path: Path):
+    """ The error lines of error.txt (the per-rule summary lines are not errors)."""
+
+    file = path / "error.txt"
+    if not file.exists():
+        return []
+    return [line for line in file.read_text().splitlines() if "rror" in line]
+
+
+def assert_same_tables(left: Path, right: Path):
+    for name in TABLES:
+        pd.testing.assert_frame_equal(table(left, name), table(right, name), check_dtype=False, obj=name)
@@ -0,0 +1,89 @@
+'''
+description:
+The embedded backends of backends.py (SQLite and DuckDB): DDL from the spec, upserts of a DataFrame,
+key fetches, catalog reads and table swaps, plus a whole DuckDB run against the SQLite one.
+'''
+
+#importing modules
+import pandas as pd
+import pytest
+
+import backends
+from helpers import make_project, run_etl, errors, assert_same_tables
+
+COLUMNS = {"id": {"sql": "int primary key"}, "title": {"sql": "varchar(255)"}, "address.city": {"sql": "varchar(64)"}}
+
+
+@pytest.fixture(params=["sqlite", "duckdb"])
+def backend(request, tmp_path):
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+    backend = backends.get_backend({"backend": request.param, "path": str(tmp_path / f"etl.{request.param}")})
+    with backend.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(backend.create_table_sql("posts", COLUMNS, {}))
+        conn.commit()
+    return backend
+
+
+def rows(backend, name: str = "posts"):
+    with backend.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT id, title, address_city FROM {backend.q(name)} ORDER BY id;")
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def upsert(backend, df, name: str = "posts"):
+    with backend.connection() as conn:
+        backend.upsert(conn, conn.cursor(), df, name, {})
+
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(ValueError):
+        backends.get_backend({"backend": "oracle"})
+
+
+def test_upsert_inserts_then_updates(backend):
+    upsert(backend, pd.DataFrame({"id": [1, 2], "title": ["a", None], "address.city": ["x", "y"]}))
+    upsert(backend, pd.DataFrame({"id": [2, 3], "title": ["b", "c"], "address.city": ["z", None]}))
+
+    assert rows(backend) == [(1, "a", "x"), (2, "b", "z"), (3, "c", None)]
+
+
+def test_category_ids_are_loaded_as_integers(backend):
+    upsert(backend, pd.DataFrame({"id": pd.Series([5, 4]).astype("category"), "title": ["a", "b"],
+                                  "address.city": ["x", "y"]}))
+    assert [row[0] for row in rows(backend)] == [4, 5]
+
+
+def test_keys_and_columns_come_from_the_database(backend):
+    upsert(backend, pd.DataFrame({"id": range(1, 8), "title": ["t"] * 7, "address.city": ["c"] * 7}))
+    with backend.connection() as conn:
+        cursor = conn.cursor()
+        assert sorted(backend.fetch_keys(cursor, "posts", batch_size=3).tolist()) == list(range(1, 8))
+        assert {"id", "title", "address_city", "created_at"} <= backend.column_names(cursor, "posts")
+        assert backend.column_names(cursor, "missing") == set()
+
+
+def test_swap_puts_the_staging_table_in_place(backend):
+    upsert(backend, pd.DataFrame({"id": [1], "title": ["old"], "address.city": ["x"]}))
+    with backend.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(backend.create_table_sql("posts", COLUMNS, {}, staging=True))
+        conn.commit()
+        backend.upsert(conn, cursor, pd.DataFrame({"id": [2], "title": ["new"], "address.city": ["y"]}),
+                       backends.staging_name("posts"), {})
+        backend.swap_tables(conn, cursor, ["posts"])
+
+    assert rows(backend) == [(2, "new", "y")]
+
+
+def test_duckdb_run_matches_sqlite_run(tmp_path):
+    pytest.importorskip("duckdb")
+    sqlite = make_project(tmp_path / "sqlite", "sqlite", distformat="none")
+    duckdb = make_project(tmp_path / "duckdb", "duckdb", distformat="none")
+    run_etl(sqlite)
+    run_etl(duckdb)
+
+    assert errors(duckdb) == []
+    assert_same_tables(sqlite, duckdb)
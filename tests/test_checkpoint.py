@@ -0,0 +1,62 @@
+'''
+description:
+CheckpointStore of checkpoint.py: a checkpoint is resumed only while the source file of its table
+and those of its ancestor tables are unchanged.
+'''
+
+#importing modules
+import json
+
+import pandas as pd
+
+import checkpoint
+
+
+def store(tmp_path):
+    return checkpoint.CheckpointStore(str(tmp_path / "checkpoints"), commit_rows=2)
+
+
+def test_resumes_from_the_first_uncommitted_row(tmp_path):
+    checkpoints = store(tmp_path)
+    df = pd.DataFrame({"id": [1, 2, 3]})
+    checkpoints.begin("photos", "h", df, {"albums": "a"})
+    checkpoints.advance("photos", 2, 2)
+
+    resumed, committed = store(tmp_path).resume("photos", "h", {"albums": "a"})
+    pd.testing.assert_frame_equal(resumed, df)
+    assert committed == 2
+
+
+def test_changed_parent_discards_the_checkpoint(tmp_path):
+    checkpoints = store(tmp_path)
+    checkpoints.begin("photos", "h", pd.DataFrame({"id": [1, 2, 3]}), {"albums": "a"})
+
+    assert checkpoints.resume("photos", "h", {"albums": "changed"}) is None
+    assert checkpoints.get("photos") is None
+
+
+def test_changed_parent_reloads_a_finished_table(tmp_path):
+    checkpoints = store(tmp_path)
+    checkpoints.begin("albums", "h", pd.DataFrame({"id": [1]}), {"users": "u"})
+    checkpoints.finish("albums")
+
+    assert checkpoints.done("albums", "h", {"users": "u"})
+    assert not checkpoints.done("albums", "h", {"users": "changed"})
+    assert not checkpoints.done("albums", "other", {"users": "u"})
+
+
+def test_checkpoint_without_parent_hashes_is_not_trusted(tmp_path):
+    checkpoints = store(tmp_path)
+    checkpoints.begin("photos", "h", pd.DataFrame({"id": [1]}))
+    entry = checkpoints.get("photos")
+    del entry["parents"]
+    (tmp_path / "checkpoints" / "photos.json").write_text(json.dumps(entry))
+
+    assert checkpoints.resume("photos", "h", {"albums": "a"}) is None
+
+
+def test_fingerprints_hash_each_file(tmp_path):
+    (tmp_path / "a.csv").write_text("id\n1\n")
+    (tmp_path / "b.csv").write_text("id\n2\n")
+    hashes = store(tmp_path).fingerprints({"a": str(tmp_path / "a.csv"), "b": str(tmp_path / "b.csv")})
+    assert hashes["a"] != hashes["b"]
@@ -0,0 +1,51 @@
+'''
+description:
+create_tables on the embedded SQLite backend: the DDL fingerprint is recorded only while the existing
+tables have every column of schema.json, since "create table if not exists" does not alter them.
+'''
+
+#importing modules
+import sqlite3
+
+from helpers import make_project, run_etl, query
+
+
+def warnings(path):
+    file = path / "error.txt"
+    return [line for line in file.read_text().splitlines() if "Warning in create_tables" in line] if file.exists() else []
+
+
+def fingerprints(path):
+    return len(query(path, "SELECT * FROM etl_schema"))
+
+
+def test_new_tables_record_the_fingerprint(tmp_path):
+    path = make_project(tmp_path, distformat="none")
+    run_etl(path)
+
+    assert warnings(path) == []
+    assert fingerprints(path) == 1
+
+
+def test_outdated_table_is_reported_until_it_is_migrated(tmp_path):
+    path = make_project(tmp_path, distformat="none")
+    # a users table of an older schema.json, without the phone column
+    with sqlite3.connect(path / "etl.sqlite") as conn:
+        conn.execute("create table users (id integer primary key, name text, username text, email text)")
+    run_etl(path)
+
+    assert len(warnings(path)) == 1
+    assert "existing table users has no column" in warnings(path)[0]
+    assert "phone" in warnings(path)[0]
+    assert fingerprints(path) == 0
+
+    run_etl(path)
+    assert len(warnings(path)) == 2
+
+    # once the table is dropped it is created from schema.json and the fingerprint is kept
+    with sqlite3.connect(path / "etl.sqlite") as conn:
+        conn.execute("drop table users")
+    run_etl(path)
+    run_etl(path)
+    assert len(warnings(path)) == 2
+    assert fingerprints(path) == 1
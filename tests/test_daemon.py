@@ -0,0 +1,106 @@
+'''
+description:
+daemon.py: settled source files are coalesced into one run of their tables and of every table
+that depends on them.
+'''
+
+#importing modules
+import os
+
+import pytest
+
+import daemon
+
+DEPS = {"users": set(), "posts": {"users"}, "comments": {"posts"}, "albums": {"users"}, "photos": {"albums"}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(daemon.time, "monotonic", clock)
+    return clock
+
+
+def touch(path, text):
+    path.write_text(text)
+    # a distinct mtime for every write, whatever the resolution of the file system
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def test_dependents_follow_foreign_keys_transitively():
+    assert daemon.dependents({"users"}, DEPS) == set(DEPS)
+    assert daemon.dependents({"albums"}, DEPS) == {"albums", "photos"}
+    assert daemon.dependents(set(), DEPS) == set()
+
+
+def test_changed_files_wait_for_the_debounce(tmp_path, clock):
+    paths = {name: tmp_path / f"{name}.csv" for name in ("users", "posts")}
+    for path in paths.values():
+        path.write_text("id\n1\n")
+    watcher = daemon.Watcher({name: str(path) for name, path in paths.items()}, debounce=2.0)
+    assert watcher.poll() == set()
+
+    touch(paths["users"], "id\n1\n2\n")
+    assert watcher.poll() == set()
+    clock.now = 1.0
+    # a second file lands while the first one settles: both are handed over together
+    touch(paths["posts"], "id\n1\n2\n")
+    assert watcher.poll() == set()
+    clock.now = 2.5
+    assert watcher.poll() == set()
+    clock.now = 3.5
+    assert watcher.poll() == {"users", "posts"}
+    assert watcher.poll() == set()
+
+
+def test_file_still_being_written_is_not_taken(tmp_path, clock):
+    path = tmp_path / "users.csv"
+    path.write_text("id\n")
+    watcher = daemon.Watcher({"users": str(path)}, debounce=2.0)
+
+    touch(path, "id\n1\n")
+    watcher.poll()
+    clock.now = 1.5
+    touch(path, "id\n1\n2\n")
+    watcher.poll()
+    clock.now = 3.0
+    assert watcher.poll() == set()
+    clock.now = 4.0
+    assert watcher.poll() == {"users"}
+
+
+def test_serve_runs_everything_then_the_affected_tables(tmp_path, monkeypatch, clock):
+    monkeypatch.chdir(tmp_path)
+    srcpath = {name: str(tmp_path / f"{name}.csv") for name in DEPS}
+    for path in srcpath.values():
+        with open(path, "w") as fs:
+            fs.write("id\n1\n")
+
+    class Wakeup:
+        def __init__(self, paths):
+            self.calls = 0
+
+        def wait(self, seconds):
+            self.calls += 1
+            clock.now += 10
+            if self.calls == 1:
+                touch(tmp_path / "albums.csv", "id\n1\n2\n")
+            if self.calls == 3:
+                raise KeyboardInterrupt
+    monkeypatch.setattr(daemon, "Wakeup", Wakeup)
+
+    runs = []
+    with pytest.raises(KeyboardInterrupt):
+        daemon.serve({"srcpath": srcpath, "daemon": {"debounce": 1.0}}, runs.append, DEPS)
+
+    assert runs == [sorted(DEPS), ["albums", "photos"]]
+    assert "New source files for albums, running albums, photos" in (tmp_path / "error.txt").read_text()
@@ -0,0 +1,89 @@
+'''
+description:
+DistWriter: whole tables and chunked appends in every format, read back whole.
+'''
+
+#importing modules
+import threading
+
+import pandas as pd
+import pytest
+
+import dist
+
+
+def read(path, fmt: str):
+    if fmt == "csv":
+        return pd.read_csv(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_feather(path)
+
+
+def chunks():
+    # the first chunk has one category, a later one 300: the dictionary index grows from int8 to int16
+    first = pd.DataFrame({"id": [1, 2], "userId": pd.Series([7, 7]).astype("category"), "title": ["a", "b"]})
+    later = pd.DataFrame({"id": range(3, 303), "userId": pd.Series(range(300)).astype("category"),
+                          "title": ["c"] * 300})
+    return [first, later]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_chunked_append_keeps_every_row(tmp_path, monkeypatch, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    # failed writes are logged to error.txt in the working directory
+    monkeypatch.chdir(tmp_path)
+    writer = dist.DistWriter(fmt)
+    target = str(tmp_path / "posts.csv")
+    for chunk in chunks():
+        writer.append(chunk, target)
+    writer.close()
+
+    out = read(writer.path(target), fmt)
+    assert len(out) == 302
+    assert out["id"].tolist() == list(range(1, 303))
+    assert out["userId"].astype(int).tolist() == [7, 7] + list(range(300))
+    assert not (tmp_path / "error.txt").exists()
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_write_replaces_the_file(tmp_path, fmt):
+    if fmt != "csv":
+        pytest.importorskip("pyarrow")
+    writer = dist.DistWriter(fmt)
+    target = str(tmp_path / "posts.csv")
+    first, later = chunks()
+    writer.write(later, target)
+    writer.write(first, target)
+    writer.close()
+
+    assert read(writer.path(target), fmt)["id"].tolist() == [1, 2]
+
+
+def test_writes_wait_while_the_queue_is_full(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    writer = dist.DistWriter("csv", queue_size=2)
+    release = threading.Event()
+    write_file = writer._write_file
+
+    def slow(df, path, append):
+        release.wait(5)
+        write_file(df, path, append)
+    monkeypatch.setattr(writer, "_write_file", slow)
+
+    df = pd.DataFrame({"id": [1]})
+    writer.write(df, str(tmp_path / "a.csv"))
+    writer.write(df, str(tmp_path / "b.csv"))
+    third = threading.Thread(target=writer.write, args=(df, str(tmp_path / "c.csv")))
+    third.start()
+    third.join(0.2)
+    # two writes are pending: the third one waits for a free slot
+    assert third.is_alive()
+    assert len(writer.futures) == 2
+
+    release.set()
+    third.join(5)
+    writer.close()
+    for name in "abc":
+        assert read(tmp_path / f"{name}.csv", "csv")["id"].tolist() == [1]
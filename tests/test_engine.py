@@ -0,0 +1,94 @@
+'''
+description:
+The rule engine of engine.py: rules.json compiles, and one pass over a table drops, fills and
+records the same rows a chain of dq checks would.
+'''
+
+#importing modules
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import engine
+import sink
+from keyindex import KeyIndex
+
+RULES = [
+    {"column": "id", "check": "primary_key", "action": "drop"},
+    {"column": "userId", "check": "fk", "parent": "users", "action": "drop"},
+    {"column": "title", "check": "not_null", "action": "fill", "value": "untitled"},
+    {"column": "subtitle", "check": "not_null", "action": "fill_from", "from": "title"},
+    {"column": "email", "check": "email", "action": "null"},
+]
+
+
+def posts():
+    return pd.DataFrame({
+        "id": [1, 2, 2, 3, 4, 5],
+        "userId": [10, 10, 10, 99, 11, 10],
+        "title": ["a", "b", "c", None, None, "e"],
+        "subtitle": ["x", None, None, "y", None, "z"],
+        "email": ["a@b.com", "bad", "c@d.org", "bad", "g@h.io", "nope"],
+    })
+
+
+def run(df, rules=RULES, parents=None, **kwargs):
+    recorder = sink.RejectionSink("unused.jsonl")
+    out = engine.run_table(df, "posts", engine.compile_rules({"posts": rules})["posts"],
+                           parents or {"users": KeyIndex([10, 11])}, recorder=recorder, **kwargs)
+    records = pd.concat(recorder.batches, ignore_index=True) if recorder.batches else pd.DataFrame()
+    return out, records
+
+
+def test_repo_rules_compile():
+    rules = engine.compile_rules(engine.load_rules({"rulespath": str(Path(__file__).resolve().parent.parent / "rules.json")}))
+    assert set(rules) == {"users", "posts", "comments", "albums", "photos", "todos"}
+    assert engine.parents_of(rules["photos"]) == ["albums"]
+
+
+def test_one_pass_drops_fills_and_nulls():
+    out, records = run(posts())
+
+    # every copy of a duplicated id is dropped, as by dq.valid_primary_key
+    assert out["id"].tolist() == [1, 4, 5]
+    assert out["title"].tolist() == ["a", "untitled", "e"]
+    # fill_from reads the column as already repaired by the earlier rule
+    assert out["subtitle"].tolist() == ["x", "untitled", "z"]
+    assert out["email"].isna().tolist() == [False, False, True]
+    assert records[["rule", "action", "id"]].values.tolist() == [
+        ["primary_key", "drop", "2"],
+        ["primary_key", "drop", "2"],
+        ["fk", "drop", "3"],
+        ["not_null", "fill:untitled", "4"],
+        ["not_null", "fill_from:title", "4"],
+        ["email", "null", "5"],
+    ]
+    assert records["bit"].tolist() == [0, 0, 1, 2, 3, 4]
+
+
+def test_dropped_rows_are_not_checked_again():
+    # id 3 fails the fk rule, so its missing title and bad email are never recorded
+    _, records = run(posts())
+    assert "3" not in records.loc[records["rule"] != "fk", "id"].tolist()
+
+
+def test_seen_keys_drop_ids_of_earlier_chunks():
+    seen = KeyIndex([1])
+    out, _ = run(posts(), seen=seen)
+
+    assert out["id"].tolist() == [4, 5]
+    assert seen.contains(pd.Series([1, 4, 5])).tolist() == [True, True, True]
+
+
+def test_input_frame_is_left_alone():
+    df = posts()
+    run(df)
+    pd.testing.assert_frame_equal(df, posts())
+
+
+@pytest.mark.parametrize("spec", [{"column": "id", "check": "unique"},
+                                  {"column": "id", "check": "not_null", "action": "delete"}])
+def test_unknown_check_or_action_is_refused(spec):
+    with pytest.raises(ValueError):
+        engine.Rule(spec)
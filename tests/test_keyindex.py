@@ -0,0 +1,68 @@
+'''
+description:
+KeyIndex and KeyStore of keyindex.py: compact key sets checked a whole column at a time, cached on
+disk between runs and fetched from the database as a last resort.
+'''
+
+#importing modules
+import numpy as np
+import pandas as pd
+import pytest
+
+from keyindex import KeyIndex, KeyStore, as_int64
+
+
+def test_contains_checks_a_whole_column():
+    index = KeyIndex([5, 1, 3])
+    values = pd.Series([1, 2, 3, None, 5.0, 5.5, "3", "x"], dtype=object)
+    assert index.contains(values).tolist() == [True, False, True, False, True, False, True, False]
+
+
+def test_runs_are_merged_as_keys_are_added():
+    index = KeyIndex()
+    for start in range(0, 1000, 10):
+        index.add(np.arange(start, start + 10))
+    # runs of similar size are merged, so 100 adds leave a logarithmic number of runs
+    assert len(index.runs) <= 10
+    assert len(index) == 1000
+    assert index.to_array().tolist() == list(range(1000))
+    assert index.contains(pd.Series([-1, 0, 999, 1000])).tolist() == [False, True, True, False]
+
+
+def test_categorical_column_is_looked_up_per_category():
+    values = pd.Series([1, 2, None, 1]).astype("category")
+    assert KeyIndex([1]).contains(values).tolist() == [True, False, False, True]
+
+
+def test_as_int64_drops_or_flags_what_is_not_an_integer():
+    ints, usable = as_int64(pd.Series([1, 2.5, None, "4"], dtype=object))
+    assert ints.tolist() == [1, 4]
+    ints, usable = as_int64(pd.Series([1, 2.5, None, "4"], dtype=object), keep_shape=True)
+    assert usable.tolist() == [True, False, False, True]
+
+
+def test_store_reads_memory_then_disk_then_database(tmp_path):
+    fetched = []
+
+    def fetch(name):
+        fetched.append(name)
+        return np.array([7, 8])
+
+    store = KeyStore(str(tmp_path), fetch=fetch)
+    store.put("users", pd.Series([1, 2]))
+    store.save("users")
+
+    # a new process finds the saved keys on disk and only asks the database for the others
+    fresh = KeyStore(str(tmp_path), fetch=fetch)
+    assert fresh.get("users").to_array().tolist() == [1, 2]
+    assert fresh.get("posts").to_array().tolist() == [7, 8]
+    assert fetched == ["posts"]
+
+    fresh.discard("posts")
+    fresh.get("posts")
+    assert fetched == ["posts", "posts"]
+
+
+def test_store_without_fetch_refuses_unknown_tables(tmp_path):
+    with pytest.raises(KeyError):
+        KeyStore(str(tmp_path)).get("users")
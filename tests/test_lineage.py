@@ -0,0 +1,78 @@
+'''
+description:
+lineage.py: the flags column of the repaired rows, its bit legend and the bounds of its column type.
+'''
+
+#importing modules
+import pandas as pd
+import pytest
+
+import engine
+import lineage
+import sink
+from helpers import make_project, run_etl, query, errors
+
+RULES = engine.compile_rules({"posts": [
+    {"column": "id", "check": "primary_key", "action": "drop"},
+    {"column": "title", "check": "not_null", "action": "fill", "value": "untitled"},
+    {"column": "body", "check": "not_null", "action": "null"},
+    {"column": "email", "check": "email", "action": "null"},
+]})
+
+
+@pytest.fixture(autouse=True)
+def lineage_off():
+    yield
+    lineage.configure({})
+
+
+def test_off_without_a_lineage_section():
+    assert lineage.configure({}) is None
+    assert lineage.column is None
+    assert lineage.as_config() == {}
+
+
+def test_rules_must_fit_the_bits_of_the_column():
+    with pytest.raises(ValueError, match="bits"):
+        lineage.configure({"lineage": {"sql": "tinyint"}}, {"posts": RULES["posts"] * 2})
+    with pytest.raises(ValueError, match="unknown lineage column type"):
+        lineage.configure({"lineage": {"sql": "float"}})
+
+
+def test_repaired_rows_get_the_bit_of_their_rule(tmp_path):
+    lineage.configure({"lineage": {"sql": "smallint"}}, RULES)
+    df = pd.DataFrame({"id": [1, 2, 2, 3], "title": [None, "b", "c", None], "body": ["x", "y", "z", "w"],
+                       "email": ["a@b.com", "bad", "bad", "bad"]})
+    recorder = sink.RejectionSink(str(tmp_path / "rejections.jsonl"))
+    out = engine.run_table(df, "posts", RULES["posts"], {}, recorder=recorder)
+
+    assert out["id"].tolist() == [1, 3]
+    assert str(out["dq_flags"].dtype) == "int16"
+    # row 1 had its title filled (bit 1); row 3 its title filled and its email nulled (bit 3)
+    assert out["dq_flags"].tolist() == [0b0010, 0b1010]
+    # dropped rows keep no flags, and a rule that never fired sets none
+    records = pd.concat(recorder.batches, ignore_index=True)
+    assert sorted(set(records["bit"])) == [0, 1, 3]
+
+
+def test_legend_names_every_bit():
+    lineage.configure({"lineage": {}}, RULES)
+    assert lineage.legend(RULES, {"posts": "blog_posts"})[:2] == [
+        ("blog_posts", 0, "id", "primary_key", "drop"),
+        ("blog_posts", 1, "title", "not_null", "fill:untitled"),
+    ]
+    assert lineage.column_sql() == "int default 0"
+    assert lineage.as_config() == {"lineage": {"column": "dq_flags", "sql": "int", "legend": "dq_rules"}}
+
+
+def test_flags_and_legend_are_loaded(tmp_path):
+    path = make_project(tmp_path, lineage={"column": "dq_flags", "sql": "int"}, distformat="none")
+    run_etl(path)
+
+    assert errors(path) == []
+    legend = query(path, "SELECT * FROM dq_rules WHERE table_name = 'posts' ORDER BY bit")
+    assert legend["column_name"].tolist() == ["id", "userId", "title", "body"]
+    # the posts with a filled title carry the bit of that rule
+    filled = query(path, "SELECT COUNT(*) AS n FROM posts WHERE (dq_flags >> 2) & 1 = 1")["n"][0]
+    assert filled > 0
+    assert filled == len(query(path, "SELECT id FROM posts WHERE title = 'untitled'"))
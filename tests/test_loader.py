@@ -0,0 +1,107 @@
+'''
+description:
+Loader options and strategies of loader.py, on a cursor that records its statements instead of
+a MySQL connection.
+'''
+
+#importing modules
+import io
+
+import pandas as pd
+import pytest
+
+import loader
+
+
+def test_table_entry_over_default_entry():
+    config = {"loader": {"default": {"batch_size": 500}, "posts": {"strategy": "rows"}}}
+
+    assert loader.options_for(config, "posts") == {"strategy": "rows", "batch_size": 500}
+    assert loader.options_for(config, "users") == {"strategy": "batch", "batch_size": 500}
+
+
+def test_unknown_strategy_is_refused():
+    with pytest.raises(ValueError, match="unknown loader strategy"):
+        loader.options_for({"loader": {"posts": {"strategy": "copy"}}}, "posts")
+
+
+@pytest.mark.parametrize("local_infile, load_with", [(False, "batch"), (True, "bulk")])
+def test_swap_loads_with_bulk_only_when_local_infile_is_on(local_infile, load_with):
+    config = {"database": {"local_infile": local_infile}, "loader": {"todos": {"strategy": "swap"}}}
+    assert loader.options_for(config, "todos")["load_with"] == load_with
+
+
+@pytest.mark.parametrize("entry", [{"strategy": "bulk"}, {"strategy": "swap", "load_with": "bulk"}])
+def test_bulk_without_local_infile_is_refused(entry):
+    with pytest.raises(ValueError, match="local_infile"):
+        loader.options_for({"loader": {"photos": entry}}, "photos")
+    # the embedded backends never use LOAD DATA
+    assert loader.options_for({"database": {"backend": "sqlite"}, "loader": {"photos": entry}}, "photos")
+
+
+def test_to_params_turns_every_missing_value_into_none():
+    df = pd.DataFrame({"id": pd.array([1, None], dtype="Int64"), "name": ["a", float("nan")]})
+    assert loader.to_params(df) == [(1, "a"), (None, None)]
+
+
+def test_update_clause_leaves_the_primary_key_alone():
+    assert loader.update_clause(loader.sql_columns(pd.DataFrame(columns=["id", "address.city"]))) == \
+        "`address_city`=VALUES(`address_city`)"
+
+
+class Recorder:
+    """ A connection and cursor in one, keeping every statement and its parameters."""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def execute(self, sql, params=None):
+        self.statements.append((" ".join(sql.split()), params))
+
+    def executemany(self, sql, rows):
+        self.statements.append((" ".join(sql.split()), rows))
+
+    def fetchone(self):
+        return (0,)
+
+    def commit(self):
+        self.commits += 1
+
+
+def frame():
+    return pd.DataFrame({"id": [1, 2, 3], "title": ["a", None, "c"]})
+
+
+def test_batch_strategy_sends_batch_size_rows_per_statement():
+    db = Recorder()
+    loader.load(db, db, frame(), "posts", {"strategy": "batch", "batch_size": 2})
+
+    assert [sql.count("(%s, %s)") for sql, _ in db.statements] == [2, 1]
+    assert db.statements[0][1] == [1, "a", 2, None]
+    assert "ON DUPLICATE KEY UPDATE `title`=VALUES(`title`)" in db.statements[0][0]
+    assert db.commits == 1
+
+
+def test_rows_strategy_is_one_executemany():
+    db = Recorder()
+    loader.load(db, db, frame(), "posts", {"strategy": "rows"})
+    assert db.statements[0][1] == [(1, "a"), (2, None), (3, "c")]
+
+
+def test_deferred_checks_are_switched_back_on():
+    db = Recorder()
+    loader.load(db, db, frame(), "posts", {"strategy": "batch", "batch_size": 10, "defer_checks": True,
+                                           "foreign_keys": {"userId": "users"}})
+    sql = [statement for statement, _ in db.statements]
+    assert sql[0].startswith("SET SESSION foreign_key_checks = 0")
+    assert any("LEFT JOIN `users`" in statement for statement in sql)
+    assert sql[-1].startswith("SET SESSION foreign_key_checks = 1")
+
+
+def test_tsv_escapes_text_and_writes_nulls_as_backslash_n():
+    df = pd.DataFrame({"id": pd.array([1, None], dtype="Int64"), "body": ["a\tb\nc\\", None],
+                       "completed": [True, False]})
+    fs = io.StringIO()
+    loader.write_tsv(df, fs)
+    assert fs.getvalue() == "1\ta\\tb\\nc\\\\\t1\n\\N\t\\N\t0\n"
@@ -0,0 +1,68 @@
+'''
+description:
+metrics.py: decorated steps and spans are recorded only while metrics are on, summed per step and
+written as a JSON report and a Prometheus textfile.
+'''
+
+#importing modules
+import json
+
+import pytest
+
+import metrics
+
+
+@metrics.step("dq", table_arg=1)
+def check(rows, table):
+    return rows[:2]
+
+
+@pytest.fixture(autouse=True)
+def metrics_off():
+    yield
+    metrics.configure({})
+
+
+def test_nothing_is_recorded_while_off():
+    metrics.configure({})
+    check([1, 2, 3], "posts")
+    with metrics.span("extract", "posts", "read_csv") as s:
+        s.rows_out = 3
+    assert metrics.records == []
+    assert metrics.write_report() is None
+
+
+def test_steps_are_summed_per_stage_table_and_step():
+    metrics.configure({"metrics": {"enabled": True}})
+    check([1, 2, 3], "posts")
+    check([1, 2, 3, 4], "posts")
+    with metrics.span("extract", "posts", "read_csv", rows_in=0) as s:
+        s.rows_out = 7
+        s.bytes_read = 100
+
+    steps = {(s["stage"], s["table"], s["step"]): s for s in metrics.summary()["steps"]}
+    assert steps[("dq", "posts", "check")]["calls"] == 2
+    assert steps[("dq", "posts", "check")]["rows_in"] == 7
+    assert steps[("dq", "posts", "check")]["rows_out"] == 4
+    assert steps[("extract", "posts", "read_csv")]["bytes_read"] == 100
+
+
+def test_timed_chunks_record_every_chunk():
+    metrics.configure({"metrics": {"enabled": True}})
+    assert list(metrics.timed_chunks(iter([[1, 2], [3]]), "extract", "posts", "read_csv")) == [[1, 2], [3]]
+    assert [entry["rows_out"] for entry in metrics.records] == [2, 1, None]
+
+
+def test_reports_are_written(tmp_path):
+    metrics.configure({"metrics": {"enabled": True, "json": str(tmp_path / "metrics.json"),
+                                   "prometheus": str(tmp_path / "metrics.prom")}})
+    check([1, 2, 3], 'say "hi"')
+    metrics.write_report({("posts", "title", "not_null", "fill:untitled"): 12})
+
+    report = json.loads((tmp_path / "metrics.json").read_text())
+    assert report["rejections"] == [{"table": "posts", "column": "title", "rule": "not_null",
+                                     "action": "fill:untitled", "rows": 12}]
+    prom = (tmp_path / "metrics.prom").read_text()
+    assert 'etl_step_calls{stage="dq",table="say \\"hi\\"",step="check"} 1' in prom
+    assert 'etl_rejected_rows{table="posts",column="title",rule="not_null",action="fill:untitled"} 12' in prom
+    assert not (tmp_path / "metrics.prom.tmp").exists()
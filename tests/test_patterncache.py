@@ -0,0 +1,63 @@
+'''
+description:
+PatternCache of patterncache.py: regex verdicts per distinct value, bounded, shared by the checks
+of dq.py and saved for the next run.
+'''
+
+#importing modules
+import re
+
+import pandas as pd
+import pytest
+
+import dq
+import patterncache
+
+EMAIL = re.compile(dq.EMAIL_PATTERN)
+
+
+@pytest.fixture(autouse=True)
+def no_process_cache():
+    yield
+    patterncache.configure({})
+
+
+def test_only_missing_values_are_matched():
+    cache = patterncache.PatternCache()
+    assert cache.verdicts(EMAIL, pd.Series(["a@b.com", "bad"])) == [True, False]
+    assert cache.verdicts(EMAIL, pd.Series(["bad", "c@d.org"])) == [False, True]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = patterncache.PatternCache(size=2)
+    cache.verdicts(EMAIL, pd.Series(["a@b.com", "bad"]))
+    cache.verdicts(EMAIL, pd.Series(["a@b.com"]))
+    cache.verdicts(EMAIL, pd.Series(["c@d.org"]))
+    assert list(cache.entries) == [(EMAIL.pattern, "a@b.com"), (EMAIL.pattern, "c@d.org")]
+
+
+def test_verdicts_are_kept_between_runs(tmp_path):
+    path = str(tmp_path / "state" / "patterns.json")
+    cache = patterncache.configure({"patterncache": {"enabled": True, "path": path}})
+    cache.verdicts(EMAIL, pd.Series(["a@b.com", "bad"]))
+    cache.save()
+
+    again = patterncache.configure({"patterncache": {"enabled": True, "path": path}})
+    assert again.verdicts(EMAIL, pd.Series(["bad", "a@b.com"])) == [False, True]
+    assert again.misses == 0
+
+
+def test_dq_check_gives_the_same_mask_with_and_without_cache():
+    s = pd.Series(["a@b.com", None, "bad", "a@b.com", "x@y.io"], dtype="string")
+    plain = dq.valid_pattern(s, dq.EMAIL_PATTERN)
+
+    patterncache.configure({"patterncache": {"enabled": True, "path": None}})
+    cached = dq.valid_pattern(s, dq.EMAIL_PATTERN)
+    pd.testing.assert_series_equal(plain, cached)
+    assert plain.tolist() == [True, False, False, True, True]
+
+
+def test_disabled_by_default():
+    assert patterncache.configure({}) is None
+    assert patterncache.get_cache() is None
@@ -0,0 +1,91 @@
+'''
+description:
+reader.py: both engines read the same DataFrames, and the profiler gathers its statistics from the
+rows of the same scan, whole or in chunks.
+'''
+
+#importing modules
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import reader
+
+SOURCE = 'id,userId,title,body,score\n1,7,a,"two\nlines",1.5\n2,7,,plain,\n3,x,c,"say ""hi""",2.0\n4,8,d,NULL,3.5\n'
+COLUMNS = {"id": "Int32", "userId": "category", "title": "string", "body": "string", "score": "float64"}
+
+
+@pytest.fixture(autouse=True)
+def default_reader():
+    yield
+    reader.configure({})
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "posts.csv"
+    path.write_text(SOURCE)
+    return str(path)
+
+
+def read(engine: str, path: str, chunksize: int = None):
+    reader.configure({"reader": {"engine": engine}})
+    out = reader.read_csv(path, COLUMNS, chunksize=chunksize)
+    return pd.concat(list(out), ignore_index=True) if chunksize else out
+
+
+def test_engines_read_the_same_frame(source):
+    pytest.importorskip("pyarrow")
+    expected = read("pandas", source)
+    assert expected["body"].tolist()[:3] == ["two\nlines", "plain", 'say "hi"']
+    assert expected["body"].isna().tolist() == [False, False, False, True]
+    for engine, chunksize in [("arrow", None), ("arrow", 3), ("pandas", 3)]:
+        actual = read(engine, source, chunksize)
+        pd.testing.assert_frame_equal(expected.drop(columns="userId"), actual.drop(columns="userId"))
+        assert actual["userId"].astype("string").tolist() == expected["userId"].astype("string").tolist()
+
+
+def test_unknown_engine_is_refused():
+    with pytest.raises(ValueError):
+        reader.configure({"reader": {"engine": "polars"}})
+
+
+def test_profile_of_chunks_matches_the_whole_frame():
+    df = pd.DataFrame({"id": pd.array(range(1, 3001), dtype="Int32"),
+                       "userId": pd.Series(np.arange(3000) % 10 + 1).astype("category"),
+                       "title": pd.array([None if i % 7 == 0 else f"t{i % 50}" for i in range(3000)], dtype="string")})
+    whole = reader.Profile()
+    whole.update(df)
+    chunked = reader.Profile()
+    for _ in chunked.observe([df.iloc[:1000], df.iloc[1000:]]):
+        pass
+
+    assert whole.to_dict() == chunked.to_dict()
+    stats = whole.to_dict()["columns"]
+    assert (stats["id"]["min"], stats["id"]["max"]) == (1, 3000)
+    # past k = 1024 distinct values the count is an estimate
+    assert abs(stats["id"]["distinct"] - 3000) < 3000 * 0.2
+    assert stats["id"]["suggested_dtype"] == "Int32"
+    assert (stats["userId"]["min"], stats["userId"]["max"], stats["userId"]["suggested_dtype"]) == (1, 10, "category")
+    assert stats["title"]["nulls"] == 429
+    assert stats["title"]["distinct"] == 50
+    assert stats["title"]["suggested_dtype"] == "category"
+
+
+def test_distinct_count_is_estimated_past_k():
+    profile = reader.Profile(k=256)
+    profile.update(pd.DataFrame({"id": np.arange(50000, dtype=np.int64)}))
+    assert abs(profile.distinct("id") - 50000) < 50000 * 0.2
+
+
+def test_profiles_are_written_at_the_end_of_the_run(source, tmp_path):
+    path = tmp_path / "state" / "profile.json"
+    reader.configure({"reader": {"profile": str(path)}})
+    reader.read_csv(source, COLUMNS, table="posts")
+    reader.write_profiles()
+
+    written = json.loads(path.read_text())
+    assert written["posts"]["rows"] == 4
+    assert written["posts"]["columns"]["title"]["nulls"] == 1
@@ -0,0 +1,41 @@
+'''
+description:
+The "table" format of the rejection sink on both embedded backends: the dq_rejections quarantine
+table is created on first use, or brought up to date when it predates a column.
+'''
+
+#importing modules
+import pytest
+
+from helpers import make_project, run_etl, query, errors
+
+OLD_SCHEMA = """create table dq_rejections (logged_at datetime, table_name varchar(64), column_name varchar(64),
+    rule varchar(64), action varchar(64), row_id varchar(64), value text);"""
+
+
+def create_old_table(path, backend: str):
+    if backend == "duckdb":
+        import duckdb
+        conn = duckdb.connect(str(path / "etl.duckdb"))
+        conn.execute(OLD_SCHEMA)
+        conn.close()
+    else:
+        import sqlite3
+        with sqlite3.connect(path / "etl.sqlite") as conn:
+            conn.execute(OLD_SCHEMA)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "duckdb"])
+@pytest.mark.parametrize("existing", [False, True])
+def test_rejections_are_stored(tmp_path, backend, existing):
+    if backend == "duckdb":
+        pytest.importorskip("duckdb")
+    path = make_project(tmp_path, backend, rejections={"format": "table"}, distformat="none")
+    if existing:
+        create_old_table(path, backend)
+    run_etl(path)
+
+    assert errors(path) == []
+    stored = query(path, "SELECT table_name, rule_bit, COUNT(*) AS n FROM dq_rejections GROUP BY 1, 2")
+    assert stored["n"].sum() > 0
+    assert (stored["rule_bit"] >= 0).all()
@@ -0,0 +1,86 @@
+'''
+description:
+scheduler.run: tables start after their parents, and the descendants of a failed table are skipped.
+'''
+
+#importing modules
+import threading
+
+import pytest
+
+import scheduler
+
+DEPS = {"users": set(), "posts": {"users"}, "comments": {"posts"}, "albums": {"users"},
+        "photos": {"albums"}, "todos": {"users"}}
+ORDER = ["users", "posts", "comments", "albums", "photos", "todos"]
+
+
+@pytest.fixture(autouse=True)
+def log_dir(tmp_path, monkeypatch):
+    # failures are logged to error.txt in the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def log(path):
+    file = path / "error.txt"
+    return file.read_text() if file.exists() else ""
+
+
+def test_parents_finish_before_children():
+    done = []
+    lock = threading.Lock()
+
+    def task(name):
+        with lock:
+            assert DEPS[name] <= set(done), name
+            done.append(name)
+        return name
+
+    results = scheduler.run(ORDER, DEPS, task, workers=4)
+    assert results == {name: name for name in ORDER}
+
+
+def test_failing_root_skips_every_descendant(log_dir):
+    def task(name):
+        if name == "users":
+            raise RuntimeError("boom")
+        return name
+
+    results = scheduler.run(ORDER, DEPS, task, workers=4)
+
+    assert results == {}
+    text = log(log_dir)
+    assert "Error while checking users: boom" in text
+    for name in ["posts", "comments", "albums", "photos", "todos"]:
+        assert f"Skipped {name}: parent table" in text
+    assert "circular" not in text
+
+
+def test_failing_branch_keeps_the_others(log_dir):
+    def task(name):
+        if name == "albums":
+            raise RuntimeError("boom")
+        return name
+
+    results = scheduler.run(ORDER, DEPS, task, workers=2)
+    assert set(results) == {"users", "posts", "comments", "todos"}
+    assert "Skipped photos: parent table albums failed" in log(log_dir)
+
+
+def test_cycles_are_reported(log_dir):
+    deps = {"a": {"b"}, "b": {"a"}, "c": set()}
+    results = scheduler.run(["a", "b", "c"], deps, lambda name: name)
+
+    assert results == {"c": "c"}
+    assert "Skipped a, b: circular foreign keys" in log(log_dir)
+
+
+def test_dependencies_keep_parents_of_the_run():
+    deps = scheduler.dependencies(["posts", "comments"], {"posts": "users", "comments": ["posts", "comments"]})
+    assert deps == {"posts": set(), "comments": {"posts"}}
+
+
+def test_ancestors_follow_every_level():
+    assert scheduler.ancestors("comments", DEPS) == {"posts", "users"}
+    assert scheduler.ancestors("users", DEPS) == set()
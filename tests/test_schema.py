@@ -0,0 +1,61 @@
+'''
+description:
+Casts of schema.py: values that do not fit their type are read as nulls instead of failing the read.
+'''
+
+#importing modules
+import numpy as np
+import pandas as pd
+
+import schema
+
+
+def test_to_int_nulls_values_that_do_not_fit():
+    s = pd.Series([1.0, np.inf, -np.inf, 1e20, -1e20, 2.5, np.nan, 3.0])
+    out = schema.to_int(s, "Int64")
+
+    assert str(out.dtype) == "Int64"
+    assert out.isna().tolist() == [False, True, True, True, True, True, True, False]
+    assert out.dropna().tolist() == [1, 3]
+
+
+def test_to_int_widens_int32_when_needed():
+    assert str(schema.to_int(pd.Series([1.0, 2.0]), "Int32").dtype) == "Int32"
+    assert str(schema.to_int(pd.Series([1.0, 2.0**40]), "Int32").dtype) == "Int64"
+
+
+def test_to_int_parses_text():
+    out = schema.to_int(pd.Series(["7", "x", "inf", "1e20", None], dtype=object), "Int32")
+
+    assert out.isna().tolist() == [False, True, True, True, True]
+    assert out.iloc[0] == 7
+
+
+def test_read_csv_keeps_the_table_when_ids_do_not_fit(tmp_path):
+    path = tmp_path / "posts.csv"
+    path.write_text("userId,id,title,completed\n1,1,a,True\ninf,inf,b,False\n1e20,1e20,c,maybe\n2,3,d,False\n")
+    df = schema.read_csv(str(path), {"userId": "category", "id": "Int32", "title": "string", "completed": "boolean"})
+
+    assert df["id"].isna().tolist() == [False, True, True, False]
+    assert sorted(df["userId"].cat.categories.tolist()) == [1, 2]
+    assert df["completed"].isna().tolist() == [False, False, True, False]
+
+
+def test_rejections_keep_the_source_text_of_failed_casts(tmp_path):
+    import engine
+    import sink
+    path = tmp_path / "todos.csv"
+    path.write_text("userId,id,title,completed\n1,1,a,True\n1,2,b,maybe\n1,3,c,\n")
+    df = schema.read_csv(str(path), {"userId": "category", "id": "Int32", "title": "string", "completed": "boolean"})
+    assert df["completed__raw"].tolist()[1] == "maybe"
+
+    recorder = sink.RejectionSink(str(tmp_path / "rejections.jsonl"))
+    rules = engine.compile_rules({"todos": [{"column": "completed", "check": "boolean", "action": "drop"}]})["todos"]
+    out = engine.run_table(df, "todos", rules, {}, recorder=recorder)
+
+    assert out.columns.tolist() == ["userId", "id", "title", "completed"]
+    assert out["id"].tolist() == [1]
+    batch = recorder.batches[0]
+    assert batch["id"].tolist() == ["2", "3"]
+    assert batch["value"].tolist()[0] == "maybe"
+    assert pd.isna(batch["value"].tolist()[1])
@@ -0,0 +1,63 @@
+'''
+description:
+RejectionSink of sink.py: masked rows are recorded in batches, counted per rule and kept across runs.
+'''
+
+#importing modules
+import json
+
+import pandas as pd
+import pytest
+
+import sink
+
+
+def record(recorder, n=3):
+    df = pd.DataFrame({"id": range(1, n + 1), "email": ["a", None, "c"][:n]})
+    return recorder.reject(df, df["email"].isna() | (df["id"] == 1), "email", "users", "email", "drop")
+
+
+def test_records_masked_rows_and_counts_per_rule(tmp_path):
+    recorder = sink.RejectionSink(str(tmp_path / "rejections.jsonl"))
+    assert record(recorder) == 2
+    assert recorder.summary() == {("users", "email", "email", "drop"): 2}
+    recorder.close()
+
+    rows = [json.loads(line) for line in (tmp_path / "rejections.jsonl").read_text().splitlines()]
+    assert [(row["id"], row["value"], row["bit"]) for row in rows] == [("1", "a", -1), ("2", None, -1)]
+
+
+def test_full_buffer_is_flushed(tmp_path):
+    recorder = sink.RejectionSink(str(tmp_path / "rejections.jsonl"), buffer_rows=2)
+    record(recorder)
+    assert recorder.batches == []
+    assert len((tmp_path / "rejections.jsonl").read_text().splitlines()) == 2
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_file_formats_append_across_runs(tmp_path, fmt):
+    path = str(tmp_path / f"rejections.{fmt}")
+    for _ in range(2):
+        recorder = sink.configure({"rejections": {"path": path, "format": fmt}})
+        record(recorder)
+        recorder.close()
+
+    out = pd.read_json(path, lines=True) if fmt == "jsonl" else pd.read_csv(path)
+    assert out["id"].tolist() == [1, 2, 1, 2]
+
+
+def test_parquet_keeps_one_part_file_per_run(tmp_path):
+    path = tmp_path / "rejections"
+    for _ in range(2):
+        recorder = sink.configure({"rejections": {"path": str(path), "format": "parquet"}})
+        record(recorder)
+        recorder.close()
+
+    assert len(list(path.glob("rejections-*.parquet"))) == 2
+    out = pd.read_parquet(path)
+    assert sorted(out["id"].tolist()) == ["1", "1", "2", "2"]
+
+
+def test_unknown_format_is_refused():
+    with pytest.raises(ValueError):
+        sink.RejectionSink(fmt="xml")
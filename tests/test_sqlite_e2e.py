@@ -0,0 +1,159 @@
+'''
+description:
+End-to-end checks of the ETL against the embedded SQLite backend, so they run without a MySQL server.
+Every run is a separate "python app.py" process in a temporary directory holding its own config.json,
+copies of the source files, the database file and the state folders.
+'''
+
+#importing modules
+import json
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import REPO, TABLES, make_project, run_etl, table, rejections, errors, assert_same_tables
+
+
+@pytest.fixture(scope="module")
+def serial(tmp_path_factory):
+    """ A plain whole-file run, the reference of the other modes."""
+
+    path = make_project(tmp_path_factory.mktemp("serial"))
+    run_etl(path)
+    assert errors(path) == []
+    return path
+
+
+def test_serial_run_loads_every_table(serial):
+    for name in TABLES:
+        assert len(table(serial, name)) > 0
+    assert len(rejections(serial)) > 0
+
+
+def test_sharded_matches_serial(serial, tmp_path):
+    path = make_project(tmp_path, sharding={"processes": 3, "min_rows": 1})
+    run_etl(path)
+
+    assert errors(path) == []
+    assert_same_tables(serial, path)
+    # tables are checked concurrently, so only the order within a table is fixed
+    expected = rejections(serial).sort_values("table", kind="stable").reset_index(drop=True)
+    actual = rejections(path).sort_values("table", kind="stable").reset_index(drop=True)
+    pd.testing.assert_frame_equal(expected, actual)
+
+
+def test_chunked_matches_whole_file(serial, tmp_path):
+    path = make_project(tmp_path, chunksize=700)
+    run_etl(path)
+
+    assert errors(path) == []
+    assert_same_tables(serial, path)
+    # chunks record their rejections chunk by chunk, so only the set of records is the same
+    columns = ["table", "column", "rule", "action", "id", "bit"]
+    expected = rejections(serial).sort_values(columns).reset_index(drop=True)
+    actual = rejections(path).sort_values(columns).reset_index(drop=True)
+    pd.testing.assert_frame_equal(expected, actual)
+
+
+def test_resume_after_failed_batch(serial, tmp_path):
+    path = make_project(tmp_path, checkpoint={"enabled": True, "path": str(tmp_path / "state" / "checkpoints"),
+                                              "commit_rows": 1000})
+    # every committed batch of photos is logged; with FAIL, the third batch fails
+    patch = """
+import tables as t
+upsert = t.BACKEND.upsert
+calls = []
+def logged(conn, cursor, df, name, options):
+    if name == "photos":
+        calls.append(len(df))
+        if FAIL and len(calls) == 3:
+            raise RuntimeError("injected failure")
+        with open("photos_batches.txt", "a") as fs:
+            fs.write(str(len(df)) + "\\n")
+    return upsert(conn, cursor, df, name, options)
+t.BACKEND.upsert = logged
+"""
+    run_etl(path, patch.replace("FAIL", "True"))
+    assert any("injected failure" in line for line in errors(path))
+    assert len(table(path, "photos")) == 2000
+    assert (tmp_path / "state" / "checkpoints" / "photos.json").exists()
+
+    run_etl(path, patch.replace("FAIL", "False"))
+    batches = [int(n) for n in (path / "photos_batches.txt").read_text().split()]
+    # two batches of the first run, then the second run starts at the first uncommitted row
+    assert batches[:2] == [1000, 1000]
+    assert sum(batches[2:]) == len(table(serial, "photos")) - 2000
+    assert_same_tables(serial, path)
+    assert not (tmp_path / "state" / "checkpoints" / "photos.json").exists()
+
+
+def test_resume_is_skipped_when_a_parent_changed(serial, tmp_path):
+    path = make_project(tmp_path, checkpoint={"enabled": True, "path": str(tmp_path / "state" / "checkpoints"),
+                                              "commit_rows": 1000})
+    patch = """
+import tables as t
+upsert = t.BACKEND.upsert
+calls = []
+def failing(conn, cursor, df, name, options):
+    if name == "photos":
+        calls.append(len(df))
+        if len(calls) == 3:
+            raise RuntimeError("injected failure")
+    return upsert(conn, cursor, df, name, options)
+t.BACKEND.upsert = failing
+"""
+    run_etl(path, patch)
+    assert (tmp_path / "state" / "checkpoints" / "photos.json").exists()
+
+    # the last album disappears: its photos, past the committed batches, are in the saved rows
+    # of the interrupted load, checked against the old albums
+    albums = pd.read_csv(path / "src" / "albums.csv")
+    last = albums["id"].max()
+    albums[albums["id"] != last].to_csv(path / "src" / "albums.csv", index=False)
+    failures = errors(path)
+    run_etl(path)
+
+    assert errors(path) == failures
+    assert last not in set(table(path, "photos")["albumId"])
+    assert len(table(path, "photos")) == (table(serial, "photos")["albumId"] != last).sum()
+    assert not (tmp_path / "state" / "checkpoints" / "photos.json").exists()
+
+
+def test_incremental_skips_unchanged_files_and_applies_deletes(serial, tmp_path):
+    path = make_project(tmp_path, incremental={"enabled": True, "statepath": str(tmp_path / "state"), "apply_deletes": True},
+                        metrics={"enabled": True, "json": str(tmp_path / "metrics.json")})
+    run_etl(path)
+    assert_same_tables(serial, path)
+
+    # nothing changed: no source file is read again
+    run_etl(path)
+    steps = json.loads((tmp_path / "metrics.json").read_text())["steps"]
+    assert [step for step in steps if step["stage"] == "extract"] == []
+
+    # user 1 disappears from the source: it is deleted with every row that depends on it
+    users = pd.read_csv(path / "src" / "users.csv")
+    users[users["id"] != 1].to_csv(path / "src" / "users.csv", index=False)
+    run_etl(path)
+
+    assert errors(path) == []
+    assert 1 not in table(path, "users")["id"].tolist()
+    assert 1 not in table(path, "posts")["userId"].tolist()
+    assert 1 not in table(path, "albums")["userId"].tolist()
+    assert 1 not in table(path, "todos")["userId"].tolist()
+    assert set(table(path, "comments")["postId"]) <= set(table(path, "posts")["id"])
+    assert set(table(path, "photos")["albumId"]) <= set(table(path, "albums")["id"])
+    # the dist file keeps the whole table, less the deleted user
+    dist_users = pd.read_csv(path / "dist" / "users.csv")
+    assert sorted(dist_users["id"]) == sorted(table(path, "users")["id"])
+    # the key index of a child follows the rows that are really loaded
+    for name in ["posts", "albums", "comments"]:
+        keys = np.load(tmp_path / "state" / "keys" / f"{name}.keys.npy")
+        assert sorted(keys.tolist()) == sorted(table(path, name)["id"].tolist()), name
+
+    # user 1 comes back: its children, unchanged in their own files, are loaded again
+    shutil.copy(REPO / "src" / "users.csv", path / "src" / "users.csv")
+    run_etl(path)
+    assert errors(path) == []
+    assert_same_tables(serial, path)
@@ -0,0 +1,53 @@
+'''
+description:
+The chunked mode of stream.py on the embedded SQLite backend: duplicates across chunk boundaries and
+a failed chunk load.
+'''
+
+#importing modules
+import pandas as pd
+
+from helpers import make_project, run_etl, table, rejections, errors
+
+
+def test_later_copy_of_an_id_in_another_chunk_is_dropped(tmp_path):
+    path = make_project(tmp_path, chunksize=50, distformat="none")
+    posts = pd.read_csv(path / "src" / "posts.csv")
+    first = posts.dropna().iloc[[0]].assign(title="a later copy")
+    pd.concat([posts, first]).to_csv(path / "src" / "posts.csv", index=False)
+    run_etl(path)
+
+    assert errors(path) == []
+    loaded = table(path, "posts")
+    row = loaded[loaded["id"] == first["id"].iloc[0]]
+    # the first copy was loaded with an earlier chunk and stays
+    assert row["title"].tolist() == [posts.dropna()["title"].iloc[0]]
+    dropped = rejections(path).query("table == 'posts' and rule == 'primary_key'")
+    assert str(first["id"].iloc[0]) in dropped["id"].astype(str).tolist()
+
+
+def test_failed_chunk_stops_the_table_and_its_children(tmp_path):
+    path = make_project(tmp_path, chunksize=40, distformat="none")
+    patch = """
+import tables as t
+frame = t.inserting_frame
+calls = []
+def failing(df, name, checkpoints=None):
+    if name == "albums":
+        calls.append(len(df))
+        if len(calls) == 2:
+            return False
+    return frame(df, name, checkpoints)
+t.inserting_frame = failing
+"""
+    run_etl(path, patch)
+
+    assert any("loading albums, photos failed" in line for line in errors(path))
+    # only the first chunk of albums was committed
+    assert 0 < len(table(path, "albums")) <= 40
+    assert len(table(path, "photos")) == 0
+    assert len(table(path, "todos")) > 0
+    keys = path / "state" / "keys"
+    assert (keys / "users.keys.npy").exists()
+    assert not (keys / "albums.keys.npy").exists()
+    assert not (keys / "photos.keys.npy").exists()